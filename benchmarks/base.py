@@ -14,62 +14,15 @@
 # THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
 # OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
 # DEALINGS IN THE SOFTWARE.
-
-import json
-import wandb
+# Runs N mock requests through a miner, see `openminers bench --help`.
+#
+#   python3 benchmarks/base.py template 10
 import sys
-import time
-import argparse
-import openminers
-import bittensor as bt
-from tqdm import tqdm
-from typing import List, Dict
-
-# from datasets import load_dataset
-# DATASET = iter( load_dataset( 'squad_v2', split = 'train', streaming = True ).shuffle( buffer_size = 10000 ))
-
-
-def get_mock_query() -> List[Dict[str, str]]:
-    prompt = """you are a chatbot that can come up with unique questions about many things."""
-    message = "ask me a random question about anything"
-    roles = ["system", "user"]
-    messages = [prompt, message]
-    packed_messages = [
-        json.dumps({"role": role, "content": message})
-        for role, message in zip(roles, messages)
-    ]
-    return packed_messages, roles, messages
+from openminers.cli import main
 
 
 def run():
-    # Parse miner class.
-    MINER = getattr(openminers, sys.argv[1])
-    N_STEPS = int(sys.argv[2])
-
-    # Load miner config
-    config = MINER.config()
-
-    # Set mock values on miner.
-    config.miner.blacklist.allow_non_registered = True
-    config.no_serve_axon = True
-    config.no_register = True
-    config.no_set_weights = True
-    config.wallet._mock = True
-    config.axon.external_ip = "127.0.0.1"
-    config.axon.port = 9090
-    bt.logging.success(f"Running benchmarks for miner: { sys.argv[1] }")
-
-    # Instantiate the miner axon
-    wallet = bt.wallet.mock()
-    axon = bt.axon(wallet=wallet, config=config, metagraph=None)
-    dendrite = bt.text_prompting(axon=axon.info(), keypair=wallet.hotkey)
-    bt.logging.success(f"dendrite: { dendrite }")
-
-    # Instantiate miner.
-    with MINER(config=config, axon=axon, wallet=wallet) as miner:
-        for step in range(N_STEPS):
-            _, roles, messages = get_mock_query()
-            dendrite.forward(roles=roles, messages=messages, timeout=1e6)
+    main(["bench", sys.argv[1], "--steps", sys.argv[2], *sys.argv[3:]])
 
 
 if __name__ == "__main__":
@@ -0,0 +1,84 @@
+# The MIT License (MIT)
+# Copyright © 2023 Yuma Rao
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+# documentation files (the “Software”), to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+# and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+# the Software.
+
+# THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+# THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+# Compares the per-miner `+=` history renderers against the compiled ChatTemplate on
+# 100-turn histories.
+#
+#   python3 benchmarks/chat_template.py 2000
+import sys
+import random
+import string
+import timeit
+from openminers.base.chat_template import ChatTemplate
+
+SYSTEM_PROMPT = "You are a helpful assistant.\n"
+
+
+def legacy_render(history, do_prompt_injection=True):
+    processed_history = ""
+    if do_prompt_injection:
+        processed_history += SYSTEM_PROMPT
+    for message in history:
+        if message["role"] == "system":
+            if not do_prompt_injection or message != history[0]:
+                processed_history += "<human>: " + message["content"].strip() + "\n"
+        if message["role"] == "assistant":
+            processed_history += "<bot>: " + message["content"].strip() + "\n"
+        if message["role"] == "user":
+            processed_history += "<human>: " + message["content"].strip() + "\n"
+    return processed_history
+
+
+def history(num_turns, seed=0):
+    rng = random.Random(seed)
+
+    def text():
+        return " ".join(
+            "".join(rng.choices(string.ascii_lowercase, k=rng.randint(2, 9)))
+            for _ in range(rng.randint(10, 60))
+        )
+
+    messages = [{"role": "system", "content": text()}]
+    for _ in range(num_turns):
+        messages.append({"role": "user", "content": text()})
+        messages.append({"role": "assistant", "content": text()})
+    return messages
+
+
+def run():
+    N_STEPS = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    template = ChatTemplate(
+        {
+            "system": ("<human>: ", "\n"),
+            "assistant": ("<bot>: ", "\n"),
+            "user": ("<human>: ", "\n"),
+        },
+        strip=True,
+        system_prompt=SYSTEM_PROMPT,
+    )
+    messages = history(100)
+    assert template.render(messages) == legacy_render(messages)
+
+    results = {}
+    for name, render in [("legacy", legacy_render), ("template", template.render)]:
+        seconds = min(timeit.repeat(lambda: render(messages), number=N_STEPS, repeat=5))
+        results[name] = seconds / N_STEPS * 1e6
+        print(f"{ name:>8}: { results[name]:.1f}us per 100-turn history")
+    print(f" speedup: { results['legacy'] / results['template']:.2f}x")
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,92 @@
+# The MIT License (MIT)
+# Copyright © 2023 Yuma Rao
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+# documentation files (the “Software”), to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+# and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+# the Software.
+
+# THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+# THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+
+# Compares a fresh HTTP client per call (the old path) against the pooled keep-alive
+# client used by the API miners, against a local mock provider.
+#
+#   python3 benchmarks/http_pool.py 500
+import sys
+import json
+import time
+import httpx
+import asyncio
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from openminers.base.http_client import PooledHTTPClient
+
+
+class MockProvider(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers["Content-Length"]))
+        body = json.dumps({"choices": [{"text": "hello"}]}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def percentiles(latencies):
+    latencies = sorted(latencies)
+    return (
+        latencies[len(latencies) // 2] * 1e3,
+        latencies[int(len(latencies) * 0.99)] * 1e3,
+    )
+
+
+async def fresh_client(url, n_steps):
+    latencies = []
+    for _ in range(n_steps):
+        start = time.perf_counter()
+        async with httpx.AsyncClient() as client:
+            (await client.post(url, json={"prompt": "hi"})).json()
+        latencies.append(time.perf_counter() - start)
+    return latencies, None
+
+
+async def pooled_client(url, n_steps):
+    client = PooledHTTPClient()
+    latencies = []
+    for _ in range(n_steps):
+        start = time.perf_counter()
+        await client.post_json(url, {"prompt": "hi"})
+        latencies.append(time.perf_counter() - start)
+    await client.aclose()
+    return latencies, client.stats()
+
+
+def run():
+    N_STEPS = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    server = ThreadingHTTPServer(("127.0.0.1", 0), MockProvider)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{ server.server_address[1] }/complete"
+
+    for name, bench in [("fresh", fresh_client), ("pooled", pooled_client)]:
+        latencies, stats = asyncio.run(bench(url, N_STEPS))
+        p50, p99 = percentiles(latencies)
+        print(f"{ name:>6}: p50 { p50:.2f}ms p99 { p99:.2f}ms { stats or '' }")
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,67 @@
+# The MIT License (MIT)
+# Copyright © 2023 Yuma Rao
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+# documentation files (the “Software”), to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+# and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+# the Software.
+
+# THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+# THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+# Times `import openminers` in fresh interpreters and fails if it got slower than
+# max_ms or pulled in a backend dependency.
+#
+#   python3 benchmarks/import_time.py 10 500
+import sys
+import statistics
+import subprocess
+
+HEAVY_MODULES = ["torch", "transformers", "deepspeed", "wandb", "openai", "langchain"]
+
+CODE = """
+import sys, time
+start_time = time.perf_counter()
+import openminers
+elapsed = time.perf_counter() - start_time
+print(elapsed, ",".join(sorted({name.split(".")[0] for name in sys.modules})))
+"""
+
+
+def import_time():
+    output = subprocess.run(
+        [sys.executable, "-c", CODE], capture_output=True, text=True, check=True
+    ).stdout
+    elapsed, modules = output.split()
+    return float(elapsed) * 1e3, set(modules.split(","))
+
+
+def run():
+    N_STEPS = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+    MAX_MS = float(sys.argv[2]) if len(sys.argv) > 2 else 500.0
+
+    times, heavy = [], set()
+    for _ in range(N_STEPS):
+        elapsed, modules = import_time()
+        times.append(elapsed)
+        heavy |= modules.intersection(HEAVY_MODULES)
+    median = statistics.median(times)
+    print(f"import openminers: { median:.1f}ms median over { N_STEPS } runs")
+
+    failed = False
+    if heavy:
+        print(f"FAIL: imported { ', '.join(sorted(heavy)) }")
+        failed = True
+    if median > MAX_MS:
+        print(f"FAIL: slower than { MAX_MS:.0f}ms")
+        failed = True
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    run()
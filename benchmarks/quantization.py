@@ -0,0 +1,112 @@
+# The MIT License (MIT)
+# Copyright © 2023 Yuma Rao
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+# documentation files (the “Software”), to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+# and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+# the Software.
+
+# THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+# THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+# Compares fp32 with int8 dynamic quantization, with and without bf16 activations, on
+# the cpu: load time (cold and from the quantization cache), weight size, peak process
+# memory and greedy decoding tokens/s. Each run is its own process so the memory
+# numbers don't overlap.
+#
+#   python3 benchmarks/quantization.py EleutherAI/pythia-160m 64
+import sys
+import time
+import resource
+import tempfile
+import multiprocessing
+
+PROMPT = "<human>: What is the capital of France and what is it known for?\n<bot>:"
+
+
+def measure(model_name, max_new_tokens, bf16, cache_dir, results, label):
+    import torch
+    from openminers.base.loading import load_model_and_tokenizer
+    from openminers.base.quantization import DynamicQuantization, model_bytes
+
+    quantization = None
+    if bf16 is not None:
+        quantization = DynamicQuantization(bf16=bf16, cache_dir=cache_dir)
+        if bf16 and not quantization.bf16:
+            return
+
+    start_time = time.time()
+    model, tokenizer = load_model_and_tokenizer(
+        model_name, quantization=quantization, torch_dtype=torch.float32
+    )
+    load_time = time.time() - start_time
+    input_ids = torch.tensor([tokenizer.encode(PROMPT)])
+
+    def generate():
+        with torch.no_grad():
+            return model.generate(
+                input_ids,
+                attention_mask=torch.ones_like(input_ids),
+                max_new_tokens=max_new_tokens,
+                min_new_tokens=max_new_tokens,
+                do_sample=False,
+                pad_token_id=tokenizer.eos_token_id,
+            )
+
+    generate()
+    start_time = time.time()
+    output = generate()
+    elapsed = time.time() - start_time
+    results[label] = dict(
+        load_s=load_time,
+        weights_mb=model_bytes(model) / 2**20,
+        peak_rss_mb=resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 2**10,
+        tokens_per_s=(output.shape[1] - input_ids.shape[1]) / elapsed,
+    )
+
+
+def run():
+    MODEL_NAME = sys.argv[1] if len(sys.argv) > 1 else "EleutherAI/pythia-160m"
+    MAX_NEW_TOKENS = int(sys.argv[2]) if len(sys.argv) > 2 else 64
+
+    context = multiprocessing.get_context("spawn")
+    results = context.Manager().dict()
+    with tempfile.TemporaryDirectory() as cache_dir:
+        # The second int8 run of each kind loads from the cache the first one wrote.
+        for label, bf16 in [
+            ("fp32", None),
+            ("int8", False),
+            ("int8 cached", False),
+            ("int8+bf16", True),
+            ("int8+bf16 cached", True),
+        ]:
+            process = context.Process(
+                target=measure,
+                args=(MODEL_NAME, MAX_NEW_TOKENS, bf16, cache_dir, results, label),
+            )
+            process.start()
+            process.join()
+
+    print(
+        f"{ 'mode':>16} { 'load_s':>8} { 'weights_mb':>11} { 'peak_rss_mb':>12} { 'tokens/s':>9}"
+    )
+    for label, result in results.items():
+        print(
+            f"{ label:>16} { result['load_s']:>8.2f} { result['weights_mb']:>11.1f} "
+            f"{ result['peak_rss_mb']:>12.1f} { result['tokens_per_s']:>9.1f}"
+        )
+    fp32, int8 = results.get("fp32"), results.get("int8")
+    if fp32 and int8:
+        print(
+            f"int8 vs fp32: { int8['tokens_per_s'] / fp32['tokens_per_s']:.2f}x tokens/s, "
+            f"{ fp32['weights_mb'] / int8['weights_mb']:.2f}x smaller weights"
+        )
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,179 @@
+# The MIT License (MIT)
+# Copyright © 2023 Yuma Rao
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+# documentation files (the “Software”), to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+# and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+# the Software.
+
+# THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+# THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+
+import queue
+import asyncio
+import argparse
+import threading
+import bittensor as bt
+
+from abc import ABC, abstractmethod
+from typing import Any, Callable, Coroutine, Iterator, List, Dict
+
+from .prompting_miner import BasePromptingMiner
+from .http_client import pooled_http_client
+
+
+class EventLoopThread:
+    """Runs an asyncio event loop on a daemon thread and executes coroutines on it.
+
+    At most max_concurrency coroutines submitted through run() or streams iterated
+    through stream() are in flight at once, however many threads are waiting on them.
+    """
+
+    def __init__(self, max_concurrency: int = 64):
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever, daemon=True)
+        self.thread.start()
+        self.num_in_flight: int = 0
+
+        # Create the semaphore on the loop it guards.
+        async def make_semaphore():
+            return asyncio.Semaphore(max(1, max_concurrency))
+
+        self.semaphore = self.submit(make_semaphore()).result()
+
+    def submit(self, coroutine: Coroutine) -> "asyncio.Future":
+        return asyncio.run_coroutine_threadsafe(coroutine, self.loop)
+
+    async def _bounded(self, coroutine_fn: Callable, *args) -> Any:
+        async with self.semaphore:
+            self.num_in_flight += 1
+            try:
+                return await coroutine_fn(*args)
+            finally:
+                self.num_in_flight -= 1
+
+    def run(self, coroutine_fn: Callable, *args) -> Any:
+        """Runs coroutine_fn(*args) on the loop and blocks the calling thread until it returns."""
+        return self.submit(self._bounded(coroutine_fn, *args)).result()
+
+    def stream(self, generator_fn: Callable, *args) -> Iterator[Any]:
+        """Iterates the async generator generator_fn(*args) on the loop from the calling thread.
+
+        The stream holds one of the max_concurrency slots until it ends or is closed.
+        """
+        items = queue.Queue()
+        end = object()
+
+        async def pump():
+            generator = generator_fn(*args)
+            try:
+                async for item in generator:
+                    items.put(item)
+            finally:
+                await generator.aclose()
+
+        future = self.submit(self._bounded(pump))
+        future.add_done_callback(lambda _: items.put(end))
+        try:
+            while True:
+                item = items.get()
+                if item is end:
+                    break
+                yield item
+            future.result()
+        finally:
+            # Cancelling the pump closes the async generator on the loop.
+            future.cancel()
+
+    def stop(self):
+        self.loop.call_soon_threadsafe(self.loop.stop)
+
+
+class AsyncBasePromptingMiner(BasePromptingMiner, ABC):
+    """A prompting miner whose forward is a coroutine.
+
+    Forward calls from the axon threads are multiplexed onto a single event loop, so a
+    miner waiting on network I/O does not hold a thread per request.
+    """
+
+    @classmethod
+    def add_super_args(cls, parser: argparse.ArgumentParser):
+        super(AsyncBasePromptingMiner, cls).add_super_args(parser)
+        parser.add_argument(
+            "--neuron.async_max_concurrency",
+            type=int,
+            help="The maximum number of forward coroutines in flight at once.",
+            default=64,
+        )
+        parser.add_argument(
+            "--neuron.http.max_connections",
+            type=int,
+            help="The maximum number of open connections in the shared HTTP pool.",
+            default=100,
+        )
+        parser.add_argument(
+            "--neuron.http.max_keepalive_connections",
+            type=int,
+            help="The maximum number of idle connections kept alive in the shared HTTP pool.",
+            default=20,
+        )
+        parser.add_argument(
+            "--neuron.http.keepalive_expiry",
+            type=float,
+            help="Seconds an idle connection is kept alive before it is closed.",
+            default=30.0,
+        )
+        parser.add_argument(
+            "--neuron.http.max_connections_per_host",
+            type=int,
+            help="The maximum number of concurrent requests to a single host, or 0 for no limit.",
+            default=0,
+        )
+        parser.add_argument(
+            "--neuron.http.no_http2",
+            action="store_true",
+            help="If set, the shared HTTP pool does not negotiate HTTP/2.",
+            default=False,
+        )
+        parser.add_argument(
+            "--neuron.http.timeout",
+            type=float,
+            help="Timeout in seconds for requests made through the shared HTTP pool.",
+            default=60.0,
+        )
+
+    @abstractmethod
+    async def forward(self, messages: List[Dict[str, str]]) -> str:
+        ...
+
+    async def run_blocking(self, fn: Callable, *args) -> Any:
+        """Awaits a blocking call from forward by running it on the loop's executor."""
+        return await asyncio.get_running_loop().run_in_executor(None, fn, *args)
+
+    def sync_forward(self, messages: List[Dict[str, str]]) -> str:
+        return self.event_loop.run(self.forward, messages)
+
+    def warmup_steps(self) -> int:
+        # Provider calls are billed and there is no local model to warm, so only on request.
+        steps = self.config.miner.warmup.get("steps")
+        return 0 if steps is None else steps
+
+    def sync_forward_stream(self, messages: List[Dict[str, str]]) -> Iterator[str]:
+        """Iterates forward_stream on the event loop, yielding chunks to the calling thread."""
+        return self.event_loop.stream(self.forward_stream, messages)
+
+    def __init__(self, *args, **kwargs):
+        super(AsyncBasePromptingMiner, self).__init__(*args, **kwargs)
+        self.event_loop = EventLoopThread(
+            max_concurrency=self.config.neuron.async_max_concurrency
+        )
+        self.http_client = pooled_http_client(self.config)
+        bt.logging.debug(
+            f"Started forward event loop with max concurrency: { self.config.neuron.async_max_concurrency }"
+        )
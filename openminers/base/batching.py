@@ -0,0 +1,115 @@
+# The MIT License (MIT)
+# Copyright © 2023 Yuma Rao
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+# documentation files (the “Software”), to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+# and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+# the Software.
+
+# THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+# THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+
+import time
+import queue
+import threading
+import contextlib
+import bittensor as bt
+from typing import Any, Callable, ContextManager, List, Optional
+
+
+class _PendingRequest:
+    def __init__(self, item: Any, deadline: Optional[float] = None):
+        self.item = item
+        self.deadline = deadline
+        self.result = None
+        self.error = None
+        self.done = threading.Event()
+
+
+class RequestBatcher:
+    """Collects concurrent requests into batches and runs them through a single batch function.
+
+    Callers block in submit() until the batch containing their request has been processed.
+    A batch is closed once it holds max_batch_size requests or max_wait seconds have passed
+    since its first request arrived. With a deadline_context, each batch runs inside
+    deadline_context(deadline) for the earliest deadline of its requests, since the batch
+    thread does not see the callers' thread-local state.
+    """
+
+    def __init__(
+        self,
+        batch_fn: Callable[[List[Any]], List[Any]],
+        max_batch_size: int,
+        max_wait: float = 0.01,
+        deadline_context: Callable[[float], ContextManager] = None,
+    ):
+        self.batch_fn = batch_fn
+        self.deadline_context = deadline_context
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max_wait
+        self.queue: "queue.Queue[_PendingRequest]" = queue.Queue()
+        self.num_batches: int = 0
+        self.num_requests: int = 0
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def submit(self, item: Any, deadline: Optional[float] = None) -> Any:
+        """Queues item for the next batch and blocks until its result is ready."""
+        request = _PendingRequest(item, deadline)
+        self.queue.put(request)
+        request.done.wait()
+        if request.error is not None:
+            raise request.error
+        return request.result
+
+    def _collect(self) -> List[_PendingRequest]:
+        # Block until the first request of the batch arrives.
+        batch = [self.queue.get()]
+        deadline = time.time() + self.max_wait
+
+        # Fill the batch until it is full or the wait window closes.
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self.queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            deadlines = [r.deadline for r in batch if r.deadline is not None]
+            context = contextlib.nullcontext()
+            if self.deadline_context is not None and len(deadlines) > 0:
+                context = self.deadline_context(min(deadlines))
+            try:
+                with context:
+                    results = self.batch_fn([request.item for request in batch])
+                if len(results) != len(batch):
+                    raise ValueError(
+                        f"batch function returned {len(results)} results for {len(batch)} requests"
+                    )
+                for request, result in zip(batch, results):
+                    request.result = result
+
+            # Every caller in the batch sees the same error.
+            except Exception as e:
+                bt.logging.error(f"Error in batch function: { e }")
+                for request in batch:
+                    request.error = e
+
+            finally:
+                self.num_batches += 1
+                self.num_requests += len(batch)
+                bt.logging.trace(f"Processed batch of size: { len(batch) }")
+                for request in batch:
+                    request.done.set()
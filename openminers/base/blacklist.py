@@ -15,7 +15,6 @@
 # OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
 # DEALINGS IN THE SOFTWARE.
 
-import wandb
 import bittensor as bt
 from typing import List, Dict, Union, Tuple, Callable
 
@@ -71,6 +70,11 @@ def blacklist(
 ) -> Union[Tuple[bool, str], bool]:
     bt.logging.trace("run blacklist function")
 
+    # Turn requests away until the miner is warmed up, and once it is draining.
+    not_ready, reason = self.readiness.check()
+    if not_ready:
+        return True, reason
+
     # First check to see if the black list function is ovveridden by the subclass.
     does_blacklist = None
     reason = None
@@ -103,6 +107,7 @@ def blacklist(
         # Finally, log and return the blacklist result.
         bt.logging.trace(f"blacklisted: {does_blacklist}, reason: {reason}")
         if self.config.wandb.on:
+            import wandb
             wandb.log(
                 {
                     "blacklisted": float(does_blacklist),
@@ -0,0 +1,105 @@
+# The MIT License (MIT)
+# Copyright © 2023 Yuma Rao
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+# documentation files (the “Software”), to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+# and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+# the Software.
+
+# THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+# THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+
+import json
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+
+def canonical_hash(
+    messages: List[Dict[str, str]], generation_config: Dict[str, Any] = None
+) -> str:
+    """Hashes the messages and generation config independently of key order and spacing."""
+    payload = json.dumps(
+        {"messages": messages, "config": generation_config or {}},
+        sort_keys=True,
+        separators=(",", ":"),
+        default=str,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def is_deterministic(generation_config: Dict[str, Any]) -> bool:
+    """True if the config decodes greedily, so identical prompts get identical responses."""
+    return (
+        generation_config.get("do_sample", True) is False
+        or generation_config.get("temperature", 1.0) == 0
+    )
+
+
+class ResponseCache:
+    """Thread safe LRU cache of responses bounded by entry count, total bytes and age."""
+
+    def __init__(
+        self, max_entries: int = 1024, max_bytes: int = 16 * 2**20, ttl: float = 300.0
+    ):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self.num_bytes: int = 0
+        self.num_hits: int = 0
+        self.num_misses: int = 0
+        self.num_evictions: int = 0
+        self.lock = threading.Lock()
+
+    def _remove(self, key: str):
+        _, response = self.entries.pop(key)
+        self.num_bytes -= len(response.encode("utf-8"))
+
+    def get(self, key: str) -> Optional[str]:
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and time.time() - entry[0] > self.ttl:
+                self._remove(key)
+                self.num_evictions += 1
+                entry = None
+            if entry is None:
+                self.num_misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.num_hits += 1
+            return entry[1]
+
+    def put(self, key: str, response: str):
+        size = len(response.encode("utf-8"))
+        if size > self.max_bytes:
+            return
+        with self.lock:
+            if key in self.entries:
+                self._remove(key)
+            self.entries[key] = (time.time(), response)
+            self.num_bytes += size
+            while (
+                len(self.entries) > self.max_entries or self.num_bytes > self.max_bytes
+            ):
+                self._remove(next(iter(self.entries)))
+                self.num_evictions += 1
+
+    def stats(self) -> Dict[str, float]:
+        lookups = self.num_hits + self.num_misses
+        return {
+            "cache_hits": self.num_hits,
+            "cache_misses": self.num_misses,
+            "cache_evictions": self.num_evictions,
+            "cache_entries": len(self.entries),
+            "cache_bytes": self.num_bytes,
+            "cache_hit_rate": self.num_hits / max(1, lookups),
+        }
@@ -0,0 +1,103 @@
+# The MIT License (MIT)
+# Copyright © 2023 Yuma Rao
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+# documentation files (the “Software”), to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+# and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+# the Software.
+
+# THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+# THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+from typing import Dict, List, Optional, Tuple
+
+
+class ChatTemplate:
+    """Renders a message history into a prompt from per-role prefixes and suffixes.
+
+    Each miner declares its roles once, e.g. {"user": ("<human>: ", "\\n")}. Messages with
+    other roles are left out. With a system_prompt, the prompt starts with it in place of
+    a leading system message. The generation prompt is where the model takes over, e.g.
+    "<bot>:". The per-message segments are also what HistoryTruncator tokenizes and caches.
+    """
+
+    def __init__(
+        self,
+        roles: Dict[str, Tuple[str, str]],
+        strip: bool = False,
+        system_prompt: Optional[str] = None,
+        generation_prompt: str = "",
+    ):
+        self.roles = {role: tuple(affixes) for role, affixes in roles.items()}
+        self.strip = strip
+        self.system_prompt = system_prompt
+        self.generation_prompt = generation_prompt
+        self.preamble = system_prompt or ""
+
+    def _start(self, messages: List[Dict[str, str]]) -> int:
+        # The system prompt replaces a leading system message.
+        if self.system_prompt is not None and messages:
+            return int(messages[0]["role"] == "system")
+        return 0
+
+    def segments(self, messages: List[Dict[str, str]]) -> List[str]:
+        """The text each message contributes to the prompt, empty for left out messages."""
+        roles, strip = self.roles, self.strip
+        start = self._start(messages)
+        segments = [""] * start
+        for message in messages[start:]:
+            affixes = roles.get(message["role"])
+            if affixes is None:
+                segments.append("")
+                continue
+            content = message["content"].strip() if strip else message["content"]
+            segments.append(affixes[0] + content + affixes[1])
+        return segments
+
+    def render(
+        self, messages: List[Dict[str, str]], add_generation_prompt: bool = False
+    ) -> str:
+        """The prompt for messages, ending with the generation prompt if asked for."""
+        # One flat list of parts and a single join is cheaper than building the prompt
+        # up with += or formatting each message.
+        roles = self.roles
+        parts = [self.preamble]
+        if self.strip:
+            for message in messages[self._start(messages) :]:
+                affixes = roles.get(message["role"])
+                if affixes is not None:
+                    parts += (affixes[0], message["content"].strip(), affixes[1])
+        else:
+            for message in messages[self._start(messages) :]:
+                affixes = roles.get(message["role"])
+                if affixes is not None:
+                    parts += (affixes[0], message["content"], affixes[1])
+        if add_generation_prompt:
+            parts.append(self.generation_prompt)
+        return "".join(parts)
+
+    def stop_strings(self) -> List[str]:
+        """Where a generation runs on into another role's turn, for OutputDecoder."""
+        suffix = self.roles.get("assistant", ("", ""))[1]
+        stop_strings = []
+        for role, (prefix, _) in self.roles.items():
+            stop = suffix + prefix.rstrip()
+            if role != "assistant" and prefix.strip() and stop not in stop_strings:
+                stop_strings.append(stop)
+        return stop_strings
+
+
+# The "role: content" format shared by most miners.
+PLAIN_TEMPLATE = ChatTemplate(
+    {
+        "system": ("system: ", "\n"),
+        "assistant": ("assistant: ", "\n"),
+        "user": ("user: ", "\n"),
+    },
+    generation_prompt="assistant:",
+)
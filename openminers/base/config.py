@@ -119,6 +119,43 @@ def add_args(cls, parser: argparse.ArgumentParser):
         default=False,
     )
 
+    # Workers.
+    parser.add_argument(
+        "--miner.workers",
+        type=int,
+        help="If > 0, the model is loaded in this many worker processes and the axon process only admits and routes requests.",
+        default=0,
+    )
+
+    parser.add_argument(
+        "--miner.cpus",
+        type=int,
+        nargs="*",
+        help="Pin the miner to these CPUs. With --miner.workers, each worker gets its own share of them.",
+        default=[],
+    )
+
+    # Startup.
+    parser.add_argument(
+        "--miner.warmup.steps",
+        type=int,
+        help="The number of warm-up generations to run before the miner admits requests. Defaults to 1 for local models and 0 for API miners, whose calls are billed.",
+        default=None,
+    )
+    parser.add_argument(
+        "--miner.warmup.prompt",
+        type=str,
+        help="The user message of the warm-up generations.",
+        default="Hello, how are you?",
+    )
+
+    parser.add_argument(
+        "--miner.drain_timeout",
+        type=float,
+        help="How long to wait for requests in flight when stopping (in seconds).",
+        default=10.0,
+    )
+
     # Mocks.
     parser.add_argument(
         "--miner.mock_subtensor",
@@ -0,0 +1,80 @@
+# The MIT License (MIT)
+# Copyright © 2023 Yuma Rao
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+# documentation files (the “Software”), to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+# and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+# the Software.
+
+# THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+# THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+import time
+import torch
+import pytest
+import threading
+from typing import Any, Callable, List, Optional, Tuple
+
+from tokenizers import Tokenizer, Regex, models, pre_tokenizers
+from transformers import PreTrainedTokenizerFast, GPT2Config, GPT2LMHeadModel
+
+
+@pytest.fixture
+def tiny_model_and_tokenizer():
+    """A randomly initialized two layer GPT-2 and a character level tokenizer for it.
+
+    Each character of "abcdefghijklmnopqrstuvwxyz :" is one token and <eos> is token 0.
+    """
+    chars = list("abcdefghijklmnopqrstuvwxyz :")
+    vocab = {"<eos>": 0, **{char: i + 1 for i, char in enumerate(chars)}}
+    tokenizer = Tokenizer(models.WordLevel(vocab, unk_token="<eos>"))
+    tokenizer.pre_tokenizer = pre_tokenizers.Split(Regex("."), "isolated")
+    tokenizer.add_special_tokens(["<eos>"])
+    tokenizer = PreTrainedTokenizerFast(
+        tokenizer_object=tokenizer,
+        eos_token="<eos>",
+        model_input_names=["input_ids", "attention_mask"],
+    )
+
+    torch.manual_seed(0)
+    config = GPT2Config(
+        vocab_size=len(vocab), n_positions=128, n_embd=32, n_layer=2, n_head=2
+    )
+    return GPT2LMHeadModel(config).eval(), tokenizer
+
+
+def _run_concurrently(
+    fn: Callable[[int], Any], num_calls: int, stagger: float = 0.0
+) -> Tuple[List[Any], List[Optional[Exception]]]:
+    results, errors = [None] * num_calls, [None] * num_calls
+
+    def call(index):
+        try:
+            results[index] = fn(index)
+        except Exception as e:
+            errors[index] = e
+
+    threads = []
+    for index in range(num_calls):
+        threads.append(threading.Thread(target=call, args=(index,)))
+        threads[-1].start()
+        # Let the first call take the lead.
+        time.sleep(stagger if index == 0 else 0)
+    for thread in threads:
+        thread.join()
+    return results, errors
+
+
+@pytest.fixture
+def run_concurrently():
+    """Runs fn(index) for num_calls indices on their own threads.
+
+    The first call starts stagger seconds ahead of the rest. Returns the results and the
+    errors raised, both in index order.
+    """
+    return _run_concurrently
@@ -0,0 +1,309 @@
+# The MIT License (MIT)
+# Copyright © 2023 Yuma Rao
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+# documentation files (the “Software”), to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+# and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+# the Software.
+
+# THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+# THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+
+import time
+import queue
+import torch
+import threading
+import bittensor as bt
+import torch.nn.functional as F
+from typing import Iterator, List, Optional, Tuple
+
+from .prefix_cache import PrefixCache
+from .conversation_cache import Conversation, ConversationCache
+from .stopping import StopSequences
+
+
+class GenerationRequest:
+    """A single sequence tracked by the ContinuousBatchingEngine."""
+
+    def __init__(
+        self,
+        input_ids: List[int],
+        max_new_tokens: int,
+        deadline: Optional[float] = None,
+    ):
+        self.input_ids = input_ids
+        self.max_new_tokens = max_new_tokens
+        self.deadline = deadline
+        self.output_ids: List[int] = []
+        self.past: Optional[Tuple[Tuple[torch.Tensor, ...], ...]] = None
+        self.cache_len: int = 0
+        self.conversation: Optional[Conversation] = None
+        self.error: Optional[Exception] = None
+        self.cancelled: bool = False
+        self.done = threading.Event()
+        self.tokens: "queue.Queue[Optional[int]]" = queue.Queue()
+
+    def finish(self, error: Optional[Exception] = None):
+        """Marks the sequence finished, releasing its cache and waking up its readers."""
+        self.error = error
+        self.past = None
+        self.done.set()
+        self.tokens.put(None)
+
+    def cancel(self):
+        """Asks the engine to stop generating this sequence at its next step."""
+        self.cancelled = True
+
+    def wait(self) -> List[int]:
+        """Blocks until the sequence has finished and returns its generated token ids."""
+        self.done.wait()
+        if self.error is not None:
+            raise self.error
+        return self.output_ids
+
+    def stream(self) -> Iterator[int]:
+        """Yields generated token ids as soon as the engine produces them."""
+        while True:
+            token = self.tokens.get()
+            if token is None:
+                break
+            yield token
+        if self.error is not None:
+            raise self.error
+
+
+class ContinuousBatchingEngine:
+    """Iteration-level batching for decoder-only transformers.
+
+    New sequences are prefilled and admitted between decode steps and finished sequences
+    are retired immediately, so a long generation never holds the rest of the batch.
+    Each sequence keeps its own KV cache, which is left-padded to the longest cache in
+    the batch for every decode step. The model must return past key/values in the
+    (batch, heads, seq, head_dim) layout used by GPT-2, GPT-NeoX and LLaMA.
+
+    With a PrefixCache, prompts sharing a cached token prefix only prefill the suffix.
+    With a ConversationCache, sequences added while a conversation is marked on the
+    calling thread resume from the cache of that conversation's previous turn. Each
+    sequence is retired as soon as it ends in one of the stop_sequences.
+    """
+
+    def __init__(
+        self,
+        model: "transformers.PreTrainedModel",
+        eos_token_id: int,
+        max_batch_size: int = 8,
+        device: str = "cpu",
+        do_sample: bool = False,
+        temperature: float = 1.0,
+        prefix_cache: PrefixCache = None,
+        conversation_cache: ConversationCache = None,
+        stop_sequences: StopSequences = None,
+    ):
+        self.model = model
+        self.eos_token_id = eos_token_id
+        self.max_batch_size = max(1, max_batch_size)
+        self.device = device
+        self.do_sample = do_sample
+        self.temperature = temperature
+        self.prefix_cache = prefix_cache
+        self.conversation_cache = conversation_cache
+        self.stop_sequences = stop_sequences
+        self.waiting: "queue.Queue[GenerationRequest]" = queue.Queue()
+        self.active: List[GenerationRequest] = []
+        self.num_steps: int = 0
+        self.lock = threading.Lock()
+        self.thread: threading.Thread = None
+
+    def add(
+        self,
+        input_ids: List[int],
+        max_new_tokens: int,
+        deadline: Optional[float] = None,
+    ) -> GenerationRequest:
+        """Queues a sequence for generation and returns a handle to wait on.
+
+        A sequence still running at deadline (wall-clock seconds) is finished early.
+        """
+        request = GenerationRequest(list(input_ids), max_new_tokens, deadline)
+        if self.conversation_cache is not None:
+            request.conversation = self.conversation_cache.current()
+        self.waiting.put(request)
+        with self.lock:
+            if self.thread is None:
+                self.thread = threading.Thread(target=self._run, daemon=True)
+                self.thread.start()
+        return request
+
+    def submit(self, input_ids: List[int], max_new_tokens: int) -> List[int]:
+        """Generates a completion for input_ids, blocking until it is finished."""
+        return self.add(input_ids, max_new_tokens).wait()
+
+    def _sample(self, logits: torch.FloatTensor) -> torch.LongTensor:
+        if not self.do_sample:
+            return logits.argmax(dim=-1)
+        probs = F.softmax(logits / self.temperature, dim=-1)
+        return torch.multinomial(probs, num_samples=1).squeeze(-1)
+
+    def _append(self, request: GenerationRequest, token: int):
+        request.output_ids.append(token)
+        request.tokens.put(token)
+        if (
+            token == self.eos_token_id
+            or len(request.output_ids) >= request.max_new_tokens
+            or (request.deadline is not None and time.time() >= request.deadline)
+            or (
+                self.stop_sequences is not None
+                and self.stop_sequences.ends_with(request.output_ids)
+            )
+        ):
+            self._finish(request)
+
+    def _finish(self, request: GenerationRequest):
+        # Keep the conversation's cache through the reply, which the caller's next turn
+        # repeats. The past covers every token but the last sampled one.
+        if request.conversation is not None:
+            self.conversation_cache.insert(
+                request.conversation,
+                (request.input_ids + request.output_ids)[: request.cache_len],
+                request.past,
+            )
+        request.finish()
+
+    def _prefill(self, request: GenerationRequest):
+        # Start from the longest cached prefix and only run the model over the rest.
+        prefix_len, past = 0, None
+        if request.conversation is not None:
+            prefix_len, past = self.conversation_cache.lookup(
+                request.conversation, request.input_ids
+            )
+        if prefix_len == 0 and self.prefix_cache is not None:
+            prefix_len, past = self.prefix_cache.lookup(request.input_ids)
+
+        seq_len = len(request.input_ids)
+        outputs = self.model(
+            input_ids=torch.tensor(
+                [request.input_ids[prefix_len:]], device=self.device
+            ),
+            past_key_values=past,
+            attention_mask=torch.ones(
+                (1, seq_len), dtype=torch.long, device=self.device
+            ),
+            position_ids=torch.arange(
+                prefix_len, seq_len, device=self.device
+            ).unsqueeze(0),
+            use_cache=True,
+        )
+        if outputs.past_key_values[0][0].dim() != 4:
+            raise ValueError(
+                "continuous batching requires past key/values shaped (batch, heads, seq, head_dim)"
+            )
+        request.past = outputs.past_key_values
+        request.cache_len = seq_len
+        if self.prefix_cache is not None:
+            self.prefix_cache.insert(request.input_ids, request.past)
+        self._append(request, self._sample(outputs.logits[:, -1, :])[0].item())
+
+    def _decode(self):
+        requests = self.active
+        max_len = max(request.cache_len for request in requests)
+
+        # Left-pad every cache to the longest one and stack them along the batch dim.
+        past = tuple(
+            tuple(
+                torch.cat(
+                    [
+                        F.pad(
+                            request.past[layer][i],
+                            (0, 0, max_len - request.cache_len, 0),
+                        )
+                        for request in requests
+                    ],
+                    dim=0,
+                )
+                for i in range(len(requests[0].past[layer]))
+            )
+            for layer in range(len(requests[0].past))
+        )
+        attention_mask = torch.zeros(
+            (len(requests), max_len + 1), dtype=torch.long, device=self.device
+        )
+        for row, request in enumerate(requests):
+            attention_mask[row, max_len - request.cache_len :] = 1
+        input_ids = torch.tensor(
+            [[request.output_ids[-1]] for request in requests], device=self.device
+        )
+        position_ids = torch.tensor(
+            [[request.cache_len] for request in requests], device=self.device
+        )
+
+        outputs = self.model(
+            input_ids=input_ids,
+            past_key_values=past,
+            attention_mask=attention_mask,
+            position_ids=position_ids,
+            use_cache=True,
+        )
+        tokens = self._sample(outputs.logits[:, -1, :]).tolist()
+
+        # Split the batched cache back into per-sequence caches, dropping the padding.
+        for row, request in enumerate(requests):
+            start = max_len - request.cache_len
+            request.past = tuple(
+                tuple(tensor[row : row + 1, :, start:, :] for tensor in layer)
+                for layer in outputs.past_key_values
+            )
+            request.cache_len += 1
+            self._append(request, tokens[row])
+
+    def _admit(self, request: GenerationRequest):
+        if request.cancelled:
+            request.finish()
+            return
+        try:
+            with torch.no_grad():
+                self._prefill(request)
+            if not request.done.is_set():
+                self.active.append(request)
+
+        # A prompt that fails to prefill only fails its own request.
+        except Exception as e:
+            bt.logging.error(f"Error in continuous batching prefill: { e }")
+            request.finish(e)
+
+    def step(self):
+        """Admits waiting sequences, runs one decode step and retires finished sequences."""
+        for request in self.active:
+            if request.cancelled:
+                request.finish()
+        self.active = [r for r in self.active if not r.done.is_set()]
+
+        while len(self.active) < self.max_batch_size and not self.waiting.empty():
+            self._admit(self.waiting.get_nowait())
+
+        if len(self.active) > 0:
+            with torch.no_grad():
+                self._decode()
+            self.active = [r for r in self.active if not r.done.is_set()]
+        self.num_steps += 1
+
+    def _run(self):
+        while True:
+            # Sleep until there is work to do.
+            if len(self.active) == 0:
+                self._admit(self.waiting.get())
+
+            try:
+                self.step()
+
+            # Fail every in-flight sequence so that no caller waits forever.
+            except Exception as e:
+                bt.logging.error(f"Error in continuous batching step: { e }")
+                for request in self.active:
+                    request.finish(e)
+                self.active = []
@@ -0,0 +1,153 @@
+# The MIT License (MIT)
+# Copyright © 2023 Yuma Rao
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+# documentation files (the “Software”), to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+# and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+# the Software.
+
+# THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+# THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+
+import json
+import hashlib
+import threading
+import contextlib
+import contextvars
+from collections import OrderedDict
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from .prefix_cache import PastKeyValues, common_prefix_len, past_nbytes, slice_past
+
+
+def history_hashes(messages: List[Dict[str, str]]) -> List[str]:
+    """Chained hashes of every prefix of the history: hashes[i] covers messages[: i + 1]."""
+    hashes, digest = [], ""
+    for message in messages:
+        payload = json.dumps(message, sort_keys=True, separators=(",", ":"))
+        digest = hashlib.sha256((digest + payload).encode("utf-8")).hexdigest()
+        hashes.append(digest)
+    return hashes
+
+
+class Conversation:
+    """The caller and history of the forward call running on the current thread or task."""
+
+    def __init__(self, hotkey: str, messages: List[Dict[str, str]]):
+        self.hotkey = hotkey
+        self.hashes = history_hashes(messages)
+
+
+class ConversationCache:
+    """Keeps the KV cache of recent conversations so a new turn only prefills what is new.
+
+    Entries are keyed by the caller's hotkey and the hash of the history they were
+    generated from. A request whose history extends a cached one reuses its keys and
+    values up to the first token where the prompts differ. Each conversation keeps only
+    its latest entry and the least recently used conversations are evicted above max_bytes.
+    """
+
+    def __init__(self, max_bytes: int = 4 * 2**30):
+        self.max_bytes = max_bytes
+        self.entries: "OrderedDict[Tuple[str, str], Tuple[Tuple[int, ...], PastKeyValues, int]]" = (
+            OrderedDict()
+        )
+        self.num_bytes: int = 0
+        self.num_hits: int = 0
+        self.num_misses: int = 0
+        self.num_evictions: int = 0
+        self.num_reused_tokens: int = 0
+        self.num_prefilled_tokens: int = 0
+        self.lock = threading.Lock()
+        self.local = contextvars.ContextVar(f"conversation_{ id(self) }", default=None)
+
+    @contextlib.contextmanager
+    def conversation(
+        self, hotkey: Optional[str], messages: List[Dict[str, str]]
+    ) -> Iterator[None]:
+        """Marks the generations started on this thread or task as belonging to hotkey's conversation."""
+        token = self.local.set(
+            Conversation(hotkey, messages) if hotkey is not None else None
+        )
+        try:
+            yield
+        finally:
+            self.local.reset(token)
+
+    def current(self) -> Optional[Conversation]:
+        return self.local.get()
+
+    def _remove(self, key: Tuple[str, str]):
+        _, _, nbytes = self.entries.pop(key)
+        self.num_bytes -= nbytes
+
+    def lookup(
+        self, conversation: Conversation, input_ids: List[int]
+    ) -> Tuple[int, Optional[PastKeyValues]]:
+        """Returns the number of leading input_ids cached for this conversation and their past."""
+        with self.lock:
+            for digest in reversed(conversation.hashes):
+                key = (conversation.hotkey, digest)
+                if key not in self.entries:
+                    continue
+                cached_ids, past, _ = self.entries[key]
+                length = min(
+                    common_prefix_len(cached_ids, input_ids), len(input_ids) - 1
+                )
+                if length == 0:
+                    break
+                self.entries.move_to_end(key)
+                self.num_hits += 1
+                self.num_reused_tokens += length
+                self.num_prefilled_tokens += len(input_ids) - length
+                return length, slice_past(past, length)
+
+            self.num_misses += 1
+            self.num_prefilled_tokens += len(input_ids)
+            return 0, None
+
+    def insert(
+        self, conversation: Conversation, input_ids: List[int], past: PastKeyValues
+    ):
+        """Stores the past of the conversation's latest history and the reply generated to it."""
+        if len(conversation.hashes) == 0:
+            return
+        nbytes = past_nbytes(past)
+        if nbytes > self.max_bytes:
+            return
+
+        with self.lock:
+            # Earlier turns of the same conversation are covered by the new entry.
+            for digest in conversation.hashes:
+                key = (conversation.hotkey, digest)
+                if key in self.entries:
+                    self._remove(key)
+
+            self.entries[(conversation.hotkey, conversation.hashes[-1])] = (
+                tuple(input_ids),
+                past,
+                nbytes,
+            )
+            self.num_bytes += nbytes
+            while self.num_bytes > self.max_bytes:
+                self._remove(next(iter(self.entries)))
+                self.num_evictions += 1
+
+    def stats(self) -> Dict[str, float]:
+        lookups = self.num_hits + self.num_misses
+        return {
+            "conversation_cache_hits": self.num_hits,
+            "conversation_cache_misses": self.num_misses,
+            "conversation_cache_hit_rate": self.num_hits / max(1, lookups),
+            "conversation_cache_evictions": self.num_evictions,
+            "conversation_cache_entries": len(self.entries),
+            "conversation_cache_bytes": self.num_bytes,
+            "conversation_cache_token_reuse": self.num_reused_tokens
+            / max(1, self.num_reused_tokens + self.num_prefilled_tokens),
+        }
@@ -16,21 +16,199 @@
 # DEALINGS IN THE SOFTWARE.
 
 import time
-import wandb
+import queue
 import random
+import threading
+import contextlib
 import bittensor as bt
 import traceback
-from typing import Callable, Dict, List
+from typing import Callable, ContextManager, Dict, Iterable, List, Tuple
 
+from .cache import canonical_hash
+from .shedding import count_tokens
 
-def forward(self, func: Callable, messages: List[Dict[str, str]]) -> str:
+
+_END = object()
+
+
+def _collect_stream(
+    chunks: Iterable[str],
+    start_time: float,
+    deadline: float,
+    context: Callable[[], ContextManager] = contextlib.nullcontext,
+) -> Tuple[str, float, bool]:
+    """Joins streamed chunks until the stream ends or the deadline passes.
+
+    The stream is consumed under context on a helper thread, so a stream which stalls
+    before its next chunk is still cut off at the deadline. It is closed as soon as the
+    helper gets control back. Returns the text, the time to the first chunk and whether
+    the stream was cut off.
+    """
+    received = queue.Queue()
+    stop = threading.Event()
+
+    def consume():
+        iterator = iter(chunks)
+        try:
+            with context():
+                for chunk in iterator:
+                    received.put(chunk)
+                    if stop.is_set():
+                        break
+        except Exception as e:
+            received.put(e)
+        finally:
+            # Closing the stream stops the generation behind it.
+            if hasattr(iterator, "close"):
+                iterator.close()
+            received.put(_END)
+
+    threading.Thread(target=consume, daemon=True).start()
+    text, time_to_first_chunk, truncated = [], None, False
+    try:
+        while True:
+            timeout = None
+            if deadline != float("inf"):
+                timeout = max(0.0, deadline - time.time())
+            try:
+                item = received.get(timeout=timeout)
+            except queue.Empty:
+                truncated = True
+                break
+            if item is _END:
+                break
+            if isinstance(item, Exception):
+                raise item
+            if time_to_first_chunk is None:
+                time_to_first_chunk = time.time() - start_time
+            text.append(item)
+    finally:
+        stop.set()
+    return "".join(text), time_to_first_chunk, truncated
+
+
+def forward(
+    self,
+    func: Callable,
+    messages: List[Dict[str, str]],
+    forward_call: "bt.TextPromptingForwardCall" = None,
+) -> str:
     """ Forwards a list of messages to the miner's forward function."""
 
+    start_time = time.time()
+    response = ""
+    success = 0
+    time_to_first_chunk = None
+    truncated = False
+    deadline = getattr(forward_call, "start_time", start_time) + getattr(
+        forward_call, "timeout", float("inf")
+    )
+
+    # Serve repeated message histories from the cache.
+    cache_key = None
+    if self.cache is not None:
+        cache_key = canonical_hash(messages, self.generation_config())
+        cached = self.cache.get(cache_key)
+        if cached is not None:
+            if self.config.wandb.on:
+                import wandb
+                wandb.log(
+                    {
+                        "forward_response_length": len(cached),
+                        "forward_elapsed": time.time() - start_time,
+                        "forward_was_success": 1,
+                        "forward_was_cached": 1,
+                        **self.cache.stats(),
+                    }
+                )
+            return cached
+
+    priority = getattr(
+        forward_call, "miner_priority", self.config.miner.priority.default
+    )
+
+    # Reject calls which are predicted to miss their deadline before doing any work.
+    if self.shedder is not None:
+        prompt_tokens = sum(count_tokens(message["content"]) for message in messages)
+        shed, reason = self.shedder.should_shed(
+            prompt_tokens,
+            self.max_new_tokens(),
+            deadline - start_time,
+            queue_depth=self.scheduler.queue_depth_ahead(priority, deadline)
+            if self.scheduler
+            else 0,
+            concurrency=self.scheduler.max_concurrency if self.scheduler else 1,
+        )
+        if shed:
+            bt.logging.debug(f"Shed forward call: { reason }")
+            if self.config.wandb.on:
+                import wandb
+                wandb.log(
+                    {
+                        "forward_was_shed": 1,
+                        "shed_reason": reason,
+                        **self.shedder.stats(),
+                    }
+                )
+            return response
+
+    # Wait for our turn in the scheduler, dropping calls which can no longer meet their deadline.
+    if self.scheduler is not None:
+        if not self.scheduler.acquire(priority, deadline):
+            bt.logging.debug(f"Dropped forward call with priority: { priority }")
+            if self.config.wandb.on:
+                import wandb
+                wandb.log(
+                    {
+                        "forward_was_dropped": 1,
+                        "scheduler_dropped": self.scheduler.num_dropped,
+                    }
+                )
+            return response
+
     # Run the subclass forward function.
     try:
-        start_time = time.time()
-        response = func(messages)
+        call_start_time = time.time()
+
+        def call_context():
+            return self.call_context(
+                messages, deadline, getattr(forward_call, "src_hotkey", None)
+            )
+
+        def generate() -> Tuple[str, float, bool]:
+            if self.streaming:
+                return _collect_stream(
+                    self.sync_forward_stream(messages),
+                    start_time,
+                    deadline - self.config.neuron.streaming.deadline_margin,
+                    context=call_context,
+                )
+            with call_context():
+                return func(messages), None, False
+
+        # Share one generation between admitted calls with identical messages. Empty and
+        # cut off answers are not shared, and each caller waits at most until its deadline.
+        if self.coalescer is None:
+            response, time_to_first_chunk, truncated = generate()
+        else:
+            timeout = None
+            if deadline != float("inf"):
+                timeout = max(0.0, deadline - time.time())
+            response, time_to_first_chunk, truncated = self.coalescer.do(
+                cache_key or canonical_hash(messages, self.generation_config()),
+                generate,
+                timeout=timeout,
+                share=lambda result: bool(result[0]) and not result[2],
+            )
         success = 1
+        if cache_key is not None and response and not truncated:
+            self.cache.put(cache_key, response)
+
+        # Calibrate the latency model on the time spent in the miner.
+        if self.shedder is not None and not truncated:
+            self.shedder.observe(
+                prompt_tokens, count_tokens(response), time.time() - call_start_time
+            )
 
     # There was an error in the error function.
     except Exception as e:
@@ -39,15 +217,24 @@ def forward(self, func: Callable, messages: List[Dict[str, str]]) -> str:
         success = 0
 
     finally:
+        if self.scheduler is not None:
+            self.scheduler.release()
+
         # Log the response length and qtime.
         if self.config.wandb.on:
-            wandb.log(
-                {
-                    "forward_response_length": len(response),
-                    "forward_elapsed": time.time() - start_time,
-                    "forward_was_success": success,
-                }
-            )
+            import wandb
+            log = {
+                "forward_response_length": len(response),
+                "forward_elapsed": time.time() - start_time,
+                "forward_was_success": success,
+            }
+            if self.streaming:
+                log["forward_time_to_first_chunk"] = time_to_first_chunk
+                log["forward_was_truncated"] = int(truncated)
+            if self.scheduler is not None:
+                log["scheduler_queue_depth"] = self.scheduler.queue_depth
+                log["scheduler_wait"] = self.scheduler.last_wait
+            wandb.log(log)
 
         # Return the response.
         return response
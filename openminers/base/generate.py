@@ -0,0 +1,304 @@
+# The MIT License (MIT)
+# Copyright © 2023 Yuma Rao
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+# documentation files (the “Software”), to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+# and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+# the Software.
+
+# THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+# THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+
+import time
+import queue
+import torch
+import threading
+from typing import Iterable, Iterator, List, Optional, Union
+from transformers import StoppingCriteria, StoppingCriteriaList
+from transformers.generation.streamers import BaseStreamer
+
+from .output import OutputDecoder
+
+
+Prompt = Union[str, List[int]]
+
+
+def encode_prompt(
+    tokenizer: "transformers.PreTrainedTokenizer", prompt: Prompt
+) -> List[int]:
+    """The token ids of a prompt given either as text or as already encoded ids."""
+    return tokenizer.encode(prompt) if isinstance(prompt, str) else list(prompt)
+
+
+def batch_generate(
+    model: "transformers.PreTrainedModel",
+    tokenizer: "transformers.PreTrainedTokenizer",
+    prompts: List[Prompt],
+    device: str,
+    max_new_tokens: int,
+    engine: "ContinuousBatchingEngine" = None,
+    time_budget: "TimeBudget" = None,
+    stop_sequences: "StopSequences" = None,
+    decoder: OutputDecoder = None,
+    **generate_kwargs,
+) -> List[str]:
+    """Runs a single left-padded generate over all prompts and returns the decoded completions.
+
+    When a continuous batching engine is passed, the prompts are scheduled on it instead
+    and the engine's own sampling settings apply. With a time budget, generation is capped
+    to what fits before the caller's deadline and stops there with what it has so far.
+    Each prompt's generation ends at the first of stop_sequences it produces (the engine
+    uses its own). Completions are decoded from the tokens after each prompt by decoder,
+    which also cuts them at its stop strings.
+    """
+    decoder = decoder or OutputDecoder(tokenizer)
+    deadline = None
+    if time_budget is not None:
+        max_new_tokens = time_budget.max_new_tokens(max_new_tokens)
+        deadline = time_budget.current_deadline()
+    start_time = time.time()
+
+    if engine is not None:
+        requests = [
+            engine.add(
+                encode_prompt(tokenizer, prompt), max_new_tokens, deadline=deadline
+            )
+            for prompt in prompts
+        ]
+        outputs = [request.wait() for request in requests]
+        if time_budget is not None:
+            time_budget.observe(
+                max(len(output) for output in outputs), time.time() - start_time
+            )
+        return [decoder.decode(output) for output in outputs]
+
+    # Decoder-only models must be padded on the left so generation continues from the prompt.
+    tokenizer.padding_side = "left"
+    if tokenizer.pad_token is None:
+        tokenizer.pad_token = tokenizer.eos_token
+
+    if stop_sequences is not None:
+        generate_kwargs = stop_sequences.generate_kwargs(
+            tokenizer.eos_token_id, **generate_kwargs
+        )
+    if time_budget is not None:
+        generate_kwargs["stopping_criteria"] = StoppingCriteriaList(
+            [
+                *generate_kwargs.get("stopping_criteria", []),
+                *time_budget.stopping_criteria(),
+            ]
+        )
+
+    if all(isinstance(prompt, str) for prompt in prompts):
+        inputs = tokenizer(prompts, return_tensors="pt", padding=True)
+    else:
+        inputs = tokenizer.pad(
+            {"input_ids": [encode_prompt(tokenizer, prompt) for prompt in prompts]},
+            return_tensors="pt",
+            padding=True,
+        )
+    inputs = inputs.to(device)
+    with torch.no_grad():
+        output = model.generate(
+            **inputs,
+            max_new_tokens=max_new_tokens,
+            pad_token_id=tokenizer.pad_token_id,
+            **generate_kwargs,
+        )
+
+    # Every row shares the padded prompt length, so the completions start at the same offset.
+    prompt_len = inputs["input_ids"].shape[1]
+    if time_budget is not None:
+        time_budget.observe(output.shape[1] - prompt_len, time.time() - start_time)
+    return decoder.batch_decode(output, prompt_len)
+
+
+class IncrementalDetokenizer:
+    """Turns generated token ids into text deltas as they arrive.
+
+    Only a short window of recent tokens is decoded per step, and text is held back while
+    it ends in an incomplete character, so multi-token characters and tokenizers which
+    merge spaces across tokens stream the same text as a full decode.
+    """
+
+    def __init__(self, tokenizer: "transformers.PreTrainedTokenizer"):
+        self.tokenizer = tokenizer
+        self.ids: List[int] = []
+        self.prefix_offset = 0
+        self.read_offset = 0
+
+    def push(self, token_id: int) -> str:
+        """Adds a token and returns the newly completed text, possibly empty."""
+        self.ids.append(token_id)
+        prefix_text = self.tokenizer.decode(
+            self.ids[self.prefix_offset : self.read_offset], skip_special_tokens=True
+        )
+        new_text = self.tokenizer.decode(
+            self.ids[self.prefix_offset :], skip_special_tokens=True
+        )
+        if len(new_text) <= len(prefix_text) or new_text.endswith("\ufffd"):
+            return ""
+        self.prefix_offset = self.read_offset
+        self.read_offset = len(self.ids)
+        return new_text[len(prefix_text) :]
+
+
+class _TokenStreamer(BaseStreamer):
+    """Hands the tokens produced by model.generate to another thread."""
+
+    def __init__(self):
+        self.tokens: "queue.Queue[Optional[int]]" = queue.Queue()
+        self.skip_prompt = True
+
+    def put(self, value: torch.Tensor):
+        # generate first reports the prompt, then one token per step.
+        if self.skip_prompt:
+            self.skip_prompt = False
+            return
+        for token in value.reshape(-1).tolist():
+            self.tokens.put(token)
+
+    def end(self):
+        self.tokens.put(None)
+
+
+class _Cancelled(StoppingCriteria):
+    def __init__(self, cancelled: threading.Event):
+        self.cancelled = cancelled
+
+    def __call__(
+        self, input_ids: torch.LongTensor, scores: torch.FloatTensor, **kwargs
+    ) -> bool:
+        return self.cancelled.is_set()
+
+
+def stream_generate(
+    model: "transformers.PreTrainedModel",
+    tokenizer: "transformers.PreTrainedTokenizer",
+    prompt: Prompt,
+    device: str,
+    max_new_tokens: int,
+    engine: "ContinuousBatchingEngine" = None,
+    time_budget: "TimeBudget" = None,
+    **generate_kwargs,
+) -> Iterator[str]:
+    """Yields the completion of a single prompt as text chunks while it is generated.
+
+    Closing the generator stops generation at the next token. A time budget caps and
+    stops generation as in batch_generate, and measures its decoding rate from the
+    tokens streamed, including when the stream is closed early.
+    """
+    start_time = time.time()
+    num_tokens = 0
+    deadline = None
+    if time_budget is not None:
+        max_new_tokens = time_budget.max_new_tokens(max_new_tokens)
+        deadline = time_budget.current_deadline()
+        generate_kwargs["stopping_criteria"] = [
+            *generate_kwargs.get("stopping_criteria", []),
+            *time_budget.stopping_criteria(),
+        ]
+
+    detokenizer = IncrementalDetokenizer(tokenizer)
+    if engine is not None:
+        request = engine.add(
+            encode_prompt(tokenizer, prompt), max_new_tokens, deadline=deadline
+        )
+        try:
+            for token in request.stream():
+                num_tokens += 1
+                text = detokenizer.push(token)
+                if text:
+                    yield text
+        finally:
+            request.cancel()
+            if time_budget is not None:
+                time_budget.observe(num_tokens, time.time() - start_time)
+        return
+
+    if tokenizer.pad_token is None:
+        tokenizer.pad_token = tokenizer.eos_token
+    input_ids = torch.tensor([encode_prompt(tokenizer, prompt)])
+    inputs = {
+        "input_ids": input_ids.to(device),
+        "attention_mask": torch.ones_like(input_ids).to(device),
+    }
+    streamer = _TokenStreamer()
+    cancelled = threading.Event()
+    stopping_criteria = StoppingCriteriaList(
+        [*generate_kwargs.pop("stopping_criteria", []), _Cancelled(cancelled)]
+    )
+    errors = []
+
+    def run():
+        try:
+            with torch.no_grad():
+                model.generate(
+                    **inputs,
+                    max_new_tokens=max_new_tokens,
+                    pad_token_id=tokenizer.pad_token_id,
+                    streamer=streamer,
+                    stopping_criteria=stopping_criteria,
+                    **generate_kwargs,
+                )
+        except Exception as e:
+            errors.append(e)
+            streamer.end()
+
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    try:
+        for token in iter(streamer.tokens.get, None):
+            num_tokens += 1
+            text = detokenizer.push(token)
+            if text:
+                yield text
+    finally:
+        cancelled.set()
+        if time_budget is not None:
+            time_budget.observe(num_tokens, time.time() - start_time)
+    thread.join()
+    if errors:
+        raise errors[0]
+
+
+def truncate_stream(chunks: Iterable[str], stop_strings: List[str]) -> Iterator[str]:
+    """Passes chunks through until one of stop_strings appears, which is dropped with the rest.
+
+    Text which could be the start of a stop string is held back until it is resolved.
+    """
+    held = ""
+    chunks = iter(chunks)
+    try:
+        for chunk in chunks:
+            held += chunk
+            positions = [held.find(stop) for stop in stop_strings if stop in held]
+            if positions:
+                if min(positions) > 0:
+                    yield held[: min(positions)]
+                return
+            keep = max(
+                (
+                    size
+                    for stop in stop_strings
+                    for size in range(1, len(stop))
+                    if held.endswith(stop[:size])
+                ),
+                default=0,
+            )
+            if len(held) > keep:
+                yield held[: len(held) - keep]
+                held = held[len(held) - keep :]
+        if held:
+            yield held
+
+    # Stop the underlying generation as soon as the rest is no longer needed.
+    finally:
+        if hasattr(chunks, "close"):
+            chunks.close()
@@ -0,0 +1,258 @@
+# The MIT License (MIT)
+# Copyright © 2023 Yuma Rao
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+# documentation files (the “Software”), to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+# and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+# the Software.
+
+# THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+# THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+import copy
+import time
+import asyncio
+import argparse
+import bittensor as bt
+from collections import deque
+from typing import Any, Callable, Dict, List, Optional
+
+from .miner import BaseMiner
+from .async_prompting_miner import AsyncBasePromptingMiner
+
+
+class LatencyWindow:
+    """The most recent latencies of a provider, for percentile estimates."""
+
+    def __init__(self, size: int = 1000):
+        self.latencies = deque(maxlen=size)
+
+    def __len__(self) -> int:
+        return len(self.latencies)
+
+    def observe(self, latency: float):
+        self.latencies.append(latency)
+
+    def percentile(self, percentile: float) -> float:
+        latencies = sorted(self.latencies)
+        index = round(percentile / 100 * (len(latencies) - 1))
+        return latencies[min(max(index, 0), len(latencies) - 1)]
+
+
+class Hedger:
+    """Sends a duplicate request to a second provider when the first is slower than usual.
+
+    The hedge goes out once the primary has taken longer than the given percentile of its
+    recent latencies. The first answer wins and the other request is cancelled. Each call
+    earns budget hedges, and a hedge spends one, so at most a budget fraction of calls are
+    hedged over time (with bursts of up to max_burst).
+    """
+
+    def __init__(
+        self,
+        percentile: float = 95.0,
+        budget: float = 0.05,
+        max_burst: float = 10.0,
+        min_observations: int = 20,
+        window: int = 1000,
+    ):
+        self.percentile = percentile
+        self.budget = budget
+        self.max_burst = max_burst
+        self.min_observations = min_observations
+        self.primary_latency = LatencyWindow(window)
+        self.tokens: float = 0.0
+        self.num_calls: int = 0
+        self.num_hedged: int = 0
+        self.num_won: int = 0
+        self.num_denied: int = 0
+
+    def delay(self) -> Optional[float]:
+        """How long to wait on the primary before hedging, or None while calibrating."""
+        if len(self.primary_latency) < self.min_observations:
+            return None
+        return self.primary_latency.percentile(self.percentile)
+
+    async def run(self, primary: Callable, secondary: Callable, *args) -> Any:
+        """Awaits primary(*args), hedging with secondary(*args) if it is too slow."""
+        self.num_calls += 1
+        self.tokens = min(self.max_burst, self.tokens + self.budget)
+        start_time = time.time()
+        first = asyncio.ensure_future(primary(*args))
+
+        delay = self.delay()
+        if delay is not None:
+            done, _ = await asyncio.wait({first}, timeout=delay)
+            if not done:
+                if self.tokens >= 1:
+                    return await self._hedge(first, secondary, args, start_time)
+                self.num_denied += 1
+
+        result = await first
+        self.primary_latency.observe(time.time() - start_time)
+        return result
+
+    async def _hedge(
+        self, first: "asyncio.Future", secondary: Callable, args, start_time: float
+    ) -> Any:
+        self.tokens -= 1
+        self.num_hedged += 1
+        second = asyncio.ensure_future(secondary(*args))
+        pending = {first, second}
+        try:
+            while pending:
+                done, pending = await asyncio.wait(
+                    pending, return_when=asyncio.FIRST_COMPLETED
+                )
+                for task in done:
+                    error = task.exception()
+                    if error is not None:
+                        continue
+                    if task is second:
+                        self.num_won += 1
+                    if task is first or not first.done():
+                        # A primary cancelled here took at least this long. Leaving it out
+                        # would bias the window towards fast calls and hedge more and more.
+                        self.primary_latency.observe(time.time() - start_time)
+                    return task.result()
+            raise error
+        finally:
+            for task in pending:
+                task.cancel()
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            "hedge_rate": self.num_hedged / max(self.num_calls, 1),
+            "hedge_win_rate": self.num_won / max(self.num_hedged, 1),
+            "hedge_denied": self.num_denied,
+            "hedge_delay": self.delay() or 0.0,
+        }
+
+
+class HedgedMiner(AsyncBasePromptingMiner):
+    """Serves forward calls from one API miner, hedged with another.
+
+    Build it with wrap(), e.g. HedgedMiner.wrap(OpenAIMiner, CohereMiner)(). Each provider is
+    configured by its own arguments; the axon, wallet and subtensor belong to this miner.
+    """
+
+    primary_cls: type = None
+    secondary_cls: type = None
+
+    @classmethod
+    def wrap(cls, primary_cls: type, secondary_cls: type) -> type:
+        for miner_cls in (primary_cls, secondary_cls):
+            if not issubclass(miner_cls, AsyncBasePromptingMiner):
+                raise TypeError(
+                    f"{ miner_cls.__name__ } is not an AsyncBasePromptingMiner and cannot be hedged"
+                )
+        return type(
+            f"{ primary_cls.__name__ }{ secondary_cls.__name__ }Hedged",
+            (cls,),
+            {"primary_cls": primary_cls, "secondary_cls": secondary_cls},
+        )
+
+    @classmethod
+    def add_args(cls, parser: argparse.ArgumentParser):
+        cls.primary_cls.add_args(parser)
+        cls.secondary_cls.add_args(parser)
+        parser.add_argument(
+            "--hedging.percentile",
+            type=float,
+            help="Hedge once the primary provider is slower than this percentile of its recent latencies.",
+            default=95.0,
+        )
+        parser.add_argument(
+            "--hedging.budget",
+            type=float,
+            help="The largest fraction of forward calls which may be hedged.",
+            default=0.05,
+        )
+        parser.add_argument(
+            "--hedging.max_burst",
+            type=float,
+            help="The most hedges which may be sent back to back when budget has built up.",
+            default=10.0,
+        )
+        parser.add_argument(
+            "--hedging.min_observations",
+            type=int,
+            help="Number of primary latencies to observe before hedging starts.",
+            default=20,
+        )
+
+    def __init__(
+        self,
+        config: "bt.Config" = None,
+        axon: "bt.axon" = None,
+        wallet: "bt.Wallet" = None,
+        subtensor: "bt.Subtensor" = None,
+    ):
+        # The providers only run forward, this miner serves the axon.
+        provider_config = self.config()
+        provider_config.merge(copy.deepcopy(config or BaseMiner.config()))
+        provider_config.miner.is_worker = True
+        self.primary = self.primary_cls(config=copy.deepcopy(provider_config))
+        self.secondary = self.secondary_cls(config=copy.deepcopy(provider_config))
+        self.hedger = Hedger(
+            percentile=provider_config.hedging.percentile,
+            budget=provider_config.hedging.budget,
+            max_burst=provider_config.hedging.max_burst,
+            min_observations=provider_config.hedging.min_observations,
+        )
+        super(HedgedMiner, self).__init__(
+            config=config, axon=axon, wallet=wallet, subtensor=subtensor
+        )
+
+        # Run both providers' requests on this miner's loop and connection pool, closing their own.
+        for provider in (self.primary, self.secondary):
+            provider.event_loop.run(provider.http_client.aclose)
+            provider.event_loop.stop()
+            provider.event_loop = self.event_loop
+            provider.http_client = self.http_client
+
+    def max_new_tokens(self) -> int:
+        return max(self.primary.max_new_tokens(), self.secondary.max_new_tokens())
+
+    def generation_config(self) -> Dict[str, Any]:
+        return {
+            "primary": dict(self.primary.generation_config()),
+            "secondary": dict(self.secondary.generation_config()),
+        }
+
+    @staticmethod
+    def provider_forward(provider: AsyncBasePromptingMiner) -> Callable:
+        """provider.forward, run under the caller's deadline and hotkey."""
+
+        async def forward(
+            messages: List[Dict[str, str]],
+            deadline: Optional[float] = None,
+            hotkey: Optional[str] = None,
+        ) -> str:
+            with provider.call_context(messages, deadline, hotkey):
+                return await provider.forward(messages)
+
+        return forward
+
+    def sync_forward(self, messages: List[Dict[str, str]]) -> str:
+        # The forward call is only known on the axon thread, so read it before the loop runs.
+        return self.event_loop.run(self.forward, messages, *self.current_call())
+
+    async def forward(
+        self,
+        messages: List[Dict[str, str]],
+        deadline: Optional[float] = None,
+        hotkey: Optional[str] = None,
+    ) -> str:
+        return await self.hedger.run(
+            self.provider_forward(self.primary),
+            self.provider_forward(self.secondary),
+            messages,
+            deadline,
+            hotkey,
+        )
@@ -0,0 +1,147 @@
+# The MIT License (MIT)
+# Copyright © 2023 Yuma Rao
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+# documentation files (the “Software”), to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+# and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+# the Software.
+
+# THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+# THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+
+import json
+import httpx
+import asyncio
+import contextlib
+import importlib.util
+import bittensor as bt
+from typing import Any, AsyncIterator, Dict, Optional
+
+
+class PooledHTTPClient:
+    """Keep-alive connection pool shared by the API-backed miners.
+
+    Wraps a single httpx.AsyncClient so every provider call reuses open connections
+    (and TLS sessions) instead of paying a new handshake per request. HTTP/2 is used
+    when the optional h2 package is installed. Must be used from one event loop.
+    """
+
+    def __init__(
+        self,
+        max_connections: int = 100,
+        max_keepalive_connections: int = 20,
+        keepalive_expiry: float = 30.0,
+        max_connections_per_host: int = 0,
+        http2: bool = True,
+        timeout: float = 60.0,
+    ):
+        self.http2 = http2 and importlib.util.find_spec("h2") is not None
+        self.client = httpx.AsyncClient(
+            http2=self.http2,
+            timeout=timeout,
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_keepalive_connections,
+                keepalive_expiry=keepalive_expiry,
+            ),
+        )
+        self.max_connections_per_host = max_connections_per_host
+        self.host_semaphores: Dict[str, asyncio.Semaphore] = {}
+        self.num_requests: int = 0
+        self.num_new_connections: int = 0
+
+    async def _trace(self, event_name: str, info: Dict[str, Any]):
+        # httpcore reports every freshly opened TCP connection.
+        if event_name == "connection.connect_tcp.complete":
+            self.num_new_connections += 1
+
+    def _host_semaphore(self, url: str) -> Optional[asyncio.Semaphore]:
+        if self.max_connections_per_host <= 0:
+            return None
+        return self.host_semaphores.setdefault(
+            httpx.URL(url).host, asyncio.Semaphore(self.max_connections_per_host)
+        )
+
+    async def request(self, method: str, url: str, **kwargs) -> httpx.Response:
+        """Sends a request over the pool, waiting for a per-host slot if one is configured."""
+        semaphore = self._host_semaphore(url)
+        self.num_requests += 1
+        extensions = {"trace": self._trace}
+        if semaphore is None:
+            return await self.client.request(
+                method, url, extensions=extensions, **kwargs
+            )
+        async with semaphore:
+            return await self.client.request(
+                method, url, extensions=extensions, **kwargs
+            )
+
+    async def post_json(
+        self, url: str, payload: Dict[str, Any], headers: Dict[str, str] = None
+    ) -> Dict[str, Any]:
+        """POSTs a JSON payload and returns the decoded JSON response."""
+        response = await self.request("POST", url, json=payload, headers=headers)
+        response.raise_for_status()
+        return response.json()
+
+    async def stream_json(
+        self, url: str, payload: Dict[str, Any], headers: Dict[str, str] = None
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """POSTs a JSON payload and yields the JSON events of the streamed response.
+
+        Accepts both server-sent events ("data: {...}" lines ending with "data: [DONE]")
+        and newline delimited JSON.
+        """
+        async with contextlib.AsyncExitStack() as stack:
+            semaphore = self._host_semaphore(url)
+            if semaphore is not None:
+                await stack.enter_async_context(semaphore)
+            self.num_requests += 1
+            response = await stack.enter_async_context(
+                self.client.stream(
+                    "POST",
+                    url,
+                    json=payload,
+                    headers=headers,
+                    extensions={"trace": self._trace},
+                )
+            )
+            response.raise_for_status()
+            async for line in response.aiter_lines():
+                if line.startswith("data:"):
+                    line = line[len("data:") :]
+                line = line.strip()
+                if line == "[DONE]":
+                    break
+                if line and not line.startswith(":"):
+                    yield json.loads(line)
+
+    def stats(self) -> Dict[str, float]:
+        reused = self.num_requests - self.num_new_connections
+        return {
+            "http_requests": self.num_requests,
+            "http_new_connections": self.num_new_connections,
+            "http_connection_reuse": reused / max(1, self.num_requests),
+        }
+
+    async def aclose(self):
+        await self.client.aclose()
+
+
+def pooled_http_client(config: "bt.Config") -> PooledHTTPClient:
+    """Builds the pooled client from the --neuron.http.* options."""
+    bt.logging.debug(f"Creating pooled HTTP client with config: { config.neuron.http }")
+    return PooledHTTPClient(
+        max_connections=config.neuron.http.max_connections,
+        max_keepalive_connections=config.neuron.http.max_keepalive_connections,
+        keepalive_expiry=config.neuron.http.keepalive_expiry,
+        max_connections_per_host=config.neuron.http.max_connections_per_host,
+        http2=not config.neuron.http.no_http2,
+        timeout=config.neuron.http.timeout,
+    )
@@ -0,0 +1,159 @@
+# The MIT License (MIT)
+# Copyright © 2023 Yuma Rao
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+# documentation files (the “Software”), to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+# and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+# the Software.
+
+# THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+# THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+
+import time
+import threading
+import importlib.util
+import bittensor as bt
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, Tuple
+
+
+class StartupTimer:
+    """Times the phases of a miner's startup and how long it took to become ready."""
+
+    def __init__(self):
+        self.start_time = time.time()
+        self.ready_time: float = None
+        self.phase_times: Dict[str, float] = {}
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        start_time = time.time()
+        try:
+            yield
+        finally:
+            self.phase_times[name] = time.time() - start_time
+
+    def ready(self):
+        if self.ready_time is None:
+            self.ready_time = time.time()
+
+    @property
+    def time_to_ready(self) -> float:
+        """Seconds from construction until ready, or so far if not ready yet."""
+        return (self.ready_time or time.time()) - self.start_time
+
+    def stats(self) -> Dict[str, float]:
+        stats = {"time_to_ready": self.time_to_ready}
+        for name, duration in self.phase_times.items():
+            stats[f"startup_{name}_time"] = duration
+        return stats
+
+
+def placement_kwargs(device: str) -> Dict[str, Any]:
+    """from_pretrained arguments which load the weights straight onto device.
+
+    Without them, from_pretrained builds the model on the cpu with random weights, copies
+    the checkpoint in and only then is the model moved to the device. Both need accelerate.
+    """
+    if importlib.util.find_spec("accelerate") is None:
+        return {}
+    kwargs = {"low_cpu_mem_usage": True}
+    if str(device) != "cpu":
+        kwargs["device_map"] = {"": device}
+    return kwargs
+
+
+class ModelLoader:
+    """Loads a causal LM and its tokenizer in the background.
+
+    The tokenizer and the model load on their own threads, so they overlap with each other
+    and with whatever the miner does until wait() is called, such as syncing the
+    metagraph. from_pretrained memory-maps safetensors checkpoints when the model has one,
+    and with accelerate installed the weights are placed on the device as they are read
+    instead of being copied there afterwards. With a quantization, the model is loaded
+    through it instead, which also reuses its cached quantized model if there is one.
+    """
+
+    def __init__(
+        self,
+        model_name: str,
+        device: str = "cpu",
+        tokenizer_kwargs: Dict[str, Any] = None,
+        startup: StartupTimer = None,
+        quantization: "DynamicQuantization" = None,
+        **model_kwargs,
+    ):
+        if quantization is not None and str(device) != "cpu":
+            raise ValueError(
+                f"Dynamic quantization runs on the cpu, but the device is {device}."
+            )
+        self.model_name = model_name
+        self.device = device
+        self.tokenizer_kwargs = tokenizer_kwargs or {}
+        self.model_kwargs = {**placement_kwargs(device), **model_kwargs}
+        self.startup = startup or StartupTimer()
+        self.quantization = quantization
+        self.results: Dict[str, Any] = {}
+        self.errors: Dict[str, BaseException] = {}
+        self.threads = []
+
+    def _load(self, name: str, fn, *args, **kwargs):
+        try:
+            with self.startup.phase(name):
+                self.results[name] = fn(*args, **kwargs)
+        except BaseException as e:
+            self.errors[name] = e
+
+    def start(self) -> "ModelLoader":
+        from transformers import AutoModelForCausalLM, AutoTokenizer
+
+        bt.logging.info(f"Loading {self.model_name}")
+        load_model = AutoModelForCausalLM.from_pretrained
+        if self.quantization is not None:
+            load_model = self.quantization.load
+        self.threads = [
+            threading.Thread(
+                target=self._load,
+                args=("tokenizer", AutoTokenizer.from_pretrained, self.model_name),
+                kwargs=self.tokenizer_kwargs,
+                daemon=True,
+            ),
+            threading.Thread(
+                target=self._load,
+                args=("model", load_model, self.model_name),
+                kwargs=self.model_kwargs,
+                daemon=True,
+            ),
+        ]
+        for thread in self.threads:
+            thread.start()
+        return self
+
+    def wait(
+        self,
+    ) -> Tuple["transformers.PreTrainedModel", "transformers.PreTrainedTokenizer"]:
+        """Blocks until both are loaded and returns (model, tokenizer)."""
+        for thread in self.threads:
+            thread.join()
+        for error in self.errors.values():
+            raise error
+        model = self.results["model"]
+        if "device_map" not in self.model_kwargs and str(self.device) != "cpu":
+            model = model.to(self.device)
+        bt.logging.info(
+            f"Loaded {self.model_name} in {self.startup.phase_times['model']:.1f}s"
+        )
+        return model, self.results["tokenizer"]
+
+
+def load_model_and_tokenizer(
+    model_name: str, device: str = "cpu", **kwargs
+) -> Tuple["transformers.PreTrainedModel", "transformers.PreTrainedTokenizer"]:
+    """Loads a model and its tokenizer concurrently, see ModelLoader."""
+    return ModelLoader(model_name, device=device, **kwargs).start().wait()
@@ -15,21 +15,48 @@
 # OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
 # DEALINGS IN THE SOFTWARE.
 
+import os
 import copy
-import wandb
 import argparse
 import threading
 import bittensor as bt
 
 from abc import ABC, abstractmethod
-from typing import List, Dict, Union, Tuple
+from typing import Iterable, List, Dict, Union, Tuple
 
 from .run import run
 from .mock import MockSubtensor
+from .loading import StartupTimer
+from .readiness import Readiness
 from .config import config, check_config
 
 
+def pin_to_cpus(cpus: Iterable[int]):
+    """Restricts the calling process to cpus, where the platform supports it."""
+    cpus = set(cpus)
+    if not hasattr(os, "sched_setaffinity"):
+        bt.logging.warning("CPU pinning is not supported on this platform")
+        return
+    os.sched_setaffinity(0, cpus)
+    bt.logging.info(f"Pinned process { os.getpid() } to CPUs { sorted(cpus) }")
+
+
 class BaseMiner(ABC):
+    def __new__(cls, *args, **kwargs):
+        # With --miner.workers, serve this class from worker processes instead.
+        config = kwargs.get("config", args[0] if args else None)
+        if not hasattr(config, "get"):
+            # Not given, or a subclass takes other positional arguments first.
+            config = BaseMiner.config()
+        miner_config = config.get("miner") or {}
+        if (miner_config.get("workers") or 0) > 0 and not miner_config.get(
+            "is_worker", False
+        ):
+            from .workers import WorkerPoolMiner
+
+            return WorkerPoolMiner.wrap(cls)(*args, **kwargs)
+        return super(BaseMiner, cls).__new__(cls)
+
     @classmethod
     def config(cls) -> "bt.Config":
         return config(cls)
@@ -58,6 +85,8 @@ class BaseMiner(ABC):
         wallet: "bt.Wallet" = None,
         subtensor: "bt.Subtensor" = None,
     ):
+        self.startup = StartupTimer()
+        self.readiness = Readiness()
 
         # Instantiate and check configs.
         # Grab super config.
@@ -73,15 +102,31 @@ class BaseMiner(ABC):
         # Instantiate logging.
         bt.logging(config=self.config, logging_dir=self.config.miner.full_path)
 
+        # Pin the process, worker processes are pinned by the pool.
+        if self.config.miner.get("cpus") and not self.config.miner.get("workers"):
+            pin_to_cpus(self.config.miner.cpus)
+
+        # Worker processes only run forward, the parent process serves the axon.
+        self.is_worker = bool(self.config.miner.get("is_worker", False))
+        if self.is_worker:
+            self.subtensor = self.metagraph = self.wallet = self.axon = None
+            self.should_exit: bool = False
+            self.is_running: bool = False
+            self.thread: threading.Thread = None
+            return
+
         # Instantiate subtensor.
         if self.config.miner.mock_subtensor:
             self.subtensor = subtensor or MockSubtensor(self.config)
         else:
             self.subtensor = subtensor or bt.subtensor(self.config)
 
-        # Instantiate metagraph.
+        # Instantiate metagraph, syncing it in the background while the model loads.
         self.metagraph = self.subtensor.metagraph(self.config.netuid, sync=False)
-        self.metagraph.sync(lite = True, subtensor=self.subtensor)
+        self.metagraph_sync = threading.Thread(
+            target=self._sync_metagraph, daemon=True
+        )
+        self.metagraph_sync.start()
 
         # Instantiate wallet.
         self.wallet = wallet or bt.wallet(self.config)
@@ -93,6 +138,7 @@ class BaseMiner(ABC):
 
         # Init wandb.
         if self.config.wandb.on:
+            import wandb
             wandb.init(
                 project=self.config.wandb.project_name,
                 entity=self.config.wandb.entity,
@@ -107,6 +153,23 @@ class BaseMiner(ABC):
         self.is_running: bool = False
         self.thread: threading.Thread = None
 
+    def _sync_metagraph(self):
+        with self.startup.phase("metagraph"):
+            self.metagraph.sync(lite=True, subtensor=self.subtensor)
+
+    def warmup(self):
+        """Runs before the axon is started, so the first requests don't pay for cold starts."""
+        pass
+
+    def wait_until_ready(self):
+        """Finishes the metagraph sync and the warm-up, then starts admitting requests."""
+        self.metagraph_sync.join()
+        self.readiness.transition(Readiness.WARMING)
+        self.warmup()
+        self.startup.ready()
+        self.readiness.transition(Readiness.READY)
+        bt.logging.info(f"Miner ready in {self.startup.time_to_ready:.1f}s")
+
     def run(self):
         run(self)
 
@@ -122,6 +185,10 @@ class BaseMiner(ABC):
     def stop_run_thread(self):
         if self.is_running:
             bt.logging.debug(f"Stopping miner background thread...")
+            if not self.readiness.drain(self.config.miner.drain_timeout):
+                bt.logging.warning(
+                    f"Stopping with { self.readiness.in_flight } requests in flight"
+                )
             self.should_exit = True
             self.thread.join(5)
             bt.logging.debug(f"Stopped")
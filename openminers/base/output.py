@@ -0,0 +1,91 @@
+# The MIT License (MIT)
+# Copyright © 2023 Yuma Rao
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+# documentation files (the “Software”), to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+# and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+# the Software.
+
+# THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+# THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+
+import re
+import time
+from typing import Any, Iterable, List, Sequence
+
+
+class OutputDecoder:
+    """Recovers a completion from generated token ids by slicing them at the prompt length.
+
+    Only the new tokens are decoded, so nothing of the prompt has to be searched for and
+    removed from the text. The completion is then cut at the first stop string, which
+    marks where the model ran on into the next turn.
+    """
+
+    def __init__(
+        self,
+        tokenizer: "transformers.PreTrainedTokenizer",
+        stop_strings: Iterable[str] = (),
+        strip: bool = False,
+    ):
+        self.tokenizer = tokenizer
+        self.stop_strings = [text for text in stop_strings if text]
+        self.strip = strip
+        # One alternation finds the earliest stop string in a single scan of the text.
+        self.stop_pattern = (
+            re.compile("|".join(re.escape(text) for text in self.stop_strings))
+            if self.stop_strings
+            else None
+        )
+
+    def trim(self, text: str) -> str:
+        """Cuts text at its first stop string."""
+        if self.stop_pattern is not None:
+            match = self.stop_pattern.search(text)
+            if match is not None:
+                text = text[: match.start()]
+        return text.strip() if self.strip else text
+
+    def decode(self, token_ids: Sequence[int], prompt_len: int = 0) -> str:
+        """The completion in one generated sequence which starts with prompt_len prompt tokens."""
+        return self.trim(
+            self.tokenizer.decode(token_ids[prompt_len:], skip_special_tokens=True)
+        )
+
+    def batch_decode(
+        self, token_ids: "torch.LongTensor", prompt_len: int = 0
+    ) -> List[str]:
+        """The completion in each row of a generate output with a shared prompt length."""
+        return [
+            self.trim(text)
+            for text in self.tokenizer.batch_decode(
+                token_ids[:, prompt_len:], skip_special_tokens=True
+            )
+        ]
+
+    def pipeline(
+        self,
+        pipe: "transformers.Pipeline",
+        prompt: str,
+        time_budget: "TimeBudget" = None,
+        **generate_kwargs: Any,
+    ) -> str:
+        """Runs a text-generation pipeline which only returns the text after the prompt.
+
+        With a time budget, the decoding rate of the generation is measured for it.
+        """
+        start_time = time.time()
+        outputs = pipe(prompt, return_full_text=False, **generate_kwargs)
+        text = outputs[0]["generated_text"]
+        if time_budget is not None:
+            time_budget.observe(
+                len(self.tokenizer.encode(text, add_special_tokens=False)),
+                time.time() - start_time,
+            )
+        return self.trim(text)
@@ -0,0 +1,133 @@
+# The MIT License (MIT)
+# Copyright © 2023 Yuma Rao
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+# documentation files (the “Software”), to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+# and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+# the Software.
+
+# THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+# THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+
+import torch
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional, Sequence, Tuple
+
+# Legacy past key/values: one (key, value) tuple per layer, each (batch, heads, seq, head_dim).
+PastKeyValues = Tuple[Tuple[torch.Tensor, ...], ...]
+
+
+def past_nbytes(past: PastKeyValues) -> int:
+    return sum(
+        tensor.numel() * tensor.element_size() for layer in past for tensor in layer
+    )
+
+
+def slice_past(past: PastKeyValues, length: int) -> PastKeyValues:
+    """Returns views of the first length positions of every cached key and value."""
+    return tuple(tuple(tensor[:, :, :length, :] for tensor in layer) for layer in past)
+
+
+def common_prefix_len(a: Sequence[int], b: Sequence[int]) -> int:
+    n = min(len(a), len(b))
+    for i in range(n):
+        if a[i] != b[i]:
+            return i
+    return n
+
+
+class PrefixCache:
+    """Memory bounded LRU store of prompt KV caches, reused across prompts sharing a token prefix.
+
+    Every prefilled prompt is stored under its token ids. A new prompt reuses the keys and
+    values of the longest prefix it shares with any stored prompt, so only the remaining
+    suffix has to be prefilled. Since stored caches are never modified, lookups return views.
+    """
+
+    def __init__(self, max_bytes: int = 2 * 2**30, min_prefix_len: int = 16):
+        self.max_bytes = max_bytes
+        self.min_prefix_len = max(1, min_prefix_len)
+        self.entries: "OrderedDict[Tuple[int, ...], Tuple[PastKeyValues, int]]" = (
+            OrderedDict()
+        )
+        self.num_bytes: int = 0
+        self.num_hits: int = 0
+        self.num_misses: int = 0
+        self.num_evictions: int = 0
+        self.num_reused_tokens: int = 0
+        self.num_prefilled_tokens: int = 0
+        self.lock = threading.Lock()
+
+    def _remove(self, key: Tuple[int, ...]):
+        _, nbytes = self.entries.pop(key)
+        self.num_bytes -= nbytes
+
+    def lookup(self, input_ids: List[int]) -> Tuple[int, Optional[PastKeyValues]]:
+        """Returns the number of leading input_ids that are cached and their past key/values.
+
+        At least one token is always left to prefill so the model produces next-token logits.
+        """
+        with self.lock:
+            best_key, best_len = None, 0
+            for key in self.entries:
+                length = common_prefix_len(key, input_ids)
+                if length > best_len:
+                    best_key, best_len = key, length
+            best_len = min(best_len, len(input_ids) - 1)
+
+            if best_len < self.min_prefix_len:
+                self.num_misses += 1
+                self.num_prefilled_tokens += len(input_ids)
+                return 0, None
+
+            self.entries.move_to_end(best_key)
+            self.num_hits += 1
+            self.num_reused_tokens += best_len
+            self.num_prefilled_tokens += len(input_ids) - best_len
+            return best_len, slice_past(self.entries[best_key][0], best_len)
+
+    def insert(self, input_ids: List[int], past: PastKeyValues):
+        """Stores the past key/values of a freshly prefilled prompt."""
+        key = tuple(input_ids)
+        if len(key) < self.min_prefix_len:
+            return
+        nbytes = past_nbytes(past)
+        if nbytes > self.max_bytes:
+            return
+
+        with self.lock:
+            for other in list(self.entries):
+                # A stored prompt which extends this one already holds its cache.
+                if len(other) >= len(key) and other[: len(key)] == key:
+                    self.entries.move_to_end(other)
+                    return
+                # Stored prompts which this one extends are now redundant.
+                if key[: len(other)] == other:
+                    self._remove(other)
+
+            self.entries[key] = (past, nbytes)
+            self.num_bytes += nbytes
+            while self.num_bytes > self.max_bytes:
+                self._remove(next(iter(self.entries)))
+                self.num_evictions += 1
+
+    def stats(self) -> Dict[str, float]:
+        lookups = self.num_hits + self.num_misses
+        return {
+            "prefix_cache_hits": self.num_hits,
+            "prefix_cache_misses": self.num_misses,
+            "prefix_cache_hit_rate": self.num_hits / max(1, lookups),
+            "prefix_cache_evictions": self.num_evictions,
+            "prefix_cache_entries": len(self.entries),
+            "prefix_cache_bytes": self.num_bytes,
+            "prefix_cache_reused_tokens": self.num_reused_tokens,
+            "prefix_cache_token_reuse": self.num_reused_tokens
+            / max(1, self.num_reused_tokens + self.num_prefilled_tokens),
+        }
@@ -15,7 +15,6 @@
 # OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
 # DEALINGS IN THE SOFTWARE.
 
-import wandb
 import bittensor as bt
 from typing import List, Dict, Union, Tuple, Callable
 
@@ -62,6 +61,7 @@ def priority(
 
         # Log the priority to wandb.
         if self.config.wandb.on:
+            import wandb
             wandb.log({"priority": priority, "hotkey": forward_call.src_hotkey})
 
         # Return the priority.
@@ -15,14 +15,26 @@
 # OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
 # DEALINGS IN THE SOFTWARE.
 
+import time
 import torch
 import argparse
+import threading
+import contextlib
 import bittensor as bt
 
 from abc import ABC
-from typing import List, Dict, Union, Tuple
+from typing import Any, Iterator, List, Dict, Optional, Union, Tuple
 
 from .forward import forward
+from .cache import ResponseCache, is_deterministic
+from .singleflight import SingleFlight
+from .prefix_cache import PrefixCache
+from .conversation_cache import ConversationCache
+from .truncation import HistoryTruncator
+from .chat_template import ChatTemplate
+from .batching import RequestBatcher
+from .scheduler import PriorityScheduler
+from .shedding import LoadShedder, count_tokens
 from .priority import priority
 from .blacklist import blacklist
 from .miner import BaseMiner
@@ -50,19 +62,467 @@ class BasePromptingMiner(BaseMiner, ABC):
         parser.add_argument(
             "--neuron.max_sequence_len",
             type=int,
-            help="The maximum sequence length for forward requests.",
+            help="The maximum number of tokens in a prompt plus its generation. Older turns of longer histories are dropped. -1 for no limit.",
             default=-1,
         )
+        parser.add_argument(
+            "--neuron.batch_wait_ms",
+            type=float,
+            help="How long to wait for more requests before running a batch (in milliseconds).",
+            default=10.0,
+        )
+        parser.add_argument(
+            "--neuron.continuous_batching",
+            action="store_true",
+            help="If set, local model miners schedule generations on a continuous batching engine of size --neuron.max_batch_size.",
+            default=False,
+        )
+        parser.add_argument(
+            "--neuron.prefix_cache.on",
+            action="store_true",
+            help="If set, local model miners reuse the KV cache of previously seen prompt prefixes and only prefill the rest. Falcon's cache layout is not supported, so FalconMiner ignores it.",
+            default=False,
+        )
+        parser.add_argument(
+            "--neuron.prefix_cache.max_bytes",
+            type=int,
+            help="The maximum memory held by cached prefix key/values in bytes.",
+            default=2 * 2**30,
+        )
+        parser.add_argument(
+            "--neuron.prefix_cache.min_tokens",
+            type=int,
+            help="The shortest shared prefix worth reusing, in tokens.",
+            default=16,
+        )
+        parser.add_argument(
+            "--neuron.conversation_cache.on",
+            action="store_true",
+            help="If set, local model miners keep the KV cache of each caller's recent conversation so a new turn only prefills what is new.",
+            default=False,
+        )
+        parser.add_argument(
+            "--neuron.conversation_cache.max_bytes",
+            type=int,
+            help="The maximum memory held by cached conversations in bytes.",
+            default=4 * 2**30,
+        )
+        parser.add_argument(
+            "--neuron.streaming.on",
+            action="store_true",
+            help="If set, forward consumes the miner's token stream and returns the partial answer when the deadline is reached.",
+            default=False,
+        )
+        parser.add_argument(
+            "--neuron.streaming.deadline_margin",
+            type=float,
+            help="Seconds before the caller's timeout at which a streamed answer is cut off and returned.",
+            default=0.5,
+        )
+        parser.add_argument(
+            "--neuron.speculative.draft_model",
+            type=str,
+            help="Name or path of a small model sharing the miner's tokenizer. If set, local model miners decode speculatively with it.",
+            default=None,
+        )
+        parser.add_argument(
+            "--neuron.speculative.num_tokens",
+            type=int,
+            help="The number of tokens the draft model proposes per verification pass.",
+            default=4,
+        )
+        parser.add_argument(
+            "--neuron.speculative.min_acceptance",
+            type=float,
+            help="Speculative decoding is switched off when the draft acceptance rate falls below this.",
+            default=0.3,
+        )
+        parser.add_argument(
+            "--neuron.quantization.on",
+            action="store_true",
+            help="If set, local model miners run on the cpu with their linear layers dynamically quantized to int8. Requires the miner's device to be cpu. Supported by pythia, vicuna, koala, neoxt, hermes and airoboros; other miners warn and ignore it.",
+            default=False,
+        )
+        parser.add_argument(
+            "--neuron.quantization.bf16",
+            action="store_true",
+            help="If set, the layers which are not quantized run in bf16 on cpus with native bf16 support.",
+            default=False,
+        )
+        parser.add_argument(
+            "--neuron.quantization.cache_dir",
+            type=str,
+            help="Where quantized models are cached for fast reloads, as pickles which are loaded with full trust. Must only be writable by the miner's user. Empty disables the cache.",
+            default="~/.bittensor/miners/quantized/",
+        )
+        parser.add_argument(
+            "--neuron.time_budget.on",
+            action="store_true",
+            help="If set, local model miners fit each generation into the caller's timeout and return what they have at the deadline.",
+            default=False,
+        )
+        parser.add_argument(
+            "--neuron.time_budget.margin",
+            type=float,
+            help="Seconds before the caller's timeout by which generation must stop.",
+            default=0.5,
+        )
+        parser.add_argument(
+            "--neuron.scheduler.on",
+            action="store_true",
+            help="If set, forward calls are queued by priority and deadline, and expired calls are dropped.",
+            default=False,
+        )
+        parser.add_argument(
+            "--neuron.scheduler.max_concurrency",
+            type=int,
+            help="The number of forward calls the scheduler lets through at once. Defaults to --neuron.max_batch_size, so batches can fill.",
+            default=None,
+        )
+        parser.add_argument(
+            "--neuron.shedding.on",
+            action="store_true",
+            help="If set, forward calls predicted to miss their timeout are rejected before running.",
+            default=False,
+        )
+        parser.add_argument(
+            "--neuron.shedding.margin",
+            type=float,
+            help="Safety factor applied to the predicted latency when deciding to shed a call.",
+            default=1.0,
+        )
+        parser.add_argument(
+            "--neuron.shedding.min_observations",
+            type=int,
+            help="Number of completed calls to observe before the latency model is trusted.",
+            default=5,
+        )
+        parser.add_argument(
+            "--neuron.coalescing.on",
+            action="store_true",
+            help="If set, concurrent forward calls with identical messages share a single generation.",
+            default=False,
+        )
+        parser.add_argument(
+            "--neuron.cache.on",
+            action="store_true",
+            help="If set, responses to repeated message histories are served from an LRU cache.",
+            default=False,
+        )
+        parser.add_argument(
+            "--neuron.cache.sampling",
+            action="store_true",
+            help="If set, responses are cached even when the miner samples. Otherwise only greedy configs are cached.",
+            default=False,
+        )
+        parser.add_argument(
+            "--neuron.cache.max_entries",
+            type=int,
+            help="The maximum number of cached responses.",
+            default=1024,
+        )
+        parser.add_argument(
+            "--neuron.cache.max_bytes",
+            type=int,
+            help="The maximum total size of cached responses in bytes.",
+            default=16 * 2**20,
+        )
+        parser.add_argument(
+            "--neuron.cache.ttl",
+            type=float,
+            help="How long a cached response stays valid (in seconds).",
+            default=300.0,
+        )
+
+    def max_new_tokens(self) -> int:
+        """The most tokens a single forward call can generate, or -1 if unknown."""
+        return -1
+
+    def generation_config(self) -> Dict[str, Any]:
+        """The decoding settings which, with the messages, determine the response.
+
+        Part of the cache and coalescing keys, so leave out credentials, devices and anything
+        else which does not change the output.
+        """
+        return {}
+
+    def use_generation_engine(self) -> bool:
+        """True if local model miners should generate on a ContinuousBatchingEngine."""
+        return (
+            self.config.neuron.continuous_batching
+            or self.prefix_cache is not None
+            or self.conversation_cache is not None
+        )
+
+    def speculative_decoder(
+        self, model: "transformers.PreTrainedModel", **kwargs
+    ) -> Optional["SpeculativeDecoder"]:
+        """Pairs model with the --neuron.speculative.draft_model, if one is configured."""
+        if self.config.neuron.speculative.draft_model is None:
+            return None
+        from .speculative import SpeculativeDecoder, load_draft_model
+
+        parameter = next(model.parameters())
+        return SpeculativeDecoder(
+            model,
+            load_draft_model(
+                self.config.neuron.speculative.draft_model,
+                device=parameter.device,
+                torch_dtype=parameter.dtype,
+            ),
+            num_draft_tokens=self.config.neuron.speculative.num_tokens,
+            min_acceptance=self.config.neuron.speculative.min_acceptance,
+            **kwargs,
+        )
+
+    def quantization(self) -> Optional["DynamicQuantization"]:
+        """The --neuron.quantization to load local models with, if it is on."""
+        if not self.config.neuron.quantization.on:
+            return None
+        from .quantization import DynamicQuantization
+
+        return DynamicQuantization(
+            bf16=self.config.neuron.quantization.bf16,
+            cache_dir=self.config.neuron.quantization.cache_dir or None,
+        )
+
+    def build_prompt(
+        self,
+        tokenizer: "transformers.PreTrainedTokenizer",
+        messages: List[Dict[str, str]],
+        template: ChatTemplate,
+    ) -> Union[str, List[int]]:
+        """The template's prompt for messages, ready for the generate helpers.
+
+        With --neuron.max_sequence_len, the oldest turns are dropped to fit it next to the
+        generated tokens and the prompt comes back already encoded.
+        """
+        if self.truncator is None:
+            return template.render(messages, add_generation_prompt=True)
+        return self.truncator.encode(
+            tokenizer, messages, template, reserve=self.max_new_tokens()
+        )
+
+    def time_budget_kwargs(self, max_new_tokens: int = -1) -> Dict[str, Any]:
+        """generate() arguments which keep a generation within the caller's timeout.
+
+        Includes max_new_tokens, capped by the time budget, when one is given.
+        """
+        kwargs = {}
+        if max_new_tokens > 0:
+            kwargs["max_new_tokens"] = max_new_tokens
+        if self.time_budget is None or self.time_budget.current_deadline() is None:
+            return kwargs
+        if max_new_tokens > 0:
+            kwargs["max_new_tokens"] = self.time_budget.max_new_tokens(max_new_tokens)
+        kwargs["stopping_criteria"] = self.time_budget.stopping_criteria()
+        return kwargs
+
+    def observe_generation(self, num_tokens: int, elapsed: float):
+        """Measures the decoding rate of a generation for the time budget, if there is one."""
+        if self.time_budget is not None:
+            self.time_budget.observe(num_tokens, elapsed)
+
+    def sync_forward(self, messages: List[Dict[str, str]]) -> str:
+        """Runs forward to completion on the calling thread. Used by the synapse."""
+        return self.forward(messages)
+
+    def batched_forward(self, messages: List[Dict[str, str]]) -> str:
+        """Runs forward through the batcher, which applies the earliest deadline in each batch."""
+        forward_call = self.current_forward_call()
+        deadline = None
+        if forward_call is not None:
+            deadline = forward_call.start_time + forward_call.timeout
+        return self.batcher.submit(messages, deadline)
+
+    def warmup_steps(self) -> int:
+        """--miner.warmup.steps, or the number of warm-up generations this kind of miner needs."""
+        steps = self.config.miner.warmup.get("steps")
+        return 1 if steps is None else steps
+
+    def warmup(self):
+        """Runs warmup_steps() generations, paying for lazy initialization, kernel
+        selection and allocator growth before the first real request does.
+
+        The warm-up latencies calibrate the load shedder, so it has a baseline before the
+        first real request arrives.
+        """
+        prompt = self.config.miner.warmup.prompt
+        messages = [{"role": "user", "content": prompt}]
+        with self.startup.phase("warmup"):
+            for _ in range(self.warmup_steps()):
+                start_time = time.time()
+                try:
+                    response = self.sync_forward(messages)
+                except Exception as e:
+                    bt.logging.error(f"Error in warm-up generation: { e }")
+                    return
+                latency = time.time() - start_time
+                bt.logging.debug(f"Warm-up generation took { latency:.2f}s")
+                if self.shedder is not None:
+                    self.shedder.observe(
+                        count_tokens(prompt), count_tokens(response), latency
+                    )
+
+    def forward_batch(self, messages_batch: List[List[Dict[str, str]]]) -> List[str]:
+        raise NotImplementedError("forward_batch not implemented in subclass")
+
+    def forward_stream(self, messages: List[Dict[str, str]]) -> Iterator[str]:
+        """Yields the response in text chunks as it is generated. Optional.
+
+        Subclasses of AsyncBasePromptingMiner implement it as an async generator.
+        """
+        raise NotImplementedError("forward_stream not implemented in subclass")
+
+    def sync_forward_stream(self, messages: List[Dict[str, str]]) -> Iterator[str]:
+        """Iterates forward_stream on the calling thread. Used by the synapse."""
+        return self.forward_stream(messages)
+
+    def current_forward_call(self) -> Optional["bt.TextPromptingForwardCall"]:
+        """The forward call being applied on this thread by the axon, if any."""
+        return getattr(self.calls, "forward_call", None)
+
+    def current_call(self) -> Tuple[Optional[float], Optional[str]]:
+        """The deadline and caller hotkey of the forward call on this thread, for call_context."""
+        forward_call = self.current_forward_call()
+        if forward_call is None:
+            return None, None
+        return (
+            forward_call.start_time + forward_call.timeout,
+            getattr(forward_call, "src_hotkey", None),
+        )
+
+    @contextlib.contextmanager
+    def call_context(
+        self,
+        messages: List[Dict[str, str]],
+        deadline: Optional[float] = None,
+        hotkey: Optional[str] = None,
+    ) -> Iterator[None]:
+        """Marks the generations run on this thread with the call's deadline and caller."""
+        with contextlib.ExitStack() as stack:
+            if self.conversation_cache is not None:
+                stack.enter_context(
+                    self.conversation_cache.conversation(hotkey, messages)
+                )
+            if self.time_budget is not None and deadline is not None:
+                stack.enter_context(self.time_budget.deadline(deadline))
+            yield
 
     def __init__(self, *args, **kwargs):
         super(BasePromptingMiner, self).__init__(*args, **kwargs)
 
+        # Tracks the forward call being applied on each axon thread.
+        self.calls = threading.local()
+
+        # Reuse the KV cache of shared prompt prefixes such as system prompts.
+        self.prefix_cache = None
+        if self.config.neuron.prefix_cache.on:
+            self.prefix_cache = PrefixCache(
+                max_bytes=self.config.neuron.prefix_cache.max_bytes,
+                min_prefix_len=self.config.neuron.prefix_cache.min_tokens,
+            )
+
+        # Keep the KV cache of recent conversations per caller.
+        self.conversation_cache = None
+        if self.config.neuron.conversation_cache.on:
+            self.conversation_cache = ConversationCache(
+                max_bytes=self.config.neuron.conversation_cache.max_bytes
+            )
+
+        # Drop the oldest turns of histories longer than the model should see.
+        self.truncator = None
+        if self.config.neuron.max_sequence_len > 0:
+            self.truncator = HistoryTruncator(self.config.neuron.max_sequence_len)
+
+        # Fit generations into the time left on each forward call.
+        self.time_budget = None
+        if self.config.neuron.time_budget.on:
+            from .time_budget import TimeBudget
+
+            self.time_budget = TimeBudget(margin=self.config.neuron.time_budget.margin)
+
+        # Batch concurrent forward calls when the subclass supports it.
+        self.batcher = None
+        if (
+            self.config.neuron.max_batch_size > 1
+            and not self.use_generation_engine()
+            and type(self).forward_batch is not BasePromptingMiner.forward_batch
+        ):
+            bt.logging.info(
+                f"Batching forward calls up to size: { self.config.neuron.max_batch_size }"
+            )
+            self.batcher = RequestBatcher(
+                batch_fn=self.forward_batch,
+                max_batch_size=self.config.neuron.max_batch_size,
+                max_wait=self.config.neuron.batch_wait_ms / 1000,
+                deadline_context=self.time_budget.deadline
+                if self.time_budget is not None
+                else None,
+            )
+        forward_fn = (
+            self.batched_forward if self.batcher is not None else self.sync_forward
+        )
+
+        # Order forward calls by priority and deadline.
+        self.scheduler = None
+        if self.config.neuron.scheduler.on:
+            max_concurrency = self.config.neuron.scheduler.max_concurrency
+            if max_concurrency is None:
+                max_concurrency = max(1, self.config.neuron.max_batch_size)
+            self.scheduler = PriorityScheduler(max_concurrency=max_concurrency)
+
+        # Reject calls which are predicted to miss their timeout.
+        self.shedder = None
+        if self.config.neuron.shedding.on:
+            self.shedder = LoadShedder(
+                min_observations=self.config.neuron.shedding.min_observations,
+                margin=self.config.neuron.shedding.margin,
+            )
+
+        # Serve repeated message histories from a response cache.
+        self.cache = None
+        if self.config.neuron.cache.on:
+            if self.config.neuron.cache.sampling or is_deterministic(
+                self.generation_config()
+            ):
+                self.cache = ResponseCache(
+                    max_entries=self.config.neuron.cache.max_entries,
+                    max_bytes=self.config.neuron.cache.max_bytes,
+                    ttl=self.config.neuron.cache.ttl,
+                )
+            else:
+                bt.logging.warning(
+                    "Not caching responses of a sampling miner, pass --neuron.cache.sampling to cache them anyway."
+                )
+
+        # Share one generation between concurrent calls with identical messages.
+        self.coalescer = SingleFlight() if self.config.neuron.coalescing.on else None
+
+        # Consume the miner's token stream so answers can be cut off at the deadline.
+        self.streaming = False
+        if self.config.neuron.streaming.on:
+            self.streaming = (
+                type(self).forward_stream is not BasePromptingMiner.forward_stream
+            )
+            if not self.streaming:
+                bt.logging.warning(
+                    f"{ type(self).__name__ } does not implement forward_stream, streaming is off."
+                )
+
+        # Workers are driven by the parent process and have no axon to attach to.
+        if self.is_worker:
+            return
+
         # Define synapse.
         class Synapse(bt.TextPromptingSynapse):
 
             # Build priority function.
             def priority(_, forward_call: "bt.TextPromptingForwardCall") -> float:
-                return priority(self, self.priority, forward_call)
+                forward_call.miner_priority = priority(
+                    self, self.priority, forward_call
+                )
+                return forward_call.miner_priority
 
             # Build blacklist function.
             def blacklist(
@@ -70,9 +530,24 @@ class BasePromptingMiner(BaseMiner, ABC):
             ) -> Union[Tuple[bool, str], bool]:
                 return blacklist(self, self.blacklist, forward_call)
 
+            # Remember the forward call so forward can see its priority and timeout.
+            def apply(_, bittensor_call: "bt.SynapseCall") -> object:
+                self.calls.forward_call = bittensor_call
+                try:
+                    return super(Synapse, _).apply(bittensor_call)
+                finally:
+                    self.calls.forward_call = None
+
             # Build forward function.
             def forward(_, messages: List[Dict[str, str]]) -> str:
-                return forward(self, self.forward, messages)
+                if not self.readiness.admit():
+                    return ""
+                try:
+                    return forward(
+                        self, forward_fn, messages, self.current_forward_call()
+                    )
+                finally:
+                    self.readiness.release()
 
             # Build backward function.
             # TODO(const): accept this.
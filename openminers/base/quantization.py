@@ -0,0 +1,203 @@
+# The MIT License (MIT)
+# Copyright © 2023 Yuma Rao
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+# documentation files (the “Software”), to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+# and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+# the Software.
+
+# THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+# THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+
+import io
+import os
+import hashlib
+import torch
+import bittensor as bt
+import transformers
+from torch import nn
+from typing import Any, Callable, Dict, Optional
+from transformers import AutoModelForCausalLM
+from transformers.pytorch_utils import Conv1D
+from transformers.utils.hub import cached_file, extract_commit_hash
+
+# from_pretrained arguments which only affect where and how the checkpoint is fetched.
+_UNKEYED_KWARGS = {
+    "torch_dtype",
+    "cache_dir",
+    "force_download",
+    "resume_download",
+    "proxies",
+    "local_files_only",
+    "token",
+    "use_auth_token",
+}
+
+
+def cpu_supports_bf16() -> bool:
+    """True if the cpu has native bf16 instructions (AVX512-BF16 or AMX)."""
+    if not torch.backends.mkldnn.is_available():
+        return False
+    try:
+        with open("/proc/cpuinfo") as f:
+            flags = f.read().split()
+    except OSError:
+        return False
+    return "avx512_bf16" in flags or "amx_bf16" in flags
+
+
+def model_bytes(model: nn.Module) -> int:
+    """The serialized size of the model's weights, including packed int8 ones."""
+    buffer = io.BytesIO()
+    torch.save(model.state_dict(), buffer)
+    return buffer.tell()
+
+
+class _Float32Linear(nn.Module):
+    """Runs a dynamically quantized linear layer, which only takes float32, in a bf16 model."""
+
+    def __init__(self, linear: nn.Module):
+        super().__init__()
+        self.linear = linear
+
+    def forward(self, x: torch.Tensor) -> torch.Tensor:
+        return self.linear(x.float()).to(x.dtype)
+
+
+def _conv1d_to_linear(conv: Conv1D) -> nn.Linear:
+    # GPT-2 style Conv1D stores its weight transposed, as (in_features, out_features).
+    linear = nn.Linear(*conv.weight.shape)
+    linear.weight = nn.Parameter(conv.weight.t().contiguous())
+    linear.bias = conv.bias
+    return linear
+
+
+def _replace_modules(
+    model: nn.Module, match: Callable[[nn.Module], bool], replace: Callable
+):
+    for name, child in model.named_children():
+        if match(child):
+            setattr(model, name, replace(child))
+        else:
+            _replace_modules(child, match, replace)
+
+
+class DynamicQuantization:
+    """Int8 dynamic quantization of a causal LM's linear layers for cpu inference.
+
+    Linear weights are quantized to int8 once, and activations are quantized on the fly at
+    each matmul, so no calibration data is needed. With bf16, the rest of the model
+    (embeddings, norms and attention) runs in bf16 on cpus with native support for it.
+    Quantized models are cached in cache_dir, keyed by the model's commit (or files),
+    its loading arguments and the library versions, so later loads skip both the fp32
+    checkpoint and the quantization. Cached models are whole pickled modules, since
+    torch cannot load packed int8 weights with weights_only, so cache_dir must only be
+    writable by the miner's user. Files which anyone else could have written are ignored.
+    """
+
+    def __init__(self, bf16: bool = False, cache_dir: Optional[str] = None):
+        if bf16 and not cpu_supports_bf16():
+            bt.logging.warning(
+                "This cpu has no native bf16 support, keeping activations in fp32."
+            )
+            bf16 = False
+        self.bf16 = bf16
+        self.cache_dir = os.path.expanduser(cache_dir) if cache_dir else None
+
+    def quantize(self, model: nn.Module) -> nn.Module:
+        """Quantizes the linear layers of model in place and returns it in eval mode."""
+        model = model.float().eval()
+        _replace_modules(model, lambda m: isinstance(m, Conv1D), _conv1d_to_linear)
+        model = torch.ao.quantization.quantize_dynamic(
+            model, {nn.Linear}, dtype=torch.qint8, inplace=True
+        )
+        if self.bf16:
+            quantized = torch.ao.nn.quantized.dynamic.Linear
+            _replace_modules(model, lambda m: isinstance(m, quantized), _Float32Linear)
+            model = model.to(torch.bfloat16)
+        return model
+
+    @staticmethod
+    def _commit_hash(model_name: str, model_kwargs: Dict[str, Any]) -> Optional[str]:
+        """The hub commit which model_name and its revision resolve to, as from_pretrained would."""
+        try:
+            resolved = cached_file(
+                model_name,
+                transformers.CONFIG_NAME,
+                revision=model_kwargs.get("revision"),
+                cache_dir=model_kwargs.get("cache_dir"),
+                local_files_only=model_kwargs.get("local_files_only", False),
+                use_auth_token=model_kwargs.get(
+                    "token", model_kwargs.get("use_auth_token")
+                ),
+                subfolder=model_kwargs.get("subfolder", ""),
+            )
+        except Exception as e:
+            bt.logging.warning(f"Could not resolve the commit of {model_name}: {e}")
+            return None
+        return extract_commit_hash(resolved, None)
+
+    def cache_path(self, model_name: str, **model_kwargs) -> Optional[str]:
+        if self.cache_dir is None:
+            return None
+        key = [model_name, torch.__version__, transformers.__version__, str(self.bf16)]
+        key += [
+            f"{name}={model_kwargs[name]!r}"
+            for name in sorted(model_kwargs)
+            if name not in _UNKEYED_KWARGS
+        ]
+        # Local checkpoints can change under the same name, hub ones under the same revision.
+        if os.path.isdir(model_name):
+            key += [
+                str(os.path.getmtime(os.path.join(model_name, name)))
+                for name in sorted(os.listdir(model_name))
+            ]
+        else:
+            commit_hash = self._commit_hash(model_name, model_kwargs)
+            if commit_hash is None:
+                return None
+            key.append(commit_hash)
+        digest = hashlib.sha256("\0".join(key).encode()).hexdigest()[:16]
+        name = os.path.basename(os.path.normpath(model_name))
+        return os.path.join(self.cache_dir, f"{name}-int8-{digest}.pt")
+
+    @staticmethod
+    def _trusted(path: str) -> bool:
+        """True if only this user could have written path, so unpickling it is safe."""
+        for name in (path, os.path.dirname(path)):
+            stat = os.stat(name)
+            if stat.st_uid != os.getuid() or stat.st_mode & 0o022:
+                bt.logging.warning(
+                    f"Ignoring quantized model {path}: {name} is writable by other users."
+                )
+                return False
+        return True
+
+    def load(self, model_name: str, **model_kwargs) -> nn.Module:
+        """from_pretrained followed by quantize, or the cached result of both."""
+        path = self.cache_path(model_name, **model_kwargs)
+        if path is not None and os.path.exists(path) and self._trusted(path):
+            try:
+                return torch.load(path, weights_only=False)
+            except Exception as e:
+                bt.logging.warning(f"Ignoring unreadable quantized model {path}: {e}")
+
+        model_kwargs["torch_dtype"] = torch.float32
+        model = self.quantize(
+            AutoModelForCausalLM.from_pretrained(model_name, **model_kwargs)
+        )
+        if path is not None:
+            os.makedirs(self.cache_dir, mode=0o700, exist_ok=True)
+            # Written under a temporary name so concurrent loads never read a partial file.
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            torch.save(model, tmp_path)
+            os.chmod(tmp_path, 0o600)
+            os.replace(tmp_path, path)
+            bt.logging.info(f"Cached quantized {model_name} at {path}")
+        return model
@@ -0,0 +1,101 @@
+# The MIT License (MIT)
+# Copyright © 2023 Yuma Rao
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+# documentation files (the “Software”), to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+# and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+# the Software.
+
+# THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+# THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+
+import time
+import threading
+import bittensor as bt
+from typing import Dict, Tuple
+
+
+class Readiness:
+    """Tracks whether a miner should take requests: loading, warming, ready, draining.
+
+    A miner is loading until its model and metagraph are in place, warming while the
+    warm-up generations run, ready while it serves, and draining once it is shutting
+    down. Requests are only admitted while ready, so until the warm-up is done they are
+    rejected before any work is done instead of timing out behind a cold model.
+    """
+
+    LOADING = "loading"
+    WARMING = "warming"
+    READY = "ready"
+    DRAINING = "draining"
+
+    TRANSITIONS = {
+        LOADING: (WARMING, DRAINING),
+        WARMING: (READY, DRAINING),
+        READY: (DRAINING,),
+        DRAINING: (),
+    }
+
+    def __init__(self):
+        self.state = Readiness.LOADING
+        self.in_flight = 0
+        self.num_rejected = 0
+        self.condition = threading.Condition()
+
+    @property
+    def is_ready(self) -> bool:
+        return self.state == Readiness.READY
+
+    def transition(self, state: str):
+        with self.condition:
+            if state not in Readiness.TRANSITIONS[self.state]:
+                raise ValueError(f"Can not go from {self.state} to {state}")
+            bt.logging.info(f"Miner is {state}")
+            self.state = state
+            self.condition.notify_all()
+
+    def check(self) -> Tuple[bool, str]:
+        """Whether a request should be rejected, and why. Cheap enough for the blacklist."""
+        if self.state == Readiness.READY:
+            return False, "miner is ready"
+        self.num_rejected += 1
+        return True, f"miner is {self.state}"
+
+    def admit(self) -> bool:
+        """Counts a request in flight if the miner is ready. Pair with release()."""
+        with self.condition:
+            if self.state != Readiness.READY:
+                self.num_rejected += 1
+                return False
+            self.in_flight += 1
+            return True
+
+    def release(self):
+        with self.condition:
+            self.in_flight -= 1
+            self.condition.notify_all()
+
+    def wait(self, state: str, timeout: float = None) -> bool:
+        """Blocks until the miner is in state, returning False on timeout."""
+        with self.condition:
+            return self.condition.wait_for(lambda: self.state == state, timeout)
+
+    def drain(self, timeout: float = None) -> bool:
+        """Stops admitting requests and waits for those in flight, False on timeout."""
+        with self.condition:
+            if self.state != Readiness.DRAINING:
+                self.transition(Readiness.DRAINING)
+            return self.condition.wait_for(lambda: self.in_flight == 0, timeout)
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            "ready": float(self.is_ready),
+            "readiness_in_flight": self.in_flight,
+            "readiness_rejected": self.num_rejected,
+        }
@@ -0,0 +1,113 @@
+# The MIT License (MIT)
+# Copyright © 2023 Yuma Rao
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+# documentation files (the “Software”), to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+# and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+# the Software.
+
+# THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+# THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+
+import functools
+import importlib
+import importlib.metadata
+from typing import Dict, List, Type
+
+# The module each public class lives in, relative to the openminers package. Nothing is
+# imported until a class is asked for, so `import openminers` doesn't pay for the torch,
+# transformers, deepspeed or provider SDK imports of every backend.
+BASE_CLASSES: Dict[str, str] = {
+    "BaseMiner": ".base.miner",
+    "BasePromptingMiner": ".base.prompting_miner",
+    "AsyncBasePromptingMiner": ".base.async_prompting_miner",
+    "FallbackMiner": ".base.router",
+    "HedgedMiner": ".base.hedging",
+}
+MINERS: Dict[str, str] = {
+    "TemplateMiner": ".text_to_text.template.miner",
+    "GPT4ALLMiner": ".text_to_text.gpt4all.miner",
+    "AI21Miner": ".text_to_text.AI21.miner",
+    "AlephAlphaMiner": ".text_to_text.AlephAlpha.miner",
+    "BloomChatMiner": ".text_to_text.bloom.miner",
+    "CohereMiner": ".text_to_text.cohere.miner",
+    "GooseMiner": ".text_to_text.gooseai.miner",
+    "KoalaMiner": ".text_to_text.koala.miner",
+    "LlamaMiner": ".text_to_text.llama.miner",
+    "NeoxtMiner": ".text_to_text.neoxt.miner",
+    "OpenAIMiner": ".text_to_text.openai.miner",
+    "PythiaMiner": ".text_to_text.pythia.miner",
+    "RobertMyersMiner": ".text_to_text.robertmyers.miner",
+    "StabilityAIMiner": ".text_to_text.stabilityai.miner",
+    "VicunaMiner": ".text_to_text.vicuna.miner",
+    "CerebrasMiner": ".text_to_text.cerebras.miner",
+    "FalconMiner": ".text_to_text.falcon.miner",
+    "HermesMiner": ".text_to_text.hermes.miner",
+}
+
+# Lower case names for miners, e.g. openminers.falcon.
+ALIASES: Dict[str, str] = {
+    "template": "TemplateMiner",
+    "gpt4all": "GPT4ALLMiner",
+    "ai21": "AI21Miner",
+    "alephalpha": "AlephAlphaMiner",
+    "bloom": "BloomChatMiner",
+    "cohere": "CohereMiner",
+    "goose": "GooseMiner",
+    "koala": "KoalaMiner",
+    "llama": "LlamaMiner",
+    "neoxt": "NeoxtMiner",
+    "openai": "OpenAIMiner",
+    "pythia": "PythiaMiner",
+    "robert": "RobertMyersMiner",
+    "stability": "StabilityAIMiner",
+    "vicuna": "VicunaMiner",
+    "cerebras": "CerebrasMiner",
+    "falcon": "FalconMiner",
+}
+
+
+# Other packages add miners under this entry point group, e.g. in their setup.py:
+#   entry_points={"openminers.miners": ["mymodel = mypackage.miner:MyMiner"]}
+ENTRY_POINT_GROUP = "openminers.miners"
+
+
+@functools.lru_cache(maxsize=None)
+def plugins() -> Dict[str, "importlib.metadata.EntryPoint"]:
+    """Miners installed by other packages, by entry point name. Scanned once."""
+    entry_points = importlib.metadata.entry_points()
+    if hasattr(entry_points, "select"):
+        entry_points = entry_points.select(group=ENTRY_POINT_GROUP)
+    else:
+        entry_points = entry_points.get(ENTRY_POINT_GROUP, [])
+    return {entry_point.name: entry_point for entry_point in entry_points}
+
+
+def miner_names() -> List[str]:
+    """Every name a miner can be looked up by, including installed plugins."""
+    return [*MINERS, *ALIASES, *(name for name in plugins() if name not in MINERS)]
+
+
+def resolve(name: str) -> type:
+    """The base class or miner exported as openminers.<name>, imported on first use."""
+    class_name = ALIASES.get(name, name)
+    module = BASE_CLASSES.get(class_name) or MINERS[class_name]
+    return getattr(importlib.import_module(module, "openminers"), class_name)
+
+
+def get_miner(name: str) -> Type["openminers.BaseMiner"]:
+    """The class registered under name, one of its aliases or an installed plugin.
+
+    Only the module of that miner is imported. Raises a KeyError for unknown names.
+    """
+    if ALIASES.get(name, name) in MINERS:
+        return resolve(name)
+    if name in plugins():
+        return plugins()[name].load()
+    raise KeyError(f"Unknown miner: {name}, expected one of {', '.join(miner_names())}")
@@ -0,0 +1,272 @@
+# The MIT License (MIT)
+# Copyright © 2023 Yuma Rao
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+# documentation files (the “Software”), to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+# and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+# the Software.
+
+# THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+# THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+import copy
+import time
+import argparse
+import threading
+import contextlib
+import bittensor as bt
+from typing import Any, Callable, ContextManager, Dict, List, Optional, Sequence
+
+from .miner import BaseMiner
+from .prompting_miner import BasePromptingMiner
+from .shedding import LatencyModel, count_tokens
+
+
+class Backend:
+    """A forward function behind the router, with its load and observed latency.
+
+    call_context(messages, deadline, hotkey), if given, is entered around each call so the
+    backend generates under the caller's deadline and conversation.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        forward_fn: Callable[[List[Dict[str, str]]], str],
+        weight: float = 1.0,
+        max_in_flight: int = 0,
+        max_tokens: int = -1,
+        call_context: Optional[Callable[..., ContextManager]] = None,
+    ):
+        self.name = name
+        self.forward_fn = forward_fn
+        self.call_context = call_context
+        self.weight = weight
+        self.max_in_flight = max_in_flight
+        self.max_tokens = max_tokens
+        self.model = LatencyModel()
+        self.in_flight: int = 0
+        self.num_calls: int = 0
+        self.num_errors: int = 0
+
+    def predict(self, prompt_tokens: int, min_observations: int) -> float:
+        """Expected latency of one more call, counting the calls it is already serving.
+
+        The weight is the number of calls the backend serves at once without slowing down.
+        """
+        if self.model.num_observations < min_observations:
+            return 0.0
+        return (
+            self.model.predict(prompt_tokens, self.max_tokens)
+            + self.in_flight * self.model.mean_latency / self.weight
+        )
+
+    def saturated(self) -> bool:
+        return self.max_in_flight > 0 and self.in_flight >= self.max_in_flight
+
+
+class FallbackRouter:
+    """Sends each call to the first backend which is not saturated, spilling over in order.
+
+    A backend is skipped while it has max_in_flight calls running or its predicted latency
+    is above max_latency. When every backend is over, the one predicted to answer first
+    serves the call. A backend which raises hands the call to the next one.
+    """
+
+    def __init__(
+        self,
+        backends: Sequence[Backend],
+        max_latency: float = 0.0,
+        min_observations: int = 5,
+    ):
+        if len(backends) == 0:
+            raise ValueError("FallbackRouter needs at least one backend")
+        self.backends = list(backends)
+        self.max_latency = max_latency
+        self.min_observations = min_observations
+        self.lock = threading.Lock()
+        self.num_spilled: int = 0
+
+    def _choose(self, prompt_tokens: int, tried: List[Backend]) -> Backend:
+        """Picks the backend for a call and counts it as in flight. Holds the lock."""
+        candidates = [backend for backend in self.backends if backend not in tried]
+        predicted = [
+            backend.predict(prompt_tokens, self.min_observations)
+            for backend in candidates
+        ]
+        for backend, latency in zip(candidates, predicted):
+            if not backend.saturated() and (
+                self.max_latency <= 0 or latency <= self.max_latency
+            ):
+                break
+        else:
+            backend = candidates[predicted.index(min(predicted))]
+        backend.in_flight += 1
+        backend.num_calls += 1
+        return backend
+
+    def forward(
+        self,
+        messages: List[Dict[str, str]],
+        deadline: Optional[float] = None,
+        hotkey: Optional[str] = None,
+    ) -> str:
+        prompt_tokens = sum(count_tokens(message["content"]) for message in messages)
+        tried = []
+        while len(tried) < len(self.backends):
+            with self.lock:
+                backend = self._choose(prompt_tokens, tried)
+                if not tried and backend is not self.backends[0]:
+                    self.num_spilled += 1
+            tried.append(backend)
+
+            context = contextlib.nullcontext()
+            if backend.call_context is not None:
+                context = backend.call_context(messages, deadline, hotkey)
+            start_time = time.time()
+            try:
+                with context:
+                    completion = backend.forward_fn(messages)
+            except Exception as e:
+                error = e
+                with self.lock:
+                    backend.num_errors += 1
+                bt.logging.warning(
+                    f"Backend { backend.name } failed, trying the next one: { e }"
+                )
+                continue
+            finally:
+                with self.lock:
+                    backend.in_flight -= 1
+            backend.model.observe(
+                prompt_tokens, count_tokens(completion), time.time() - start_time
+            )
+            return completion
+        raise error
+
+    def stats(self) -> Dict[str, float]:
+        stats = {"router_spilled": self.num_spilled}
+        for backend in self.backends:
+            prefix = f"router_{ backend.name }_"
+            stats[prefix + "in_flight"] = backend.in_flight
+            stats[prefix + "calls"] = backend.num_calls
+            stats[prefix + "errors"] = backend.num_errors
+            stats[prefix + "latency"] = backend.model.mean_latency
+        return stats
+
+
+class FallbackMiner(BasePromptingMiner):
+    """Serves forward calls from several miners, preferring them in the order given.
+
+    Build it with wrap(), e.g. FallbackMiner.wrap(PythiaMiner, OpenAIMiner)() serves from
+    the local model and spills over to OpenAI when the model is saturated. Each backend is
+    configured by its own arguments; the axon, wallet and subtensor belong to this miner.
+    """
+
+    miner_classes: Sequence[type] = ()
+
+    @classmethod
+    def wrap(cls, *miner_classes: type) -> type:
+        return type(
+            "".join(miner_cls.__name__ for miner_cls in miner_classes) + "Fallback",
+            (cls,),
+            {"miner_classes": miner_classes},
+        )
+
+    @staticmethod
+    def backend_name(miner_cls: type) -> str:
+        return miner_cls.__name__.lower().replace("miner", "")
+
+    @classmethod
+    def add_args(cls, parser: argparse.ArgumentParser):
+        for miner_cls in cls.miner_classes:
+            miner_cls.add_args(parser)
+        parser.add_argument(
+            "--router.weights",
+            type=float,
+            nargs="*",
+            help="Per backend, in order: how many calls it serves at once without slowing down.",
+            default=[],
+        )
+        parser.add_argument(
+            "--router.max_in_flight",
+            type=int,
+            nargs="*",
+            help="Per backend, in order: the number of running calls at which it spills over to the next backend. 0 for no limit.",
+            default=[],
+        )
+        parser.add_argument(
+            "--router.max_latency",
+            type=float,
+            help="Spill over to the next backend when a backend's predicted latency exceeds this (in seconds). 0 to disable.",
+            default=0.0,
+        )
+        parser.add_argument(
+            "--router.min_observations",
+            type=int,
+            help="Number of completed calls to observe before a backend's latency estimate is trusted.",
+            default=5,
+        )
+
+    def __init__(
+        self,
+        config: "bt.Config" = None,
+        axon: "bt.axon" = None,
+        wallet: "bt.Wallet" = None,
+        subtensor: "bt.Subtensor" = None,
+    ):
+        # The backends only run forward, this miner serves the axon.
+        backend_config = self.config()
+        backend_config.merge(copy.deepcopy(config or BaseMiner.config()))
+        backend_config.miner.is_worker = True
+        weights = backend_config.router.weights
+        max_in_flight = backend_config.router.max_in_flight
+        self.backends = {}
+        backends = []
+        for index, miner_cls in enumerate(self.miner_classes):
+            name = self.backend_name(miner_cls)
+            bt.logging.info(f"Loading backend { name }")
+            miner = miner_cls(config=copy.deepcopy(backend_config))
+            self.backends[name] = miner
+            backends.append(
+                Backend(
+                    name,
+                    miner.sync_forward,
+                    weight=weights[index] if index < len(weights) else 1.0,
+                    max_in_flight=max_in_flight[index]
+                    if index < len(max_in_flight)
+                    else 0,
+                    max_tokens=miner.max_new_tokens(),
+                    call_context=miner.call_context,
+                )
+            )
+        self.router = FallbackRouter(
+            backends,
+            max_latency=backend_config.router.max_latency,
+            min_observations=backend_config.router.min_observations,
+        )
+        super(FallbackMiner, self).__init__(
+            config=config, axon=axon, wallet=wallet, subtensor=subtensor
+        )
+
+    def max_new_tokens(self) -> int:
+        return max(miner.max_new_tokens() for miner in self.backends.values())
+
+    def generation_config(self) -> Dict[str, Any]:
+        return {
+            name: dict(miner.generation_config())
+            for name, miner in self.backends.items()
+        }
+
+    def warmup(self):
+        # Warm each backend on its own, so API backends are only called if asked for.
+        for miner in self.backends.values():
+            miner.warmup()
+
+    def forward(self, messages: List[Dict[str, str]]) -> str:
+        return self.router.forward(messages, *self.current_call())
@@ -15,7 +15,6 @@
 # OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
 # DEALINGS IN THE SOFTWARE.
 import time
-import wandb
 import bittensor as bt
 from .set_weights import set_weights
 
@@ -23,6 +22,9 @@ from .set_weights import set_weights
 def run(self):
     bt.logging.info(f"Starting miner with config {self.config}")
 
+    # --- Wait for startup to finish before taking traffic.
+    self.wait_until_ready()
+
     # --- Optionally register the wallet.
     if not self.config.miner.no_register:
         bt.logging.info(
@@ -78,8 +80,41 @@ def run(self):
             "consensus": self.metagraph.C[self.uid].item(),
             "dividends": self.metagraph.D[self.uid].item(),
         }
+
+        # --- Log request admission stats.
+        if getattr(self, "scheduler", None) is not None:
+            step_log["scheduler_queue_depth"] = self.scheduler.queue_depth
+            step_log["scheduler_mean_wait"] = self.scheduler.mean_wait
+            step_log["scheduler_dropped"] = self.scheduler.num_dropped
+        if getattr(self, "shedder", None) is not None:
+            step_log.update(self.shedder.stats())
+        if getattr(self, "http_client", None) is not None:
+            step_log.update(self.http_client.stats())
+        if getattr(self, "cache", None) is not None:
+            step_log.update(self.cache.stats())
+        if getattr(self, "coalescer", None) is not None:
+            step_log.update(self.coalescer.stats())
+        if getattr(self, "prefix_cache", None) is not None:
+            step_log.update(self.prefix_cache.stats())
+        if getattr(self, "conversation_cache", None) is not None:
+            step_log.update(self.conversation_cache.stats())
+        if getattr(self, "speculative", None) is not None:
+            step_log.update(self.speculative.stats())
+        if getattr(self, "truncator", None) is not None:
+            step_log.update(self.truncator.stats())
+        if getattr(self, "time_budget", None) is not None:
+            step_log.update(self.time_budget.stats())
+        if getattr(self, "pool", None) is not None:
+            step_log.update(self.pool.stats())
+        if getattr(self, "router", None) is not None:
+            step_log.update(self.router.stats())
+        if getattr(self, "hedger", None) is not None:
+            step_log.update(self.hedger.stats())
+        step_log.update(self.startup.stats())
+        step_log.update(self.readiness.stats())
         bt.logging.info(str(step_log))
         if self.config.wandb.on:
+            import wandb
             wandb.log(step_log)
 
         # --- Set weights.
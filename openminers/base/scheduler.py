@@ -0,0 +1,94 @@
+# The MIT License (MIT)
+# Copyright © 2023 Yuma Rao
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+# documentation files (the “Software”), to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+# and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+# the Software.
+
+# THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+# THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+
+import time
+import heapq
+import itertools
+import threading
+from typing import List, Tuple
+
+
+class PriorityScheduler:
+    """Admits forward calls in order of priority, then earliest deadline.
+
+    At most max_concurrency calls run at once; the rest wait in a heap. Calls whose
+    deadline passes while they are queued are dropped before they reach the model.
+    """
+
+    def __init__(self, max_concurrency: int = 1):
+        self.max_concurrency = max(1, max_concurrency)
+        self.condition = threading.Condition()
+        self.heap: List[Tuple[float, float, int]] = []
+        self.counter = itertools.count()
+        self.running: int = 0
+        self.num_admitted: int = 0
+        self.num_dropped: int = 0
+        self.total_wait: float = 0.0
+        self.last_wait: float = 0.0
+
+    @property
+    def queue_depth(self) -> int:
+        return len(self.heap)
+
+    def queue_depth_ahead(self, priority: float, deadline: float = float("inf")) -> int:
+        """The number of queued calls which would be admitted before one with this priority and deadline."""
+        key = (-priority, deadline)
+        with self.condition:
+            return sum(1 for entry in self.heap if entry[:2] <= key)
+
+    @property
+    def mean_wait(self) -> float:
+        return self.total_wait / max(1, self.num_admitted)
+
+    def _drop(self, entry: Tuple[float, float, int]):
+        self.heap.remove(entry)
+        heapq.heapify(self.heap)
+        self.num_dropped += 1
+        self.condition.notify_all()
+
+    def acquire(self, priority: float, deadline: float = float("inf")) -> bool:
+        """Blocks until the call may run. Returns False if it was dropped for missing its deadline."""
+        start_time = time.time()
+        with self.condition:
+            if deadline <= start_time:
+                self.num_dropped += 1
+                return False
+
+            entry = (-priority, deadline, next(self.counter))
+            heapq.heappush(self.heap, entry)
+            while self.running >= self.max_concurrency or self.heap[0] != entry:
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    self._drop(entry)
+                    return False
+                self.condition.wait(min(remaining, 1.0))
+
+            heapq.heappop(self.heap)
+            self.running += 1
+            self.num_admitted += 1
+            self.last_wait = time.time() - start_time
+            self.total_wait += self.last_wait
+
+            # Let the next call in line check for a free slot.
+            self.condition.notify_all()
+            return True
+
+    def release(self):
+        """Frees the slot taken by a successful acquire()."""
+        with self.condition:
+            self.running -= 1
+            self.condition.notify_all()
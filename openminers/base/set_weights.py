@@ -1,5 +1,4 @@
 import torch
-import wandb
 import bittensor as bt
 
 
@@ -25,9 +24,13 @@ def set_weights(
             version_key=1,
         )
         if wandb_on:
+            import wandb
+
             wandb.log({"set_weights": 1})
 
     except Exception as e:
         if wandb_on:
+            import wandb
+
             wandb.log({"set_weights": 0})
         bt.logging.error(f"Failed to set weights on chain with exception: { e }")
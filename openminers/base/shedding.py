@@ -0,0 +1,134 @@
+# The MIT License (MIT)
+# Copyright © 2023 Yuma Rao
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+# documentation files (the “Software”), to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+# and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+# the Software.
+
+# THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+# THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+
+import torch
+import threading
+from collections import Counter
+from typing import Dict, Tuple
+
+
+def count_tokens(text: str) -> int:
+    """Cheap token estimate used for latency prediction (roughly four characters per token)."""
+    return max(1, len(text) // 4)
+
+
+class LatencyModel:
+    """Online estimate of forward latency from prompt and completion token counts.
+
+    Fits latency ~ overhead + a * prompt_tokens + b * completion_tokens with exponentially
+    weighted ridge regression, so the estimate follows the miner's current throughput.
+    """
+
+    def __init__(self, decay: float = 0.98, ridge: float = 1e-3):
+        self.decay = decay
+        self.ridge = ridge
+        self.lock = threading.Lock()
+        self.xtx = torch.zeros(3, 3, dtype=torch.float64)
+        self.xty = torch.zeros(3, dtype=torch.float64)
+        self.coefficients = torch.zeros(3, dtype=torch.float64)
+        self.mean_completion_tokens: float = 0.0
+        self.mean_latency: float = 0.0
+        self.num_observations: int = 0
+
+    @staticmethod
+    def _features(prompt_tokens: int, completion_tokens: float) -> torch.Tensor:
+        return torch.tensor(
+            [1.0, float(prompt_tokens), float(completion_tokens)], dtype=torch.float64
+        )
+
+    def observe(self, prompt_tokens: int, completion_tokens: int, latency: float):
+        """Updates the fit with the measured latency of a finished forward call."""
+        x = self._features(prompt_tokens, completion_tokens)
+        with self.lock:
+            self.xtx = self.decay * self.xtx + torch.outer(x, x)
+            self.xty = self.decay * self.xty + x * latency
+            self.coefficients = torch.linalg.solve(
+                self.xtx + self.ridge * torch.eye(3, dtype=torch.float64), self.xty
+            )
+            window = min(self.num_observations + 1, 1.0 / (1.0 - self.decay))
+            self.mean_completion_tokens += (
+                completion_tokens - self.mean_completion_tokens
+            ) / window
+            self.mean_latency += (latency - self.mean_latency) / window
+            self.num_observations += 1
+
+    def predict(self, prompt_tokens: int, max_tokens: int = -1) -> float:
+        """Predicts latency, assuming the usual completion length capped at max_tokens."""
+        with self.lock:
+            completion_tokens = self.mean_completion_tokens
+            if max_tokens > 0:
+                completion_tokens = min(completion_tokens, max_tokens)
+            x = self._features(prompt_tokens, completion_tokens)
+            return max(0.0, float(self.coefficients @ x))
+
+
+class LoadShedder:
+    """Rejects forward calls which are predicted to miss their deadline."""
+
+    def __init__(self, min_observations: int = 5, margin: float = 1.0):
+        self.model = LatencyModel()
+        self.min_observations = min_observations
+        self.margin = margin
+        self.reasons: Counter = Counter()
+
+    @property
+    def num_shed(self) -> int:
+        return sum(self.reasons.values())
+
+    def should_shed(
+        self,
+        prompt_tokens: int,
+        max_tokens: int,
+        remaining: float,
+        queue_depth: int = 0,
+        concurrency: int = 1,
+    ) -> Tuple[bool, str]:
+        """Decides whether to reject a call which has remaining seconds left before its timeout.
+
+        Calls queued ahead of this one in the scheduler add their expected service time to the estimate.
+        """
+        if remaining <= 0:
+            self.reasons["deadline passed"] += 1
+            return True, "deadline passed"
+
+        # Only trust the estimate once it has seen a few calls.
+        if self.model.num_observations < self.min_observations:
+            return False, "calibrating"
+
+        predicted = self.margin * self.model.predict(prompt_tokens, max_tokens)
+        if predicted > remaining:
+            reason = "predicted latency exceeds timeout"
+        elif (
+            predicted + queue_depth * self.model.mean_latency / concurrency > remaining
+        ):
+            reason = "predicted queue wait exceeds timeout"
+        else:
+            return False, "predicted to finish in time"
+
+        self.reasons[reason] += 1
+        return True, reason
+
+    def observe(self, prompt_tokens: int, completion_tokens: int, latency: float):
+        self.model.observe(prompt_tokens, completion_tokens, latency)
+
+    def stats(self) -> Dict[str, int]:
+        stats = {
+            "shed_" + reason.replace(" ", "_"): count
+            for reason, count in self.reasons.items()
+        }
+        stats["shed_total"] = self.num_shed
+        return stats
@@ -0,0 +1,90 @@
+# The MIT License (MIT)
+# Copyright © 2023 Yuma Rao
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+# documentation files (the “Software”), to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+# and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+# the Software.
+
+# THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+# THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+
+import time
+import threading
+from typing import Any, Callable, Dict, Optional
+
+
+class _Flight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.shared = False
+
+
+class SingleFlight:
+    """Runs one call per key at a time; concurrent callers with the same key share its result.
+
+    Callers which joined a running call wait at most their own timeout. A result which
+    share rejects, such as an empty or cut off answer, is not handed to them; they run
+    the call again themselves instead.
+    """
+
+    def __init__(self):
+        self.flights: Dict[str, _Flight] = {}
+        self.lock = threading.Lock()
+        self.num_calls: int = 0
+        self.num_coalesced: int = 0
+
+    def do(
+        self,
+        key: str,
+        fn: Callable,
+        *args,
+        timeout: Optional[float] = None,
+        share: Callable[[Any], bool] = None,
+    ) -> Any:
+        deadline = None if timeout is None else time.time() + timeout
+        with self.lock:
+            self.num_calls += 1
+            flight = self.flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self.flights[key] = _Flight()
+            else:
+                self.num_coalesced += 1
+
+        if not leader:
+            if not flight.done.wait(timeout):
+                raise TimeoutError("timed out waiting for a coalesced call")
+            if flight.error is not None:
+                raise flight.error
+            if flight.shared:
+                return flight.result
+            # Run it again, possibly leading the other callers which could not share it.
+            remaining = None if deadline is None else max(0.0, deadline - time.time())
+            return self.do(key, fn, *args, timeout=remaining, share=share)
+
+        try:
+            flight.result = fn(*args)
+            flight.shared = share is None or share(flight.result)
+            return flight.result
+        except Exception as e:
+            flight.error = e
+            raise
+        finally:
+            with self.lock:
+                del self.flights[key]
+            flight.done.set()
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            "coalesced_calls": self.num_coalesced,
+            "coalesced_rate": self.num_coalesced / max(1, self.num_calls),
+        }
@@ -0,0 +1,280 @@
+# The MIT License (MIT)
+# Copyright © 2023 Yuma Rao
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+# documentation files (the “Software”), to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+# and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+# the Software.
+
+# THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+# THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+
+import time
+import torch
+import inspect
+import threading
+import bittensor as bt
+import torch.nn.functional as F
+from typing import Dict, List, Optional, Tuple
+
+from .generate import Prompt, encode_prompt
+from .output import OutputDecoder
+
+
+class SpeculativeDecoder:
+    """Speculative decoding of a large target model with a small draft model.
+
+    Each round the draft model proposes num_draft_tokens tokens one at a time and the
+    target model scores all of them in a single forward pass. The longest prefix the
+    target agrees with is kept, plus one token from the target itself, so every round
+    yields at least one token and greedy outputs are identical to the target's own.
+    Sampled tokens are accepted with probability min(1, p / q) and resampled from the
+    residual distribution on rejection, which preserves the target's distribution.
+
+    Both models must share a tokenizer. If the acceptance rate stays below
+    min_acceptance, drafting is switched off and the target decodes on its own.
+    """
+
+    def __init__(
+        self,
+        model: "transformers.PreTrainedModel",
+        draft_model: "transformers.PreTrainedModel",
+        num_draft_tokens: int = 4,
+        eos_token_id: Optional[int] = None,
+        do_sample: bool = False,
+        temperature: float = 1.0,
+        top_k: int = 0,
+        min_acceptance: float = 0.3,
+        min_drafted: int = 64,
+    ):
+        self.model = model
+        self.draft_model = draft_model
+        self.num_draft_tokens = max(1, num_draft_tokens)
+        self.eos_token_id = eos_token_id
+        self.do_sample = do_sample
+        self.temperature = temperature
+        self.top_k = top_k
+        self.min_acceptance = min_acceptance
+        self.min_drafted = min_drafted
+        self.enabled = True
+        self.num_drafted: int = 0
+        self.num_accepted: int = 0
+        self.num_rounds: int = 0
+        self.lock = threading.Lock()
+
+    @property
+    def acceptance_rate(self) -> float:
+        return self.num_accepted / max(1, self.num_drafted)
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            "speculative_drafted": self.num_drafted,
+            "speculative_accepted": self.num_accepted,
+            "speculative_acceptance_rate": self.acceptance_rate,
+            "speculative_tokens_per_round": (self.num_accepted + self.num_rounds)
+            / max(1, self.num_rounds),
+            "speculative_enabled": int(self.enabled),
+        }
+
+    @staticmethod
+    def _seq_dims(model: "transformers.PreTrainedModel") -> Tuple[int, int]:
+        # BLOOM caches keys as (batch * heads, head_dim, seq).
+        if getattr(model.config, "model_type", None) == "bloom":
+            return -1, -2
+        return -2, -2
+
+    @staticmethod
+    def _crop(past, length: int, seq_dims: Tuple[int, int]):
+        return tuple(
+            (
+                key.narrow(seq_dims[0], 0, length),
+                value.narrow(seq_dims[1], 0, length),
+                *rest,
+            )
+            for key, value, *rest in past
+        )
+
+    @staticmethod
+    def _forward(model, input_ids: List[int], past, cache_len: int):
+        """Runs model over input_ids on top of a cache of cache_len tokens."""
+        device = next(model.parameters()).device
+        kwargs = {}
+        if "position_ids" in inspect.signature(model.forward).parameters:
+            kwargs["position_ids"] = torch.arange(
+                cache_len, cache_len + len(input_ids), device=device
+            ).unsqueeze(0)
+        outputs = model(
+            input_ids=torch.tensor([input_ids], device=device),
+            past_key_values=past,
+            attention_mask=torch.ones(
+                (1, cache_len + len(input_ids)), dtype=torch.long, device=device
+            ),
+            use_cache=True,
+            **kwargs,
+        )
+        return outputs.logits[0].float(), outputs.past_key_values
+
+    def _probs(self, logits: torch.FloatTensor) -> torch.FloatTensor:
+        logits = logits / self.temperature
+        if self.top_k > 0:
+            kth = logits.topk(min(self.top_k, logits.shape[-1]), dim=-1).values[
+                ..., -1:
+            ]
+            logits = logits.masked_fill(logits < kth, float("-inf"))
+        return F.softmax(logits, dim=-1)
+
+    def _verify(
+        self, drafts: List[int], draft_logits: List[torch.FloatTensor], logits
+    ) -> Tuple[int, int]:
+        """Returns how many drafts the target accepts and the token it adds after them."""
+        if not self.do_sample:
+            targets = logits.argmax(dim=-1).tolist()
+            accepted = 0
+            while accepted < len(drafts) and drafts[accepted] == targets[accepted]:
+                accepted += 1
+            return accepted, targets[accepted]
+
+        for i, token in enumerate(drafts):
+            p = self._probs(logits[i])
+            q = self._probs(draft_logits[i])
+            if torch.rand(()).item() * q[token] > p[token]:
+                residual = (p - q).clamp(min=0)
+                if residual.sum() <= 0:
+                    residual = p
+                return i, torch.multinomial(residual / residual.sum(), 1).item()
+        return len(drafts), torch.multinomial(self._probs(logits[-1]), 1).item()
+
+    def _pick(self, logits: torch.FloatTensor) -> int:
+        if not self.do_sample:
+            return logits.argmax(dim=-1).item()
+        return torch.multinomial(self._probs(logits), 1).item()
+
+    def generate(
+        self,
+        input_ids: List[int],
+        max_new_tokens: int,
+        deadline: Optional[float] = None,
+    ) -> List[int]:
+        """Generates up to max_new_tokens token ids following input_ids, stopping at deadline."""
+        with self.lock, torch.no_grad():
+            return self._generate(list(input_ids), max_new_tokens, deadline)
+
+    def _generate(
+        self, tokens: List[int], max_new_tokens: int, deadline: Optional[float]
+    ) -> List[int]:
+        prompt_len = len(tokens)
+        target_dims = self._seq_dims(self.model)
+        draft_dims = self._seq_dims(self.draft_model)
+
+        # Both caches hold every committed token except the last one.
+        target_past, draft_past, draft_len = None, None, 0
+        if len(tokens) > 1:
+            _, target_past = self._forward(self.model, tokens[:-1], None, 0)
+            if self.enabled:
+                _, draft_past = self._forward(self.draft_model, tokens[:-1], None, 0)
+                draft_len = len(tokens) - 1
+
+        while len(tokens) - prompt_len < max_new_tokens:
+            cache_len = len(tokens) - 1
+            remaining = max_new_tokens - (len(tokens) - prompt_len)
+            num_drafts = (
+                min(self.num_draft_tokens, remaining - 1) if self.enabled else 0
+            )
+
+            # Propose tokens with the draft model.
+            drafts, draft_logits = [], []
+            if num_drafts > 0:
+                pending = tokens[draft_len:]
+                for _ in range(num_drafts):
+                    logits, draft_past = self._forward(
+                        self.draft_model, pending, draft_past, draft_len
+                    )
+                    draft_len += len(pending)
+                    draft_logits.append(logits[-1])
+                    pending = [self._pick(logits[-1])]
+                    drafts.append(pending[0])
+
+            # Score the last committed token and every draft in one target pass.
+            logits, target_past = self._forward(
+                self.model, tokens[cache_len:] + drafts, target_past, cache_len
+            )
+            if num_drafts > 0:
+                accepted, token = self._verify(drafts, draft_logits, logits)
+                self.num_rounds += 1
+                self.num_drafted += num_drafts
+                self.num_accepted += accepted
+            else:
+                accepted, token = 0, self._pick(logits[-1])
+            tokens += drafts[:accepted] + [token]
+
+            # Drop the cached positions of rejected drafts.
+            target_past = self._crop(target_past, len(tokens) - 1, target_dims)
+            if draft_past is not None and draft_len > len(tokens) - 1:
+                draft_past = self._crop(draft_past, len(tokens) - 1, draft_dims)
+                draft_len = len(tokens) - 1
+
+            if (
+                self.eos_token_id is not None
+                and self.eos_token_id in tokens[-accepted - 1 :]
+            ):
+                end = tokens.index(self.eos_token_id, len(tokens) - accepted - 1)
+                tokens = tokens[: end + 1]
+                break
+            if deadline is not None and time.time() >= deadline:
+                break
+
+            if (
+                self.enabled
+                and self.num_drafted >= self.min_drafted
+                and self.acceptance_rate < self.min_acceptance
+            ):
+                bt.logging.warning(
+                    f"Speculative acceptance rate { self.acceptance_rate:.2f} is below { self.min_acceptance }, decoding without the draft model."
+                )
+                self.enabled = False
+                draft_past = None
+
+        return tokens[prompt_len : prompt_len + max_new_tokens]
+
+
+def speculative_generate(
+    decoder: SpeculativeDecoder,
+    tokenizer: "transformers.PreTrainedTokenizer",
+    prompt: Prompt,
+    max_new_tokens: int,
+    time_budget: "TimeBudget" = None,
+    output_decoder: OutputDecoder = None,
+) -> str:
+    """Generates and decodes the completion of prompt with a SpeculativeDecoder.
+
+    With a time budget, generation is capped and stopped as in batch_generate. The
+    completion is decoded and cut at stop strings by output_decoder, if given.
+    """
+    output_decoder = output_decoder or OutputDecoder(tokenizer)
+    deadline = None
+    if time_budget is not None:
+        max_new_tokens = time_budget.max_new_tokens(max_new_tokens)
+        deadline = time_budget.current_deadline()
+    start_time = time.time()
+    output_ids = decoder.generate(
+        encode_prompt(tokenizer, prompt), max_new_tokens, deadline
+    )
+    if time_budget is not None:
+        time_budget.observe(len(output_ids), time.time() - start_time)
+    return output_decoder.decode(output_ids)
+
+
+def load_draft_model(
+    name: str, device: str = "cpu", torch_dtype: torch.dtype = None
+) -> "transformers.PreTrainedModel":
+    from transformers import AutoModelForCausalLM
+
+    bt.logging.info(f"Loading draft model: { name }")
+    model = AutoModelForCausalLM.from_pretrained(name, torch_dtype=torch_dtype)
+    return model.to(device).eval()
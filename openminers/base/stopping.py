@@ -0,0 +1,156 @@
+# The MIT License (MIT)
+# Copyright © 2023 Yuma Rao
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+# documentation files (the “Software”), to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+# and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+# the Software.
+
+# THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+# THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+import torch
+from collections import defaultdict
+from typing import Any, Dict, Iterable, List, Sequence
+from transformers import (
+    LogitsProcessor,
+    LogitsProcessorList,
+    StoppingCriteria,
+    StoppingCriteriaList,
+)
+
+
+class StopSequences:
+    """Token id sequences which end a generation when they appear at its end.
+
+    Sequences of the same length are stacked into one tensor, so checking a whole batch
+    is one comparison per distinct length rather than a Python loop over rows and ids.
+    """
+
+    def __init__(self, sequences: Iterable[Sequence[int]]):
+        by_length = defaultdict(list)
+        for sequence in sequences:
+            if any(token_id is None for token_id in sequence):
+                raise ValueError(
+                    f"stop sequence {list(sequence)} has a missing token id"
+                )
+            if len(sequence) > 0:
+                by_length[len(sequence)].append(list(sequence))
+        self.sequences = [tuple(s) for group in by_length.values() for s in group]
+        self.by_length: Dict[int, torch.LongTensor] = {
+            length: torch.tensor(group, dtype=torch.long)
+            for length, group in sorted(by_length.items())
+        }
+
+    @classmethod
+    def from_strings(
+        cls,
+        tokenizer: "transformers.PreTrainedTokenizer",
+        stop_strings: Iterable[str] = (),
+        token_ids: Iterable[int] = (),
+    ) -> "StopSequences":
+        """Stops on the tokenization of each stop string and on each single token id.
+
+        A stop string is only matched when the model generates the same tokens the
+        tokenizer produces for it on its own. Token ids which are None, as
+        convert_tokens_to_ids returns for tokens missing from a vocab without an unknown
+        token, are skipped.
+        """
+        return cls(
+            [tokenizer.encode(text, add_special_tokens=False) for text in stop_strings]
+            + [[token_id] for token_id in token_ids if token_id is not None]
+        )
+
+    def matches(
+        self, input_ids: torch.LongTensor, num_generated: int
+    ) -> torch.BoolTensor:
+        """For each row of input_ids, whether its last num_generated tokens end in a stop sequence."""
+        matched = torch.zeros(
+            input_ids.shape[0], dtype=torch.bool, device=input_ids.device
+        )
+        for length, sequences in self.by_length.items():
+            if length > num_generated:
+                break
+            sequences = sequences.to(input_ids.device)
+            if length == 1:
+                matched |= torch.isin(input_ids[:, -1], sequences[:, 0])
+            else:
+                tail = input_ids[:, -length:].unsqueeze(1)
+                matched |= (tail == sequences.unsqueeze(0)).all(dim=-1).any(dim=-1)
+        return matched
+
+    def ends_with(self, token_ids: List[int]) -> bool:
+        """Whether a single generated sequence ends in a stop sequence."""
+        return any(
+            len(token_ids) >= len(sequence)
+            and tuple(token_ids[-len(sequence) :]) == sequence
+            for sequence in self.sequences
+        )
+
+    def generate_kwargs(
+        self,
+        eos_token_id: int,
+        stopping_criteria: Iterable = (),
+        logits_processor: Iterable = (),
+        **kwargs,
+    ) -> Dict[str, Any]:
+        """generate() arguments which end each sequence of the batch at a stop sequence.
+
+        A finished sequence is made to emit eos_token_id next, so generate pads it from
+        then on, and generation ends once every sequence is finished. Other stopping
+        criteria, logits processors and generate arguments are passed through.
+        """
+        criteria = StopSequenceCriteria(self)
+        return {
+            **kwargs,
+            "stopping_criteria": StoppingCriteriaList([*stopping_criteria, criteria]),
+            "logits_processor": LogitsProcessorList(
+                [*logits_processor, _ForceEosWhenFinished(criteria, eos_token_id)]
+            ),
+        }
+
+
+class StopSequenceCriteria(StoppingCriteria):
+    """Tracks which sequences of one generate call have produced a stop sequence.
+
+    Make one per generate call: the prompt length is taken from the first step.
+    """
+
+    def __init__(self, stop_sequences: StopSequences):
+        self.stop_sequences = stop_sequences
+        self.prompt_len: int = None
+        self.finished: torch.BoolTensor = None
+
+    def __call__(
+        self, input_ids: torch.LongTensor, scores: torch.FloatTensor, **kwargs
+    ) -> bool:
+        if self.prompt_len is None:
+            self.prompt_len = input_ids.shape[1] - 1
+            self.finished = torch.zeros(
+                input_ids.shape[0], dtype=torch.bool, device=input_ids.device
+            )
+        self.finished |= self.stop_sequences.matches(
+            input_ids, input_ids.shape[1] - self.prompt_len
+        )
+        return bool(self.finished.all())
+
+
+class _ForceEosWhenFinished(LogitsProcessor):
+    def __init__(self, criteria: StopSequenceCriteria, eos_token_id: int):
+        self.criteria = criteria
+        self.eos_token_id = eos_token_id
+
+    def __call__(
+        self, input_ids: torch.LongTensor, scores: torch.FloatTensor
+    ) -> torch.FloatTensor:
+        finished = self.criteria.finished
+        if finished is None or not finished.any():
+            return scores
+        scores[finished] = -float("inf")
+        scores[finished, self.eos_token_id] = 0.0
+        return scores
@@ -0,0 +1,108 @@
+# The MIT License (MIT)
+# Copyright © 2023 Yuma Rao
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+# documentation files (the “Software”), to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+# and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+# the Software.
+
+# THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+# THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+
+import time
+import asyncio
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from openminers.base.async_prompting_miner import EventLoopThread
+
+LATENCY = 0.2
+
+
+class SlowHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        time.sleep(LATENCY)
+        body = b"completion"
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def start_server() -> ThreadingHTTPServer:
+    server = ThreadingHTTPServer(("127.0.0.1", 0), SlowHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+async def fetch(port: int) -> str:
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    writer.write(b"GET / HTTP/1.0\r\nHost: localhost\r\n\r\n")
+    await writer.drain()
+    response = await reader.read()
+    writer.close()
+    return response.split(b"\r\n\r\n", 1)[1].decode()
+
+
+def test_event_loop_multiplexes_requests(run_concurrently):
+    server = start_server()
+    event_loop = EventLoopThread(max_concurrency=64)
+    port = server.server_address[1]
+    start_time = time.time()
+    results, _ = run_concurrently(lambda _: event_loop.run(fetch, port), 32)
+    elapsed = time.time() - start_time
+
+    assert results == ["completion"] * 32
+    assert elapsed < 16 * LATENCY
+    event_loop.stop()
+    server.shutdown()
+
+
+def test_event_loop_bounds_concurrency(run_concurrently):
+    server = start_server()
+    event_loop = EventLoopThread(max_concurrency=2)
+    port = server.server_address[1]
+    start_time = time.time()
+    results, _ = run_concurrently(lambda _: event_loop.run(fetch, port), 6)
+    elapsed = time.time() - start_time
+
+    assert results == ["completion"] * 6
+    assert elapsed >= 3 * LATENCY
+    event_loop.stop()
+    server.shutdown()
+
+
+def test_streams_are_bounded_by_max_concurrency():
+    event_loop = EventLoopThread(max_concurrency=1)
+
+    async def chunks(name, num_chunks):
+        for i in range(num_chunks):
+            await asyncio.sleep(0.05)
+            yield f"{ name }{ i }"
+
+    first = event_loop.stream(chunks, "a", 100)
+    assert next(first) == "a0"
+    assert event_loop.num_in_flight == 1
+
+    # The second stream only starts once the first releases its slot.
+    second = []
+    thread = threading.Thread(
+        target=lambda: second.extend(event_loop.stream(chunks, "b", 3))
+    )
+    thread.start()
+    time.sleep(0.2)
+    assert second == []
+    first.close()
+    thread.join(5)
+    assert second == ["b0", "b1", "b2"]
+    assert event_loop.num_in_flight == 0
+    event_loop.stop()
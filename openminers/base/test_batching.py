@@ -0,0 +1,64 @@
+# The MIT License (MIT)
+# Copyright © 2023 Yuma Rao
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+# documentation files (the “Software”), to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+# and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+# the Software.
+
+# THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+# THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+
+import pytest
+
+from openminers.base.batching import RequestBatcher
+from openminers.base.generate import batch_generate
+
+
+def test_batcher_groups_concurrent_requests(run_concurrently):
+    batch_sizes = []
+
+    def batch_fn(items):
+        batch_sizes.append(len(items))
+        return [item.upper() for item in items]
+
+    batcher = RequestBatcher(batch_fn, max_batch_size=4, max_wait=0.2)
+    items = ["a", "b", "c", "d", "e", "f"]
+    results, _ = run_concurrently(lambda i: batcher.submit(items[i]), len(items))
+
+    assert results == ["A", "B", "C", "D", "E", "F"]
+    assert max(batch_sizes) <= 4
+    assert sum(batch_sizes) == 6
+    assert len(batch_sizes) < 6
+
+
+def test_batcher_propagates_errors():
+    def batch_fn(items):
+        raise RuntimeError("boom")
+
+    batcher = RequestBatcher(batch_fn, max_batch_size=2, max_wait=0.01)
+    with pytest.raises(RuntimeError):
+        batcher.submit("a")
+
+
+def test_batch_generate_tiny_model(tiny_model_and_tokenizer):
+    model, tokenizer = tiny_model_and_tokenizer
+    prompts = ["user: hi assistant:", "user: what is the capital of texas assistant:"]
+
+    batched = batch_generate(
+        model, tokenizer, prompts, device="cpu", max_new_tokens=5, do_sample=False
+    )
+    single = [
+        batch_generate(
+            model, tokenizer, [prompt], device="cpu", max_new_tokens=5, do_sample=False
+        )[0]
+        for prompt in prompts
+    ]
+    assert len(batched) == len(prompts)
+    assert batched == single
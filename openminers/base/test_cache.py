@@ -0,0 +1,92 @@
+# The MIT License (MIT)
+# Copyright © 2023 Yuma Rao
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+# documentation files (the “Software”), to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+# and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+# the Software.
+
+# THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+# THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+import time
+
+from openminers.base.cache import ResponseCache, canonical_hash, is_deterministic
+
+
+def test_canonical_hash_ignores_key_order():
+    messages = [{"role": "user", "content": "hi"}]
+    reordered = [{"content": "hi", "role": "user"}]
+    config = {"temperature": 0.0, "max_tokens": 10}
+    assert canonical_hash(messages, config) == canonical_hash(
+        reordered, {"max_tokens": 10, "temperature": 0.0}
+    )
+    assert canonical_hash(messages) == canonical_hash(messages, {})
+    assert canonical_hash(messages, config) != canonical_hash(
+        messages, {"temperature": 0.0, "max_tokens": 11}
+    )
+    assert canonical_hash(messages) != canonical_hash(
+        [{"role": "user", "content": "hi "}]
+    )
+
+
+def test_is_deterministic():
+    assert is_deterministic({"do_sample": False, "temperature": 0.7})
+    assert is_deterministic({"temperature": 0})
+    assert not is_deterministic({"do_sample": True, "temperature": 0.7})
+    assert not is_deterministic({})
+
+
+def test_ttl_expires_entries():
+    cache = ResponseCache(ttl=0.05)
+    cache.put("a", "response")
+    assert cache.get("a") == "response"
+    time.sleep(0.1)
+    assert cache.get("a") is None
+    assert cache.stats()["cache_entries"] == 0
+    assert cache.num_bytes == 0
+
+
+def test_lru_evicts_least_recently_used():
+    cache = ResponseCache(max_entries=2)
+    cache.put("a", "1")
+    cache.put("b", "2")
+    assert cache.get("a") == "1"
+    cache.put("c", "3")
+    assert cache.get("b") is None
+    assert cache.get("a") == "1"
+    assert cache.get("c") == "3"
+    assert cache.num_evictions == 1
+
+
+def test_byte_bound():
+    cache = ResponseCache(max_bytes=10)
+    cache.put("too big", "x" * 11)
+    assert cache.get("too big") is None
+
+    cache.put("a", "x" * 6)
+    cache.put("b", "é" * 2)
+    assert cache.num_bytes == 10
+    cache.put("c", "x" * 3)
+    assert cache.get("a") is None
+    assert cache.num_bytes == 7
+
+    # Replacing an entry releases its old bytes.
+    cache.put("c", "x")
+    assert cache.num_bytes == 5
+
+
+def test_stats():
+    cache = ResponseCache()
+    cache.put("a", "response")
+    cache.get("a")
+    cache.get("b")
+    stats = cache.stats()
+    assert stats["cache_hits"] == 1
+    assert stats["cache_misses"] == 1
+    assert stats["cache_hit_rate"] == 0.5
@@ -0,0 +1,83 @@
+# The MIT License (MIT)
+# Copyright © 2023 Yuma Rao
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+# documentation files (the “Software”), to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+# and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+# the Software.
+
+# THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+# THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+from openminers.base.chat_template import PLAIN_TEMPLATE, ChatTemplate
+
+MESSAGES = [
+    {"role": "system", "content": "You are helpful. "},
+    {"role": "user", "content": " Hi"},
+    {"role": "assistant", "content": "Hello!"},
+    {"role": "tool", "content": "ignored"},
+    {"role": "user", "content": "How are you?"},
+]
+
+
+def legacy_plain(history):
+    processed_history = ""
+    for message in history:
+        if message["role"] == "system":
+            processed_history += "system: " + message["content"] + "\n"
+        if message["role"] == "assistant":
+            processed_history += "assistant: " + message["content"] + "\n"
+        if message["role"] == "user":
+            processed_history += "user: " + message["content"] + "\n"
+    return processed_history
+
+
+def human_bot_template(system_prompt=None):
+    return ChatTemplate(
+        {
+            "system": ("<human>: ", "\n"),
+            "assistant": ("<bot>: ", "\n"),
+            "user": ("<human>: ", "\n"),
+        },
+        strip=True,
+        system_prompt=system_prompt,
+        generation_prompt="<bot>:",
+    )
+
+
+def test_plain_template_matches_the_miners_it_replaces():
+    assert PLAIN_TEMPLATE.render(MESSAGES) == legacy_plain(MESSAGES)
+    assert PLAIN_TEMPLATE.render([]) == ""
+    assert PLAIN_TEMPLATE.stop_strings() == ["\nsystem:", "\nuser:"]
+
+
+def test_strip_and_generation_prompt():
+    template = human_bot_template()
+    assert template.render(MESSAGES[:3], add_generation_prompt=True) == (
+        "<human>: You are helpful.\n<human>: Hi\n<bot>: Hello!\n<bot>:"
+    )
+
+
+def test_system_prompt_replaces_only_a_leading_system_message():
+    template = human_bot_template(system_prompt="Be brief.\n")
+    assert template.render(MESSAGES[:2]) == "Be brief.\n<human>: Hi\n"
+
+    # A later message with the same content as the first is kept.
+    repeated = MESSAGES[:2] + [dict(MESSAGES[0])]
+    assert template.render(repeated).endswith("<human>: You are helpful.\n")
+
+    # Without a leading system message nothing is dropped.
+    assert template.render(MESSAGES[1:2]) == "Be brief.\n<human>: Hi\n"
+
+
+def test_segments_join_into_the_rendered_prompt():
+    template = human_bot_template(system_prompt="Be brief.\n")
+    segments = template.segments(MESSAGES)
+    assert len(segments) == len(MESSAGES)
+    assert segments[0] == "" and segments[3] == ""
+    assert template.preamble + "".join(segments) == template.render(MESSAGES)
@@ -0,0 +1,147 @@
+# The MIT License (MIT)
+# Copyright © 2023 Yuma Rao
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+# documentation files (the “Software”), to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+# and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+# the Software.
+
+# THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+# THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+
+import torch
+from transformers import GPT2Config, GPT2LMHeadModel
+
+from openminers.base.continuous_batching import ContinuousBatchingEngine
+from openminers.base.prefix_cache import PrefixCache
+from openminers.base.conversation_cache import ConversationCache
+
+
+def tiny_model():
+    torch.manual_seed(0)
+    config = GPT2Config(vocab_size=64, n_positions=128, n_embd=32, n_layer=2, n_head=2)
+    return GPT2LMHeadModel(config).eval()
+
+
+def reference_generate(model, input_ids, max_new_tokens, eos_token_id):
+    with torch.no_grad():
+        output = model.generate(
+            torch.tensor([input_ids]),
+            max_new_tokens=max_new_tokens,
+            do_sample=False,
+            eos_token_id=eos_token_id,
+            pad_token_id=eos_token_id,
+        )
+    return output[0, len(input_ids) :].tolist()
+
+
+def test_engine_matches_sequential_greedy_generate():
+    model = tiny_model()
+    engine = ContinuousBatchingEngine(model, eos_token_id=63, max_batch_size=2)
+    prompts = [
+        ([1, 2, 3], 8),
+        ([4, 5, 6, 7, 8, 9, 10, 11], 3),
+        ([12, 13], 12),
+        ([14, 15, 16, 17, 18], 5),
+    ]
+
+    requests = [engine.add(ids, max_new_tokens) for ids, max_new_tokens in prompts]
+    outputs = [request.wait() for request in requests]
+
+    for (ids, max_new_tokens), output in zip(prompts, outputs):
+        assert output == reference_generate(model, ids, max_new_tokens, 63)
+    assert engine.active == []
+
+
+def test_engine_retires_finished_sequences_early():
+    model = tiny_model()
+    engine = ContinuousBatchingEngine(model, eos_token_id=63, max_batch_size=4)
+    short = engine.add([1, 2, 3], 1)
+    long = engine.add([4, 5, 6], 20)
+
+    assert len(short.wait()) == 1
+    assert long.wait() == reference_generate(model, [4, 5, 6], 20, 63)
+
+
+def test_prefix_cache_only_prefills_the_suffix():
+    model = tiny_model()
+    cache = PrefixCache(min_prefix_len=4)
+    engine = ContinuousBatchingEngine(model, eos_token_id=63, prefix_cache=cache)
+    system = list(range(1, 21))
+    prompts = [system + [30, 31], system + [40], system + [30, 31, 32, 33]]
+
+    for ids in prompts:
+        assert engine.submit(ids, 6) == reference_generate(model, ids, 6, 63)
+
+    assert cache.num_misses == 1 and cache.num_hits == 2
+    assert cache.num_reused_tokens == 20 + 22
+    # The last prompt extends the first, which is dropped as redundant.
+    assert len(cache.entries) == 2
+
+
+def test_prefix_cache_evicts_least_recently_used_under_memory_cap():
+    model = tiny_model()
+    one_prompt = (
+        2 * 2 * 2 * 20 * 16 * 4
+    )  # layers * (key, value) * heads * seq * head_dim * fp32
+    cache = PrefixCache(max_bytes=2 * one_prompt, min_prefix_len=4)
+    engine = ContinuousBatchingEngine(model, eos_token_id=63, prefix_cache=cache)
+
+    for first in (1, 2, 3):
+        engine.submit([first] * 20, 1)
+
+    assert cache.num_evictions == 1
+    assert cache.num_bytes <= cache.max_bytes
+    assert (1,) * 20 not in cache.entries
+
+
+def test_conversation_cache_resumes_from_the_previous_turn():
+    model = tiny_model()
+    cache = ConversationCache()
+    engine = ContinuousBatchingEngine(model, eos_token_id=63, conversation_cache=cache)
+    turn_1 = [{"role": "user", "content": "hi"}]
+    turn_2 = turn_1 + [
+        {"role": "assistant", "content": "hello"},
+        {"role": "user", "content": "how are you"},
+    ]
+    ids_1 = list(range(1, 13))
+    ids_2 = ids_1 + [20, 21, 22]
+
+    with cache.conversation("alice", turn_1):
+        engine.submit(ids_1, 4)
+    with cache.conversation("bob", turn_2):
+        assert engine.submit(ids_2, 4) == reference_generate(model, ids_2, 4, 63)
+    with cache.conversation("alice", turn_2):
+        assert engine.submit(ids_2, 4) == reference_generate(model, ids_2, 4, 63)
+
+    # Only alice's second turn extends a cached conversation of the same caller.
+    assert cache.num_hits == 1 and cache.num_misses == 2
+    assert cache.num_reused_tokens == len(ids_1)
+    assert len(cache.entries) == 2
+
+
+def test_conversation_cache_keeps_the_reply():
+    model = tiny_model()
+    cache = ConversationCache()
+    engine = ContinuousBatchingEngine(model, eos_token_id=63, conversation_cache=cache)
+    turn_1 = [{"role": "user", "content": "hi"}]
+    turn_2 = turn_1 + [
+        {"role": "assistant", "content": "hello"},
+        {"role": "user", "content": "how are you"},
+    ]
+    ids_1 = list(range(1, 13))
+
+    with cache.conversation("alice", turn_1):
+        reply = engine.submit(ids_1, 4)
+    ids_2 = ids_1 + reply + [20, 21]
+    with cache.conversation("alice", turn_2):
+        assert engine.submit(ids_2, 4) == reference_generate(model, ids_2, 4, 63)
+
+    # Every token of the first turn but the last sampled one was in the cache.
+    assert cache.num_reused_tokens == len(ids_1) + len(reply) - 1
@@ -0,0 +1,151 @@
+# The MIT License (MIT)
+# Copyright © 2023 Yuma Rao
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+# documentation files (the “Software”), to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+# and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+# the Software.
+
+# THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+# THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+import asyncio
+
+import pytest
+
+from openminers.base.hedging import HedgedMiner, Hedger, LatencyWindow
+from openminers.base.time_budget import TimeBudget
+
+
+class MockProvider:
+    def __init__(self, name: str, latencies):
+        self.name = name
+        self.latencies = list(latencies)
+        self.calls = 0
+        self.cancelled = 0
+
+    async def __call__(self, messages):
+        latency = self.latencies[min(self.calls, len(self.latencies) - 1)]
+        self.calls += 1
+        try:
+            await asyncio.sleep(latency)
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        if latency < 0:
+            raise RuntimeError(f"{ self.name } failed")
+        return self.name
+
+
+class BudgetedProvider:
+    """Answers with the deadline its forward runs under, after latency seconds."""
+
+    def __init__(self, latency: float):
+        self.latency = latency
+        self.time_budget = TimeBudget(margin=0.0)
+
+    def call_context(self, messages, deadline=None, hotkey=None):
+        return self.time_budget.deadline(deadline)
+
+    async def forward(self, messages):
+        await asyncio.sleep(self.latency)
+        return self.time_budget.current_deadline()
+
+
+def calibrated_hedger(**kwargs) -> Hedger:
+    hedger = Hedger(min_observations=5, **kwargs)
+    for _ in range(100):
+        hedger.primary_latency.observe(0.01)
+    return hedger
+
+
+def test_percentile():
+    window = LatencyWindow(size=100)
+    for latency in range(1, 101):
+        window.observe(latency)
+    assert window.percentile(50) == 51
+    assert window.percentile(99) == 99
+    assert window.percentile(100) == 100
+
+
+def test_no_hedging_while_calibrating():
+    hedger = Hedger(min_observations=5, budget=1.0)
+    primary, secondary = MockProvider("a", [0.02]), MockProvider("b", [0.0])
+    for _ in range(5):
+        assert asyncio.run(hedger.run(primary, secondary, [])) == "a"
+    assert secondary.calls == 0
+    assert hedger.delay() is not None
+
+
+def test_slow_primary_is_hedged_and_cancelled():
+    hedger = calibrated_hedger(budget=1.0)
+    primary, secondary = MockProvider("a", [1.0]), MockProvider("b", [0.0])
+
+    assert asyncio.run(hedger.run(primary, secondary, [])) == "b"
+    assert primary.cancelled == 1
+    stats = hedger.stats()
+    assert stats["hedge_rate"] == 1.0
+    assert stats["hedge_win_rate"] == 1.0
+
+
+def test_cancelled_primary_is_observed_as_lower_bound():
+    hedger = calibrated_hedger(budget=1.0)
+    primary, secondary = MockProvider("a", [1.0]), MockProvider("b", [0.05])
+
+    assert asyncio.run(hedger.run(primary, secondary, [])) == "b"
+    assert len(hedger.primary_latency) == 101
+    assert hedger.primary_latency.latencies[-1] >= 0.05
+
+
+def test_primary_wins_if_it_finishes_first():
+    hedger = calibrated_hedger(budget=1.0)
+    primary, secondary = MockProvider("a", [0.05]), MockProvider("b", [1.0])
+
+    assert asyncio.run(hedger.run(primary, secondary, [])) == "a"
+    assert secondary.cancelled == 1
+    assert hedger.stats()["hedge_win_rate"] == 0.0
+
+
+def test_failed_hedge_falls_back_to_primary():
+    hedger = calibrated_hedger(budget=1.0)
+    primary, secondary = MockProvider("a", [0.05]), MockProvider("b", [-0.01])
+    assert asyncio.run(hedger.run(primary, secondary, [])) == "a"
+
+    failing = calibrated_hedger(budget=1.0)
+    with pytest.raises(RuntimeError):
+        asyncio.run(
+            failing.run(MockProvider("a", [-0.05]), MockProvider("b", [-0.05]), [])
+        )
+
+
+def test_budget_caps_hedges():
+    hedger = calibrated_hedger(percentile=50, budget=0.25, max_burst=1.0)
+    primary, secondary = MockProvider("a", [0.03]), MockProvider("b", [0.0])
+
+    async def run_all():
+        return [await hedger.run(primary, secondary, []) for _ in range(20)]
+
+    results = asyncio.run(run_all())
+    assert results.count("b") == 5
+    assert hedger.num_denied == 15
+    assert hedger.stats()["hedge_rate"] == 0.25
+
+
+def test_providers_run_under_the_callers_deadline():
+    hedger = calibrated_hedger(budget=1.0)
+    primary = HedgedMiner.provider_forward(BudgetedProvider(1.0))
+    secondary = HedgedMiner.provider_forward(BudgetedProvider(0.0))
+
+    async def run_all():
+        # Concurrent calls on one loop each keep their own deadline.
+        return await asyncio.gather(
+            hedger.run(primary, secondary, [], 1e10, "a"),
+            hedger.run(primary, secondary, [], 2e10, "b"),
+        )
+
+    assert asyncio.run(run_all()) == [1e10, 2e10]
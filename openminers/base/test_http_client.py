@@ -0,0 +1,136 @@
+# The MIT License (MIT)
+# Copyright © 2023 Yuma Rao
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+# documentation files (the “Software”), to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+# and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+# the Software.
+
+# THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+# THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+import json
+import asyncio
+from collections import Counter
+
+import httpx
+import pytest
+
+from openminers.base.http_client import PooledHTTPClient
+
+
+def mock_client(handler, **kwargs) -> PooledHTTPClient:
+    """A pooled client whose requests are answered by handler instead of the network."""
+    client = PooledHTTPClient(http2=False, **kwargs)
+    client.client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    return client
+
+
+def test_request():
+    def handler(request: httpx.Request) -> httpx.Response:
+        assert request.method == "GET"
+        assert request.headers["authorization"] == "Bearer key"
+        return httpx.Response(200, text="pong")
+
+    async def run():
+        client = mock_client(handler)
+        response = await client.request(
+            "GET", "https://api.test/ping", headers={"Authorization": "Bearer key"}
+        )
+        await client.aclose()
+        return client, response
+
+    client, response = asyncio.run(run())
+    assert response.text == "pong"
+    assert client.stats()["http_requests"] == 1
+
+
+def test_post_json():
+    def handler(request: httpx.Request) -> httpx.Response:
+        assert request.url == "https://api.test/complete"
+        return httpx.Response(200, json={"echo": json.loads(request.content)})
+
+    async def run():
+        client = mock_client(handler)
+        try:
+            return await client.post_json("https://api.test/complete", {"prompt": "hi"})
+        finally:
+            await client.aclose()
+
+    assert asyncio.run(run()) == {"echo": {"prompt": "hi"}}
+
+
+@pytest.mark.parametrize(
+    "body",
+    [
+        'data: {"text": "a"}\n\n: keep-alive\n\ndata: {"text": "b"}\n\ndata: [DONE]\n\ndata: {"text": "c"}\n',
+        '{"text": "a"}\n\n{"text": "b"}\n',
+    ],
+    ids=["server-sent events", "newline delimited"],
+)
+def test_stream_json(body):
+    def handler(request: httpx.Request) -> httpx.Response:
+        return httpx.Response(200, text=body)
+
+    async def run():
+        client = mock_client(handler)
+        try:
+            return [
+                event
+                async for event in client.stream_json("https://api.test/stream", {})
+            ]
+        finally:
+            await client.aclose()
+
+    assert asyncio.run(run()) == [{"text": "a"}, {"text": "b"}]
+
+
+def test_errors_propagate():
+    def handler(request: httpx.Request) -> httpx.Response:
+        if request.url.path == "/down":
+            raise httpx.ConnectError("connection refused", request=request)
+        return httpx.Response(429, json={"error": "rate limited"})
+
+    async def run():
+        client = mock_client(handler)
+        try:
+            with pytest.raises(httpx.HTTPStatusError):
+                await client.post_json("https://api.test/complete", {})
+            with pytest.raises(httpx.HTTPStatusError):
+                async for _ in client.stream_json("https://api.test/stream", {}):
+                    pass
+            with pytest.raises(httpx.ConnectError):
+                await client.post_json("https://api.test/down", {})
+        finally:
+            await client.aclose()
+
+    asyncio.run(run())
+
+
+def test_per_host_semaphore():
+    in_flight, peak = Counter(), Counter()
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        host = request.url.host
+        in_flight[host] += 1
+        peak[host] = max(peak[host], in_flight[host])
+        await asyncio.sleep(0.01)
+        in_flight[host] -= 1
+        return httpx.Response(200, json={})
+
+    async def run():
+        client = mock_client(handler, max_connections_per_host=2)
+        try:
+            await asyncio.gather(
+                *[client.post_json(f"https://{host}.test/", {}) for host in "ab" * 5]
+            )
+        finally:
+            await client.aclose()
+
+    asyncio.run(run())
+    assert peak == {"a.test": 2, "b.test": 2}
@@ -0,0 +1,54 @@
+# The MIT License (MIT)
+# Copyright © 2023 Yuma Rao
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+# documentation files (the “Software”), to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+# and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+# the Software.
+
+# THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+# THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+
+import os
+import torch
+import pytest
+
+from openminers.base.loading import ModelLoader, StartupTimer, placement_kwargs
+
+
+def test_loads_model_and_tokenizer_from_safetensors(tiny_model_and_tokenizer, tmp_path):
+    model, tokenizer = tiny_model_and_tokenizer
+    model.save_pretrained(tmp_path, safe_serialization=True)
+    tokenizer.save_pretrained(tmp_path)
+    assert os.path.exists(tmp_path / "model.safetensors")
+
+    startup = StartupTimer()
+    loaded_model, loaded_tokenizer = (
+        ModelLoader(str(tmp_path), startup=startup).start().wait()
+    )
+
+    assert loaded_tokenizer.encode("hello") == tokenizer.encode("hello")
+    for name, parameter in model.state_dict().items():
+        assert torch.equal(loaded_model.state_dict()[name], parameter)
+    assert set(startup.phase_times) == {"tokenizer", "model"}
+
+    startup.ready()
+    stats = startup.stats()
+    assert stats["time_to_ready"] >= stats["startup_model_time"] > 0
+
+
+def test_loading_errors_are_raised_by_wait(tmp_path):
+    # An empty directory holds neither a tokenizer nor a model.
+    loader = ModelLoader(str(tmp_path)).start()
+    with pytest.raises(OSError):
+        loader.wait()
+
+
+def test_cpu_placement_keeps_the_default_device_map():
+    assert "device_map" not in placement_kwargs("cpu")
@@ -0,0 +1,129 @@
+# The MIT License (MIT)
+# Copyright © 2023 Yuma Rao
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+# documentation files (the “Software”), to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+# and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+# the Software.
+
+# THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+# THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+
+import string
+import pytest
+
+from tokenizers import Tokenizer, Regex, decoders, models, pre_tokenizers
+from transformers import PreTrainedTokenizerFast, pipeline
+
+from openminers.base.chat_template import PLAIN_TEMPLATE, ChatTemplate
+from openminers.base.generate import batch_generate
+from openminers.base.output import OutputDecoder
+
+SPECIAL_TOKENS = ["</s>", "<|SYSTEM|>", "<|USER|>", "<|ASSISTANT|>"]
+
+MESSAGES = [
+    {"role": "system", "content": "You are helpful."},
+    {"role": "user", "content": "What is 2+2? Answer: briefly."},
+]
+
+# The prompt formats of the miners which used to recover their answer with
+# .split(":")[-1].replace(history, "").
+FORMATS = {
+    "plain": (PLAIN_TEMPLATE, PLAIN_TEMPLATE.stop_strings(), "\nuser: thanks"),
+    "bloom": (
+        ChatTemplate(
+            {
+                "system": ("<human>: ", "\n"),
+                "assistant": ("<bot>: ", "\n"),
+                "user": ("<human>: ", "\n"),
+            },
+            generation_prompt="<bot>:",
+        ),
+        None,
+        "\n<human>: thanks",
+    ),
+    "stabilityai": (
+        ChatTemplate(
+            {
+                "system": ("<|SYSTEM|>: ", "\n"),
+                "assistant": ("<|ASSISTANT|>: ", "\n"),
+                "user": ("<|USER|>: ", "\n"),
+            },
+            generation_prompt="<|ASSISTANT|>:",
+        ),
+        None,
+        "\n<|USER|>",
+    ),
+    "falcon": (
+        ChatTemplate(
+            {
+                "system": ("", " "),
+                "assistant": ("Assistant:", "</s>"),
+                "user": ("User: ", " "),
+            },
+            strip=True,
+            generation_prompt="ASSISTANT:",
+        ),
+        ["User:"],
+        "</s> User: thanks",
+    ),
+}
+
+
+def char_tokenizer():
+    chars = SPECIAL_TOKENS + list(string.printable)
+    tokenizer = Tokenizer(
+        models.WordLevel({char: i for i, char in enumerate(chars)}, unk_token="</s>")
+    )
+    special = "|".join(token.replace("|", "\\|") for token in SPECIAL_TOKENS)
+    tokenizer.pre_tokenizer = pre_tokenizers.Split(Regex(special + "|."), "isolated")
+    tokenizer.decoder = decoders.Fuse()
+    tokenizer.add_special_tokens(SPECIAL_TOKENS)
+    return PreTrainedTokenizerFast(tokenizer_object=tokenizer, eos_token="</s>")
+
+
+@pytest.mark.parametrize("name", FORMATS)
+def test_decodes_only_the_completion_of_each_prompt_format(name):
+    template, stop_strings, run_on = FORMATS[name]
+    tokenizer = char_tokenizer()
+    decoder = OutputDecoder(
+        tokenizer,
+        template.stop_strings() if stop_strings is None else stop_strings,
+        strip=True,
+    )
+    prompt_ids = tokenizer.encode(template.render(MESSAGES, add_generation_prompt=True))
+    completion = " It is 4: two plus two."
+    output_ids = prompt_ids + tokenizer.encode(completion + run_on)
+
+    # Colons in the answer and in the prompt no longer cut the completion short.
+    assert decoder.decode(output_ids, len(prompt_ids)) == completion.strip()
+    assert decoder.decode(output_ids[: len(prompt_ids) + 3], len(prompt_ids)) == "It"
+
+
+def test_trim_cuts_at_the_earliest_stop_string():
+    decoder = OutputDecoder(char_tokenizer(), ["\nuser:", "\nsystem:"])
+    assert decoder.trim("a\nsystem: b\nuser: c") == "a"
+    assert decoder.trim("a: b") == "a: b"
+    assert OutputDecoder(char_tokenizer()).trim(" a\nuser: b ") == " a\nuser: b "
+
+
+def test_pipeline_and_generate_decode_the_same_completion(tiny_model_and_tokenizer):
+    model, tokenizer = tiny_model_and_tokenizer
+    decoder = OutputDecoder(tokenizer, ["q"], strip=True)
+    pipe = pipeline("text-generation", model=model, tokenizer=tokenizer)
+    prompts = ["the quick brown fox", "xyz q"]
+
+    generations = batch_generate(
+        model, tokenizer, prompts, "cpu", max_new_tokens=20, decoder=decoder
+    )
+    for prompt, generation in zip(prompts, generations):
+        assert "q" not in generation
+        assert generation == decoder.pipeline(
+            pipe, prompt, max_new_tokens=20, do_sample=False
+        )
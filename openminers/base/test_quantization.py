@@ -0,0 +1,125 @@
+# The MIT License (MIT)
+# Copyright © 2023 Yuma Rao
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+# documentation files (the “Software”), to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+# and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+# the Software.
+
+# THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+# THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+
+import os
+import torch
+import pytest
+
+from openminers.base.loading import ModelLoader
+from openminers.base.quantization import DynamicQuantization, model_bytes
+
+
+def greedy(model, tokenizer, prompt="hello world", max_new_tokens=8):
+    input_ids = torch.tensor([tokenizer.encode(prompt)])
+    with torch.no_grad():
+        output = model.generate(
+            input_ids,
+            attention_mask=torch.ones_like(input_ids),
+            max_new_tokens=max_new_tokens,
+            pad_token_id=tokenizer.eos_token_id,
+        )
+    return output[0, input_ids.shape[1] :]
+
+
+def test_quantizes_linear_layers_and_shrinks_the_model(tiny_model_and_tokenizer):
+    model, tokenizer = tiny_model_and_tokenizer
+    fp32_logits = model(torch.tensor([tokenizer.encode("hello")])).logits
+    fp32_bytes = model_bytes(model)
+
+    model = DynamicQuantization().quantize(model)
+    quantized = torch.ao.nn.quantized.dynamic.Linear
+    assert sum(isinstance(m, quantized) for m in model.modules()) == 2 * 4 + 1
+    assert model_bytes(model) < fp32_bytes
+
+    logits = model(torch.tensor([tokenizer.encode("hello")])).logits
+    assert torch.allclose(logits, fp32_logits, atol=0.05)
+    assert len(greedy(model, tokenizer)) == 8
+
+
+def test_bf16_activations(tiny_model_and_tokenizer):
+    quantization = DynamicQuantization(bf16=True)
+    if not quantization.bf16:
+        pytest.skip("cpu has no native bf16 support")
+    model, tokenizer = tiny_model_and_tokenizer
+    model = quantization.quantize(model)
+    assert model.dtype == torch.bfloat16
+    assert len(greedy(model, tokenizer)) == 8
+
+
+def test_caches_the_quantized_model(tiny_model_and_tokenizer, tmp_path):
+    model, tokenizer = tiny_model_and_tokenizer
+    model.save_pretrained(tmp_path / "model")
+    tokenizer.save_pretrained(tmp_path / "model")
+    model_name = str(tmp_path / "model")
+    quantization = DynamicQuantization(cache_dir=str(tmp_path / "cache"))
+
+    first, tokenizer = ModelLoader(model_name, quantization=quantization).start().wait()
+    assert os.listdir(tmp_path / "cache") == [
+        os.path.basename(quantization.cache_path(model_name))
+    ]
+
+    second, _ = ModelLoader(model_name, quantization=quantization).start().wait()
+    assert torch.equal(greedy(first, tokenizer), greedy(second, tokenizer))
+
+
+def test_ignores_cached_models_others_can_write(tiny_model_and_tokenizer, tmp_path):
+    model, tokenizer = tiny_model_and_tokenizer
+    model.save_pretrained(tmp_path / "model")
+    model_name = str(tmp_path / "model")
+    quantization = DynamicQuantization(cache_dir=str(tmp_path / "cache"))
+    quantization.load(model_name)
+    path = quantization.cache_path(model_name)
+    assert oct(os.stat(tmp_path / "cache").st_mode & 0o777) == oct(0o700)
+
+    torch.save("not a model", path)
+    os.chmod(path, 0o666)
+    assert isinstance(quantization.load(model_name), torch.nn.Module)
+    assert os.stat(path).st_mode & 0o022 == 0
+
+
+def test_cache_key_follows_the_hub_commit_and_loading_arguments(tmp_path):
+    hub = tmp_path / "hub"
+    repo = hub / "models--org--model"
+
+    def publish(commit_hash):
+        (repo / "snapshots" / commit_hash).mkdir(parents=True)
+        (repo / "snapshots" / commit_hash / "config.json").write_text("{}")
+        (repo / "refs").mkdir(exist_ok=True)
+        (repo / "refs" / "main").write_text(commit_hash)
+
+    quantization = DynamicQuantization(cache_dir=str(tmp_path / "cache"))
+
+    def cache_path(**model_kwargs):
+        return quantization.cache_path(
+            "org/model", cache_dir=str(hub), local_files_only=True, **model_kwargs
+        )
+
+    assert cache_path() is None
+
+    publish("a" * 40)
+    first = cache_path()
+    assert first is not None and first == cache_path()
+    assert cache_path(trust_remote_code=True) != first
+    assert cache_path(revision="a" * 40) != first
+
+    publish("b" * 40)
+    assert cache_path() not in (None, first)
+
+
+def test_quantization_requires_the_cpu():
+    with pytest.raises(ValueError):
+        ModelLoader("model", device="cuda", quantization=DynamicQuantization())
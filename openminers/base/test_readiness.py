@@ -0,0 +1,72 @@
+# The MIT License (MIT)
+# Copyright © 2023 Yuma Rao
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+# documentation files (the “Software”), to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+# and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+# the Software.
+
+# THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+# THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+
+import time
+import pytest
+import threading
+
+from openminers.base.readiness import Readiness
+
+
+def test_rejects_requests_until_ready():
+    readiness = Readiness()
+    assert readiness.check() == (True, "miner is loading")
+    assert not readiness.admit()
+
+    readiness.transition(Readiness.WARMING)
+    assert readiness.check() == (True, "miner is warming")
+    readiness.transition(Readiness.READY)
+    assert readiness.check() == (False, "miner is ready")
+    assert readiness.admit()
+    readiness.release()
+    assert readiness.stats()["readiness_rejected"] == 3
+
+
+def test_invalid_transitions_raise():
+    readiness = Readiness()
+    with pytest.raises(ValueError):
+        readiness.transition(Readiness.READY)
+    readiness.transition(Readiness.DRAINING)
+    with pytest.raises(ValueError):
+        readiness.transition(Readiness.WARMING)
+
+
+def test_drain_waits_for_requests_in_flight():
+    readiness = Readiness()
+    readiness.transition(Readiness.WARMING)
+    readiness.transition(Readiness.READY)
+    assert readiness.admit()
+
+    def finish():
+        time.sleep(0.1)
+        readiness.release()
+
+    threading.Thread(target=finish).start()
+    start_time = time.time()
+    assert readiness.drain(timeout=1.0)
+    assert 0.05 < time.time() - start_time < 1.0
+    assert not readiness.admit()
+    assert readiness.in_flight == 0
+
+
+def test_drain_times_out():
+    readiness = Readiness()
+    readiness.transition(Readiness.WARMING)
+    readiness.transition(Readiness.READY)
+    assert readiness.admit()
+    assert not readiness.drain(timeout=0.05)
+    assert readiness.state == Readiness.DRAINING
@@ -0,0 +1,71 @@
+# The MIT License (MIT)
+# Copyright © 2023 Yuma Rao
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+# documentation files (the “Software”), to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+# and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+# the Software.
+
+# THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+# THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+
+import os
+import sys
+import pytest
+import subprocess
+import importlib.util
+
+import openminers
+from openminers.base.registry import BASE_CLASSES, MINERS, get_miner, miner_names
+
+HEAVY_MODULES = ["torch", "transformers", "deepspeed", "wandb", "openai", "langchain"]
+
+
+def loaded_modules(code: str) -> set:
+    """The names in sys.modules after running code in a fresh interpreter."""
+    code += "; import sys; print(','.join(sorted(sys.modules)))"
+    output = subprocess.run(
+        [sys.executable, "-c", code],
+        capture_output=True,
+        text=True,
+        check=True,
+        env={**os.environ, "PYTHONPATH": os.pathsep.join(sys.path)},
+    ).stdout
+    return set(output.strip().split(","))
+
+
+def test_import_does_not_load_backends():
+    loaded = loaded_modules("import openminers")
+    assert loaded.isdisjoint(HEAVY_MODULES)
+    assert "openminers" in loaded
+    assert not any(".text_to_text." in name for name in loaded)
+
+
+def test_base_miner_import_does_not_load_transformers():
+    loaded = loaded_modules("from openminers import TemplateMiner")
+    assert "openminers.text_to_text.template.miner" in loaded
+    assert "transformers" not in loaded
+
+
+def test_every_registered_module_exists():
+    for module in [*BASE_CLASSES.values(), *MINERS.values()]:
+        assert importlib.util.find_spec(module, "openminers") is not None, module
+
+
+def test_aliases_resolve_to_the_same_class():
+    assert openminers.template is openminers.TemplateMiner
+    assert get_miner("template") is get_miner("TemplateMiner")
+    assert "falcon" in dir(openminers) and "FalconMiner" in miner_names()
+
+
+def test_unknown_names_raise():
+    with pytest.raises(AttributeError):
+        openminers.NotAMiner
+    with pytest.raises(KeyError):
+        get_miner("not_a_miner")
@@ -0,0 +1,136 @@
+# The MIT License (MIT)
+# Copyright © 2023 Yuma Rao
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+# documentation files (the “Software”), to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+# and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+# the Software.
+
+# THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+# THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+import time
+import threading
+import contextlib
+
+import pytest
+
+from openminers.base.router import Backend, FallbackRouter
+
+MESSAGES = [{"role": "user", "content": "hello there"}]
+
+
+class MockBackend:
+    def __init__(self, name: str, latency: float = 0.0, fail: bool = False):
+        self.name = name
+        self.latency = latency
+        self.fail = fail
+        self.calls = 0
+
+    def __call__(self, messages):
+        self.calls += 1
+        time.sleep(self.latency)
+        if self.fail:
+            raise RuntimeError(f"{ self.name } is down")
+        return self.name
+
+
+def test_primary_serves_everything_while_unsaturated():
+    primary, secondary = MockBackend("local"), MockBackend("api")
+    router = FallbackRouter([Backend("local", primary), Backend("api", secondary)])
+
+    assert [router.forward(MESSAGES) for _ in range(10)] == ["local"] * 10
+    assert secondary.calls == 0
+    assert router.stats()["router_spilled"] == 0
+
+
+def test_spills_over_when_primary_queue_is_full(run_concurrently):
+    primary = MockBackend("local", latency=0.2)
+    secondary = MockBackend("api", latency=0.2)
+    router = FallbackRouter(
+        [
+            Backend("local", primary, max_in_flight=2),
+            Backend("api", secondary),
+        ]
+    )
+
+    results, _ = run_concurrently(lambda _: router.forward(MESSAGES), 6)
+    assert results.count("local") == 2
+    assert results.count("api") == 4
+    stats = router.stats()
+    assert stats["router_spilled"] == 4
+    assert stats["router_local_in_flight"] == 0
+    assert stats["router_api_calls"] == 4
+
+
+def test_spills_over_when_primary_latency_estimate_is_too_high():
+    primary = MockBackend("local", latency=0.05)
+    secondary = MockBackend("api")
+    router = FallbackRouter(
+        [Backend("local", primary), Backend("api", secondary)],
+        max_latency=0.02,
+        min_observations=3,
+    )
+
+    # Calibrate on the primary, after which its estimate is over the threshold.
+    assert [router.forward(MESSAGES) for _ in range(3)] == ["local"] * 3
+    assert router.forward(MESSAGES) == "api"
+    assert router.stats()["router_local_latency"] > 0.02
+
+
+def test_weight_scales_queueing_estimate():
+    slow = Backend("local", MockBackend("local"), weight=1.0)
+    wide = Backend("local", MockBackend("local"), weight=4.0)
+    for backend in (slow, wide):
+        for _ in range(5):
+            backend.model.observe(10, 10, 1.0)
+        backend.in_flight = 4
+    assert wide.predict(10, 5) < slow.predict(10, 5)
+
+
+def test_failed_backend_falls_through_to_the_next():
+    router = FallbackRouter(
+        [
+            Backend("local", MockBackend("local", fail=True)),
+            Backend("api", MockBackend("api")),
+        ]
+    )
+    assert router.forward(MESSAGES) == "api"
+    assert router.stats()["router_local_errors"] == 1
+
+    failing = FallbackRouter([Backend("local", MockBackend("local", fail=True))])
+    with pytest.raises(RuntimeError):
+        failing.forward(MESSAGES)
+
+
+def test_backends_run_under_the_callers_deadline_and_hotkey():
+    local = threading.local()
+
+    @contextlib.contextmanager
+    def call_context(messages, deadline=None, hotkey=None):
+        local.call = (deadline, hotkey)
+        try:
+            yield
+        finally:
+            local.call = None
+
+    def forward(messages):
+        deadline, hotkey = local.call
+        return f"{ deadline } { hotkey }"
+
+    router = FallbackRouter(
+        [
+            Backend(
+                "local", MockBackend("local", fail=True), call_context=call_context
+            ),
+            Backend("api", forward, call_context=call_context),
+        ]
+    )
+    assert router.forward(MESSAGES, 12.5, "caller") == "12.5 caller"
+    assert router.forward(MESSAGES) == "None None"
+    assert local.call is None
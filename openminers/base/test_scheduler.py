@@ -0,0 +1,129 @@
+# The MIT License (MIT)
+# Copyright © 2023 Yuma Rao
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+# documentation files (the “Software”), to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+# and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+# the Software.
+
+# THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+# THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+import time
+import threading
+
+from openminers.base.scheduler import PriorityScheduler
+
+
+def queue_behind_running_call(scheduler, priorities):
+    """Queues one thread per priority while the only slot is taken, and returns their admission order."""
+    assert scheduler.acquire(priority=0.0)
+    admitted = []
+
+    def call(priority):
+        assert scheduler.acquire(priority)
+        admitted.append(priority)
+        scheduler.release()
+
+    threads = [threading.Thread(target=call, args=(p,)) for p in priorities]
+    for thread in threads:
+        thread.start()
+    while scheduler.queue_depth < len(priorities):
+        time.sleep(0.001)
+    scheduler.release()
+    for thread in threads:
+        thread.join(timeout=5)
+    return admitted
+
+
+def test_admits_by_priority():
+    scheduler = PriorityScheduler(max_concurrency=1)
+    admitted = queue_behind_running_call(scheduler, [1.0, 3.0, 2.0])
+    assert admitted == [3.0, 2.0, 1.0]
+    assert scheduler.num_admitted == 4
+    assert scheduler.running == 0
+
+
+def test_ties_go_to_the_earliest_deadline():
+    scheduler = PriorityScheduler(max_concurrency=1)
+    assert scheduler.acquire(priority=0.0)
+    admitted = []
+
+    def call(name, deadline):
+        assert scheduler.acquire(1.0, deadline)
+        admitted.append(name)
+        scheduler.release()
+
+    now = time.time()
+    threads = [
+        threading.Thread(target=call, args=("late", now + 60)),
+        threading.Thread(target=call, args=("soon", now + 30)),
+    ]
+    for thread in threads:
+        thread.start()
+    while scheduler.queue_depth < 2:
+        time.sleep(0.001)
+    scheduler.release()
+    for thread in threads:
+        thread.join(timeout=5)
+    assert admitted == ["soon", "late"]
+
+
+def test_expired_calls_are_dropped():
+    scheduler = PriorityScheduler(max_concurrency=1)
+    assert not scheduler.acquire(priority=1.0, deadline=time.time() - 1)
+    assert scheduler.num_dropped == 1
+
+    assert scheduler.acquire(priority=0.0)
+    start_time = time.time()
+    assert not scheduler.acquire(priority=1.0, deadline=start_time + 0.05)
+    assert time.time() - start_time < 1.0
+    assert scheduler.num_dropped == 2
+    assert scheduler.queue_depth == 0
+
+    # The dropped call must not hold up the ones behind it.
+    scheduler.release()
+    assert scheduler.acquire(priority=0.0, deadline=time.time() + 1)
+    scheduler.release()
+
+
+def test_release_frees_a_slot():
+    scheduler = PriorityScheduler(max_concurrency=2)
+    assert scheduler.acquire(1.0)
+    assert scheduler.acquire(1.0)
+    assert scheduler.running == 2
+    assert not scheduler.acquire(1.0, deadline=time.time() + 0.02)
+
+    scheduler.release()
+    assert scheduler.running == 1
+    assert scheduler.acquire(1.0, deadline=time.time() + 1)
+    assert scheduler.running == 2
+
+
+def test_queue_depth_ahead_counts_only_calls_admitted_first():
+    scheduler = PriorityScheduler(max_concurrency=1)
+    assert scheduler.acquire(priority=0.0)
+    now = time.time()
+    threads = [
+        threading.Thread(target=scheduler.acquire, args=(priority, now + 60))
+        for priority in [1.0, 2.0, 2.0, 3.0]
+    ]
+    for thread in threads:
+        thread.start()
+    while scheduler.queue_depth < 4:
+        time.sleep(0.001)
+
+    assert scheduler.queue_depth_ahead(4.0, now + 60) == 0
+    assert scheduler.queue_depth_ahead(2.0, now + 30) == 1
+    assert scheduler.queue_depth_ahead(2.0, now + 60) == 3
+    assert scheduler.queue_depth_ahead(0.0) == 4
+
+    for _ in threads:
+        scheduler.release()
+    for thread in threads:
+        thread.join(timeout=5)
@@ -0,0 +1,114 @@
+# The MIT License (MIT)
+# Copyright © 2023 Yuma Rao
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+# documentation files (the “Software”), to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+# and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+# the Software.
+
+# THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+# THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+import pytest
+
+from openminers.base.shedding import LatencyModel, LoadShedder, count_tokens
+
+
+def latency(prompt_tokens, completion_tokens):
+    return 0.1 + 0.001 * prompt_tokens + 0.02 * completion_tokens
+
+
+def fitted_model(**kwargs) -> LatencyModel:
+    model = LatencyModel(**kwargs)
+    for step in range(200):
+        prompt_tokens, completion_tokens = 10 + (step * 37) % 500, 5 + (step * 11) % 50
+        model.observe(
+            prompt_tokens, completion_tokens, latency(prompt_tokens, completion_tokens)
+        )
+    return model
+
+
+def calibrated_shedder(**kwargs) -> LoadShedder:
+    shedder = LoadShedder(**kwargs)
+    shedder.model = fitted_model()
+    return shedder
+
+
+def test_count_tokens():
+    assert count_tokens("") == 1
+    assert count_tokens("a" * 400) == 100
+
+
+def test_latency_model_recovers_coefficients():
+    model = fitted_model()
+    overhead, per_prompt_token, per_completion_token = model.coefficients.tolist()
+    assert overhead == pytest.approx(0.1, abs=1e-2)
+    assert per_prompt_token == pytest.approx(0.001, rel=1e-2)
+    assert per_completion_token == pytest.approx(0.02, rel=1e-2)
+
+
+def test_latency_model_predicts_capped_completion():
+    model = fitted_model()
+    usual = model.predict(100)
+    assert usual == pytest.approx(latency(100, model.mean_completion_tokens), rel=1e-2)
+    assert model.predict(100, max_tokens=1) == pytest.approx(latency(100, 1), rel=1e-2)
+    assert model.predict(100, max_tokens=1) < usual
+
+
+def test_latency_model_follows_throughput():
+    model = fitted_model()
+    for _ in range(500):
+        model.observe(100, 20, 2 * latency(100, 20))
+    assert model.predict(100, max_tokens=20) == pytest.approx(
+        2 * latency(100, 20), rel=5e-2
+    )
+
+
+def test_shedder_waits_for_min_observations():
+    shedder = LoadShedder(min_observations=5)
+    for _ in range(4):
+        shedder.observe(100, 20, 10.0)
+        assert shedder.should_shed(100, 20, remaining=1.0) == (False, "calibrating")
+    shedder.observe(100, 20, 10.0)
+    assert shedder.should_shed(100, 20, remaining=1.0)[0]
+
+
+def test_shedder_rejects_passed_deadlines_while_calibrating():
+    shedder = LoadShedder()
+    assert shedder.should_shed(100, 20, remaining=0.0) == (True, "deadline passed")
+    assert shedder.stats() == {"shed_deadline_passed": 1, "shed_total": 1}
+
+
+def test_shedding_decisions():
+    shedder = calibrated_shedder(min_observations=5)
+    expected = latency(100, 20)
+
+    assert not shedder.should_shed(100, 20, remaining=2 * expected)[0]
+    assert shedder.should_shed(100, 20, remaining=0.5 * expected) == (
+        True,
+        "predicted latency exceeds timeout",
+    )
+
+    # Calls queued ahead share the slots, so the wait scales with depth / concurrency.
+    wait = 4 * shedder.model.mean_latency
+    remaining = expected + wait / 2
+    assert shedder.should_shed(100, 20, remaining, queue_depth=4)[1] == (
+        "predicted queue wait exceeds timeout"
+    )
+    assert not shedder.should_shed(100, 20, remaining, queue_depth=4, concurrency=4)[0]
+
+    assert shedder.num_shed == 2
+    assert shedder.stats()["shed_total"] == 2
+
+
+def test_margin_scales_prediction():
+    expected = latency(100, 20)
+    assert not calibrated_shedder().should_shed(100, 20, remaining=1.5 * expected)[0]
+    assert calibrated_shedder(margin=2.0).should_shed(
+        100, 20, remaining=1.5 * expected
+    )[0]
@@ -0,0 +1,74 @@
+# The MIT License (MIT)
+# Copyright © 2023 Yuma Rao
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+# documentation files (the “Software”), to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+# and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+# the Software.
+
+# THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+# THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+
+import time
+import threading
+
+import pytest
+
+from openminers.base.singleflight import SingleFlight
+
+
+def test_concurrent_callers_share_one_call(run_concurrently):
+    flight = SingleFlight()
+    calls = []
+
+    def generate():
+        calls.append(1)
+        time.sleep(0.3)
+        return "answer"
+
+    results, errors = run_concurrently(
+        lambda _: flight.do("key", generate), 4, stagger=0.05
+    )
+    assert results == ["answer"] * 4 and errors == [None] * 4
+    assert len(calls) == 1
+    assert flight.stats()["coalesced_calls"] == 3
+
+
+def test_rejected_results_are_not_shared(run_concurrently):
+    flight = SingleFlight()
+    calls = []
+
+    def generate():
+        calls.append(1)
+        time.sleep(0.2)
+        # The first call is cut off, as if it hit its caller's deadline.
+        return "" if len(calls) == 1 else "answer"
+
+    results, _ = run_concurrently(
+        lambda _: flight.do("key", generate, share=bool), 3, stagger=0.05
+    )
+    assert results == ["", "answer", "answer"]
+    # The waiting callers reran it once between them.
+    assert len(calls) == 2
+
+
+def test_followers_wait_at_most_their_timeout():
+    flight = SingleFlight()
+    leader = threading.Thread(
+        target=flight.do, args=("key", lambda: time.sleep(1) or "answer")
+    )
+    leader.start()
+    time.sleep(0.05)
+
+    start_time = time.time()
+    with pytest.raises(TimeoutError):
+        flight.do("key", lambda: "mine", timeout=0.1)
+    assert time.time() - start_time < 0.5
+    leader.join()
+    assert flight.do("key", lambda: "mine") == "mine"
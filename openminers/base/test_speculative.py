@@ -0,0 +1,84 @@
+# The MIT License (MIT)
+# Copyright © 2023 Yuma Rao
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+# documentation files (the “Software”), to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+# and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+# the Software.
+
+# THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+# THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+
+import torch
+from transformers import GPT2Config, GPT2LMHeadModel
+
+from openminers.base.speculative import SpeculativeDecoder
+
+
+def tiny_model(seed: int, n_layer: int):
+    torch.manual_seed(seed)
+    config = GPT2Config(
+        vocab_size=64, n_positions=256, n_embd=32, n_layer=n_layer, n_head=2
+    )
+    return GPT2LMHeadModel(config).eval()
+
+
+def reference_generate(model, input_ids, max_new_tokens):
+    with torch.no_grad():
+        output = model.generate(
+            torch.tensor([input_ids]),
+            max_new_tokens=max_new_tokens,
+            do_sample=False,
+            eos_token_id=None,
+            pad_token_id=0,
+        )
+    return output[0, len(input_ids) :].tolist()
+
+
+def test_greedy_speculative_decoding_matches_the_target_model():
+    target, draft = tiny_model(0, 4), tiny_model(1, 1)
+    decoder = SpeculativeDecoder(target, draft, num_draft_tokens=3, min_acceptance=0)
+
+    for prompt in ([1, 2, 3, 4, 5], [7], [9, 8, 7, 6, 5, 4, 3, 2, 1]):
+        assert decoder.generate(prompt, 20) == reference_generate(target, prompt, 20)
+    assert decoder.num_rounds > 0
+
+
+def test_identical_draft_is_always_accepted():
+    target = tiny_model(0, 2)
+    decoder = SpeculativeDecoder(target, target, num_draft_tokens=4)
+
+    output = decoder.generate([1, 2, 3], 21)
+
+    assert output == reference_generate(target, [1, 2, 3], 21)
+    assert decoder.acceptance_rate == 1.0
+    assert decoder.num_rounds == 4
+
+
+def test_falls_back_to_the_target_when_acceptance_is_low():
+    target, draft = tiny_model(0, 2), tiny_model(1, 1)
+    decoder = SpeculativeDecoder(
+        target, draft, num_draft_tokens=4, min_acceptance=1.1, min_drafted=8
+    )
+
+    output = decoder.generate([1, 2, 3], 30)
+
+    assert not decoder.enabled
+    assert decoder.num_drafted < 30
+    assert output == reference_generate(target, [1, 2, 3], 30)
+
+
+def test_sampling_stays_on_the_target_support():
+    target = tiny_model(0, 2)
+    decoder = SpeculativeDecoder(
+        target, tiny_model(1, 1), num_draft_tokens=3, do_sample=True, top_k=1
+    )
+
+    # With top_k=1 the target distribution is its argmax, whatever the draft proposes.
+    assert decoder.generate([1, 2, 3], 12) == reference_generate(target, [1, 2, 3], 12)
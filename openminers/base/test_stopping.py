@@ -0,0 +1,79 @@
+# The MIT License (MIT)
+# Copyright © 2023 Yuma Rao
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+# documentation files (the “Software”), to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+# and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+# the Software.
+
+# THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+# THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+
+import torch
+import pytest
+
+from openminers.base.continuous_batching import ContinuousBatchingEngine
+from openminers.base.generate import batch_generate
+from openminers.base.stopping import StopSequences
+
+
+def test_matches_each_row_of_the_batch():
+    stop = StopSequences([[5], [7, 8], [1, 2, 3]])
+    input_ids = torch.tensor(
+        [
+            [9, 9, 9, 9, 5],
+            [9, 9, 9, 7, 8],
+            [9, 9, 1, 2, 3],
+            [9, 9, 9, 8, 7],
+        ]
+    )
+    assert stop.matches(input_ids, 3).tolist() == [True, True, True, False]
+    # Stop sequences longer than the generation so far can not end it.
+    assert stop.matches(input_ids, 2).tolist() == [True, True, False, False]
+    assert stop.ends_with([9, 1, 2, 3]) and not stop.ends_with([2, 3])
+
+
+def test_skips_token_ids_missing_from_the_vocab(tiny_model_and_tokenizer):
+    _, tokenizer = tiny_model_and_tokenizer
+    # The tiny tokenizer has no unknown token, so missing tokens convert to None.
+    token_ids = tokenizer.convert_tokens_to_ids(["</s>", "a"])
+    assert token_ids[0] is None
+
+    stop = StopSequences.from_strings(tokenizer, ["qj"], token_ids=token_ids)
+    assert set(stop.sequences) == {(token_ids[1],), tuple(tokenizer.encode("qj"))}
+    with pytest.raises(ValueError):
+        StopSequences([[None]])
+
+
+def test_batch_generate_ends_each_sequence_at_its_stop_sequence(
+    tiny_model_and_tokenizer,
+):
+    model, tokenizer = tiny_model_and_tokenizer
+    prompts = ["the quick brown fox", "xyz q", "abc"]
+    full = batch_generate(model, tokenizer, prompts, "cpu", max_new_tokens=20)
+    assert full[0].startswith("x x x x x x u") and "q j" in full[1]
+
+    # The tiny model repeats tokens, so stop on where each generation changes token.
+    stop = StopSequences.from_strings(tokenizer, ["xu", "qj"])
+    outputs = batch_generate(
+        model, tokenizer, prompts, "cpu", max_new_tokens=20, stop_sequences=stop
+    )
+    assert outputs[0] == "x x x x x x u"
+    assert outputs[1] == full[1][: full[1].index("q j") + 3]
+    assert outputs[2] == full[2]
+
+
+def test_engine_retires_sequences_at_stop_sequences(tiny_model_and_tokenizer):
+    model, tokenizer = tiny_model_and_tokenizer
+    prompt = tokenizer.encode("the quick brown fox")
+    full = ContinuousBatchingEngine(model, eos_token_id=None).submit(prompt, 20)
+
+    stop = StopSequences.from_strings(tokenizer, ["xu"])
+    engine = ContinuousBatchingEngine(model, eos_token_id=None, stop_sequences=stop)
+    assert engine.submit(prompt, 20) == full[:7]
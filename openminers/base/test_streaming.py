@@ -0,0 +1,119 @@
+# The MIT License (MIT)
+# Copyright © 2023 Yuma Rao
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+# documentation files (the “Software”), to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+# and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+# the Software.
+
+# THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+# THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+
+import time
+import threading
+
+from openminers.base.forward import _collect_stream
+from openminers.base.continuous_batching import ContinuousBatchingEngine
+from openminers.base.generate import batch_generate, stream_generate, truncate_stream
+
+
+def test_stream_matches_batch_generate(tiny_model_and_tokenizer):
+    model, tokenizer = tiny_model_and_tokenizer
+    prompt = "user: hello there"
+    expected = batch_generate(
+        model, tokenizer, [prompt], device="cpu", max_new_tokens=12, do_sample=False
+    )[0]
+
+    chunks = list(
+        stream_generate(
+            model, tokenizer, prompt, device="cpu", max_new_tokens=12, do_sample=False
+        )
+    )
+    assert "".join(chunks) == expected
+
+    engine = ContinuousBatchingEngine(model, eos_token_id=tokenizer.eos_token_id)
+    chunks = list(
+        stream_generate(
+            model, tokenizer, prompt, device="cpu", max_new_tokens=12, engine=engine
+        )
+    )
+    assert "".join(chunks) == expected
+
+
+def test_closing_the_stream_cancels_the_engine_request(tiny_model_and_tokenizer):
+    model, tokenizer = tiny_model_and_tokenizer
+    engine = ContinuousBatchingEngine(model, eos_token_id=-1)
+    stream = stream_generate(
+        model, tokenizer, "abc", device="cpu", max_new_tokens=10000, engine=engine
+    )
+    next(stream)
+    stream.close()
+
+    deadline = time.time() + 5
+    while engine.active and time.time() < deadline:
+        time.sleep(0.01)
+    assert engine.active == []
+
+
+def test_truncate_stream_holds_back_partial_stop_strings():
+    chunks = ["hel", "lo <", "hu", "man>: more"]
+    assert list(truncate_stream(chunks, ["<human>"])) == ["hel", "lo "]
+    assert "".join(truncate_stream(["a <b", "ot>"], ["<human>"])) == "a <bot>"
+
+
+def test_collect_stream_returns_partial_answer_at_deadline():
+    closed = []
+
+    def slow_chunks():
+        try:
+            for i in range(100):
+                time.sleep(0.05)
+                yield str(i)
+        finally:
+            closed.append(True)
+
+    start = time.time()
+    text, time_to_first_chunk, truncated = _collect_stream(
+        slow_chunks(), start, start + 0.2
+    )
+
+    # The stream is closed once its next chunk hands control back to the helper.
+    wait_until = time.time() + 1
+    while not closed and time.time() < wait_until:
+        time.sleep(0.01)
+    assert truncated and closed
+    assert 0 < len(text) < 10
+    assert time_to_first_chunk < 0.2
+
+
+def test_collect_stream_cuts_off_a_stalled_stream():
+    local = threading.local()
+    seen = []
+
+    def stalled_chunks():
+        seen.append(getattr(local, "deadline", None))
+        yield "partial"
+        time.sleep(1)
+        yield " more"
+
+    class context:
+        def __enter__(self):
+            local.deadline = "set"
+
+        def __exit__(self, *args):
+            local.deadline = None
+
+    start = time.time()
+    text, _, truncated = _collect_stream(
+        stalled_chunks(), start, start + 0.2, context=context
+    )
+    assert time.time() - start < 0.5
+    assert truncated and text == "partial"
+    # The stream ran in the caller's context, on the helper thread.
+    assert seen == ["set"]
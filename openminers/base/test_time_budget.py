@@ -0,0 +1,138 @@
+# The MIT License (MIT)
+# Copyright © 2023 Yuma Rao
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+# documentation files (the “Software”), to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+# and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+# the Software.
+
+# THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+# THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+import time
+import threading
+
+from openminers.base.batching import RequestBatcher
+from openminers.base.continuous_batching import ContinuousBatchingEngine
+from openminers.base.generate import batch_generate, stream_generate
+from openminers.base.output import OutputDecoder
+from openminers.base.time_budget import TimeBudget
+
+
+def test_no_cap_without_deadline_or_rate():
+    budget = TimeBudget(margin=0.0)
+    assert budget.max_new_tokens(64) == 64
+    assert len(budget.stopping_criteria()) == 0
+
+    with budget.deadline(time.time() + 1.0):
+        assert budget.max_new_tokens(64) == 64
+        assert len(budget.stopping_criteria()) == 1
+    assert budget.current_deadline() is None
+
+
+def test_caps_max_new_tokens_by_measured_rate():
+    budget = TimeBudget(margin=1.0)
+    budget.observe(100, 1.0)
+
+    with budget.deadline(time.time() + 1.5):
+        assert 40 <= budget.max_new_tokens(200) <= 50
+        assert budget.max_new_tokens(10) == 10
+    with budget.deadline(time.time() - 5.0):
+        assert budget.max_new_tokens(200) == 1
+    assert budget.stats()["time_budget_capped"] == 2
+
+
+def test_wall_clock_stop_returns_partial_generation(tiny_model_and_tokenizer):
+    model, tokenizer = tiny_model_and_tokenizer
+    budget = TimeBudget(margin=0.0)
+
+    full = batch_generate(model, tokenizer, ["hello"], "cpu", max_new_tokens=100)[0]
+    with budget.deadline(time.time() + 0.05):
+        start_time = time.time()
+        partial = batch_generate(
+            model,
+            tokenizer,
+            ["hello"],
+            "cpu",
+            max_new_tokens=100,
+            time_budget=budget,
+            # Slow each step down so the deadline lands mid generation.
+            stopping_criteria=[lambda input_ids, scores, **kwargs: time.sleep(0.01)],
+        )[0]
+    assert time.time() - start_time < 0.5
+    assert 0 < len(partial) < len(full)
+    assert full.startswith(partial)
+    assert budget.stats()["time_budget_stopped"] == 1
+    assert budget.tokens_per_second > 0
+
+
+def test_engine_finishes_sequences_at_their_deadline(tiny_model_and_tokenizer):
+    model, tokenizer = tiny_model_and_tokenizer
+    engine = ContinuousBatchingEngine(model, eos_token_id=None, max_batch_size=2)
+
+    # A sequence already past its deadline stops after its first token.
+    request = engine.add(tokenizer.encode("hello"), 50, deadline=time.time())
+    assert len(request.wait()) == 1
+    assert len(engine.submit(tokenizer.encode("hello"), 50)) == 50
+
+
+def test_stream_and_pipeline_paths_measure_the_rate(tiny_model_and_tokenizer):
+    model, tokenizer = tiny_model_and_tokenizer
+    budget = TimeBudget(margin=0.0)
+    list(
+        stream_generate(
+            model, tokenizer, "abc", "cpu", max_new_tokens=8, time_budget=budget
+        )
+    )
+    assert budget.tokens_per_second > 0
+
+    budget = TimeBudget(margin=0.0)
+
+    def pipe(prompt, **kwargs):
+        time.sleep(0.1)
+        return [{"generated_text": "abcd"}]
+
+    assert OutputDecoder(tokenizer).pipeline(pipe, "x", time_budget=budget) == "abcd"
+    assert 0 < budget.tokens_per_second <= 40
+
+
+def test_batched_generations_apply_the_earliest_deadline(tiny_model_and_tokenizer):
+    model, tokenizer = tiny_model_and_tokenizer
+    budget = TimeBudget(margin=0.0)
+    budget.observe(100, 1.0)
+    seen = []
+
+    def batch_fn(prompts):
+        seen.append(budget.current_deadline())
+        return batch_generate(
+            model, tokenizer, prompts, "cpu", max_new_tokens=100, time_budget=budget
+        )
+
+    batcher = RequestBatcher(
+        batch_fn, max_batch_size=2, max_wait=0.5, deadline_context=budget.deadline
+    )
+    deadline = time.time() + 0.1
+    results = [None, None]
+
+    def submit(index, deadline):
+        results[index] = batcher.submit("hello", deadline)
+
+    threads = [
+        threading.Thread(target=submit, args=(0, deadline)),
+        threading.Thread(target=submit, args=(1, time.time() + 60)),
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert seen == [deadline]
+    assert budget.num_capped == 1
+    # The tiny tokenizer decodes tokens separated by spaces.
+    assert all(0 < len(result.split()) <= 10 for result in results)
+    assert batcher.submit("hello") and seen[-1] is None
@@ -0,0 +1,143 @@
+# The MIT License (MIT)
+# Copyright © 2023 Yuma Rao
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+# documentation files (the “Software”), to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+# and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+# the Software.
+
+# THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+# THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+from tokenizers import Tokenizer, decoders, models, pre_tokenizers, trainers
+from transformers import PreTrainedTokenizerFast
+
+from openminers.base.generate import batch_generate
+from openminers.base.truncation import HistoryTruncator
+from openminers.base.chat_template import ChatTemplate
+
+
+TEMPLATE = ChatTemplate(
+    {
+        "system": ("system: ", " "),
+        "user": ("user: ", " "),
+        "assistant": ("assistant: ", " "),
+    },
+    generation_prompt="assistant:",
+)
+
+
+def history(num_turns):
+    messages = [{"role": "system", "content": "be nice"}]
+    for turn in range(num_turns):
+        messages.append({"role": "user", "content": "question " + "abcdefgh"[turn]})
+        messages.append({"role": "assistant", "content": "answer " + "abcdefgh"[turn]})
+    return messages
+
+
+def test_short_history_is_encoded_whole(tiny_model_and_tokenizer):
+    _, tokenizer = tiny_model_and_tokenizer
+    truncator = HistoryTruncator(max_sequence_len=1000)
+    messages = history(2)
+
+    ids = truncator.encode(tokenizer, messages, TEMPLATE)
+    assert ids == tokenizer.encode(
+        TEMPLATE.render(messages, add_generation_prompt=True)
+    )
+    assert truncator.stats()["truncation_truncated"] == 0
+
+
+def test_keeps_system_message_and_most_recent_turns(tiny_model_and_tokenizer):
+    _, tokenizer = tiny_model_and_tokenizer
+    truncator = HistoryTruncator(max_sequence_len=100)
+    messages = history(6)
+
+    ids = truncator.encode(tokenizer, messages, TEMPLATE, reserve=20)
+    assert len(ids) <= 80
+
+    # The system message and as many of the latest messages as fit, in order.
+    def encoded(num_recent):
+        kept = [messages[0]] + messages[len(messages) - num_recent :]
+        return tokenizer.encode(TEMPLATE.render(kept, add_generation_prompt=True))
+
+    num_recent = next(n for n in range(len(messages)) if ids == encoded(n))
+    assert 0 < num_recent < len(messages) - 1
+    assert len(encoded(num_recent + 1)) > 80
+    assert truncator.stats()["truncation_dropped_messages"] == (
+        len(messages) - 1 - num_recent
+    )
+
+
+def metaspace_tokenizer():
+    tokenizer = Tokenizer(models.BPE(unk_token="<unk>"))
+    tokenizer.pre_tokenizer = pre_tokenizers.Metaspace()
+    tokenizer.decoder = decoders.Metaspace()
+    tokenizer.train_from_iterator(
+        ["USER: hi ASSISTANT: hello there", "USER: how are you ASSISTANT: fine"] * 20,
+        trainers.BpeTrainer(
+            vocab_size=200,
+            special_tokens=["<unk>", "</s>"],
+            initial_alphabet=list(
+                "abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ :"
+            ),
+        ),
+    )
+    return PreTrainedTokenizerFast(
+        tokenizer_object=tokenizer, eos_token="</s>", unk_token="<unk>"
+    )
+
+
+def test_matches_whole_prompt_encoding_of_sentencepiece_tokenizers():
+    tokenizer = metaspace_tokenizer()
+    template = ChatTemplate(
+        {"user": ("USER: ", " "), "assistant": ("ASSISTANT: ", " ")},
+        generation_prompt="ASSISTANT:",
+    )
+    messages = [
+        {"role": "user", "content": "hi"},
+        {"role": "assistant", "content": "hello there"},
+        {"role": "user", "content": "how are you"},
+    ]
+    # Each separately encoded segment would end in a stray "▁" token.
+    prompt = template.render(messages, add_generation_prompt=True)
+    assert "▁" not in tokenizer.convert_ids_to_tokens(tokenizer.encode(prompt))
+
+    ids = HistoryTruncator(max_sequence_len=1000).encode(tokenizer, messages, template)
+    assert ids == tokenizer.encode(prompt)
+
+    truncator = HistoryTruncator(max_sequence_len=len(ids) - 1)
+    ids = truncator.encode(tokenizer, messages, template)
+    assert ids == tokenizer.encode(
+        template.render(messages[-1:], add_generation_prompt=True)
+    )
+    assert truncator.stats()["truncation_dropped_messages"] == 2
+
+
+def test_earlier_turns_come_from_the_cache(tiny_model_and_tokenizer):
+    _, tokenizer = tiny_model_and_tokenizer
+    truncator = HistoryTruncator(max_sequence_len=1000)
+
+    truncator.encode(tokenizer, history(3), TEMPLATE)
+    misses = truncator.num_misses
+    truncator.encode(tokenizer, history(4), TEMPLATE)
+    assert truncator.num_misses - misses == 2
+
+
+def test_generate_helpers_accept_encoded_prompts(tiny_model_and_tokenizer):
+    model, tokenizer = tiny_model_and_tokenizer
+    prompts = ["hello there", "why"]
+
+    from_text = batch_generate(model, tokenizer, prompts, "cpu", max_new_tokens=5)
+    from_ids = batch_generate(
+        model,
+        tokenizer,
+        [tokenizer.encode(prompt) for prompt in prompts],
+        "cpu",
+        max_new_tokens=5,
+    )
+    assert from_ids == from_text
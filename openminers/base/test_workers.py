@@ -0,0 +1,191 @@
+# The MIT License (MIT)
+# Copyright © 2023 Yuma Rao
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+# documentation files (the “Software”), to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+# and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+# the Software.
+
+# THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+# THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+
+import os
+import time
+import threading
+import contextlib
+
+import pytest
+
+from openminers.base.miner import BaseMiner
+from openminers.base.workers import WorkerPool, WorkerPoolMiner, cpu_shares
+
+
+class EchoMiner:
+    """Stands in for a miner in the worker processes, echoing each call's context."""
+
+    def __init__(self, config=None):
+        self.local = threading.local()
+        self.warm = False
+        self.calls = 0
+
+    def warmup(self):
+        self.warm = True
+
+    def max_new_tokens(self):
+        return 16
+
+    def generation_config(self):
+        return {"temperature": 0.0}
+
+    @contextlib.contextmanager
+    def call_context(self, messages, deadline=None, hotkey=None):
+        self.local.call = (deadline, hotkey)
+        yield
+
+    def sync_forward(self, messages):
+        if not self.warm:
+            raise RuntimeError("called before warm-up")
+        self.calls += 1
+        content = messages[-1]["content"]
+        if content == "calls":
+            return str(self.calls)
+        if content == "crash":
+            os._exit(1)
+        if content == "sleep":
+            time.sleep(2)
+        deadline, hotkey = self.local.call
+        return f"{ content } { deadline } { hotkey }"
+
+
+def message(content):
+    return [{"role": "user", "content": content}]
+
+
+@pytest.fixture
+def pool():
+    pool = WorkerPool(EchoMiner, None, 2)
+    pool.wait_ready()
+    yield pool
+    pool.close()
+
+
+def test_dispatches_calls_with_their_context(pool):
+    assert pool.max_new_tokens == 16
+    assert pool.generation_config == {"temperature": 0.0}
+
+    deadline = time.time() + 30
+    results = [None] * 8
+
+    def call(index):
+        results[index] = pool.submit(message(str(index)), deadline, f"hotkey{index}")
+
+    threads = [threading.Thread(target=call, args=(i,)) for i in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert results == [f"{ i } { deadline } hotkey{ i }" for i in range(8)]
+    assert pool.stats()["workers_alive"] == 2
+
+
+def test_worker_death_fails_its_request_while_others_reply(pool):
+    stop = threading.Event()
+
+    def keep_busy():
+        while not stop.is_set():
+            pool.submit(message("hello"))
+
+    busy = threading.Thread(target=keep_busy)
+    busy.start()
+    try:
+        start_time = time.time()
+        with pytest.raises(RuntimeError):
+            pool.submit(message("crash"))
+        assert time.time() - start_time < 2
+    finally:
+        stop.set()
+        busy.join()
+    assert pool.stats()["workers_alive"] == 1
+    assert pool.submit(message("still")) == "still None None"
+
+
+def test_submit_stops_waiting_at_the_deadline(pool):
+    start_time = time.time()
+    with pytest.raises(TimeoutError):
+        pool.submit(message("sleep"), deadline=time.time() + 0.2)
+    assert time.time() - start_time < 1
+    assert not pool.futures
+
+
+def test_workers_skip_requests_which_expired_in_the_queue():
+    pool = WorkerPool(EchoMiner, None, 1)
+    pool.wait_ready()
+    try:
+        busy = threading.Thread(target=pool.submit, args=(message("sleep"),))
+        busy.start()
+        time.sleep(0.2)
+        with pytest.raises(TimeoutError):
+            pool.submit(message("expired"), deadline=time.time() + 0.2)
+        busy.join()
+
+        # Only the sleep and this call reached the miner.
+        assert pool.submit(message("calls")) == "2"
+    finally:
+        pool.close()
+
+
+def test_close_stops_workers_and_fails_pending_calls():
+    pool = WorkerPool(EchoMiner, None, 1)
+    pool.wait_ready()
+    errors = []
+
+    def call():
+        try:
+            pool.submit(message("sleep"))
+            pool.submit(message("queued"))
+        except RuntimeError as e:
+            errors.append(e)
+
+    thread = threading.Thread(target=call)
+    thread.start()
+    time.sleep(0.5)
+    pool.close()
+    thread.join(5)
+    assert not thread.is_alive() and errors
+    assert all(process.exitcode is not None for process in pool.processes)
+
+
+def test_cpu_shares_are_contiguous_and_disjoint():
+    assert cpu_shares(list(range(8)), 3) == [[0, 1, 2], [3, 4, 5], [6, 7]]
+    assert cpu_shares([0, 1], 3) == [[0], [1], [0]]
+    assert cpu_shares([], 2) == [[], []]
+
+
+def test_config_selects_worker_pool_by_keyword_or_position(monkeypatch):
+    monkeypatch.setattr(
+        WorkerPoolMiner,
+        "wrap",
+        classmethod(lambda cls, miner_cls: lambda *args, **kwargs: "pool"),
+    )
+
+    class Miner(BaseMiner):
+        def __init__(self, *args, **kwargs):
+            pass
+
+        @classmethod
+        def add_args(cls, parser):
+            pass
+
+        def forward(self, messages):
+            return ""
+
+    config = {"miner": {"workers": 2}}
+    assert Miner(config=config) == "pool"
+    assert Miner(config) == "pool"
+    assert isinstance(Miner({"miner": {"workers": 2, "is_worker": True}}), Miner)
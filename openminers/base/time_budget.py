@@ -0,0 +1,116 @@
+# The MIT License (MIT)
+# Copyright © 2023 Yuma Rao
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+# documentation files (the “Software”), to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+# and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+# the Software.
+
+# THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+# THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+import time
+import torch
+import threading
+import contextlib
+import contextvars
+from typing import Dict, Iterator, Optional
+from transformers import StoppingCriteria, StoppingCriteriaList
+
+
+class WallClockStop(StoppingCriteria):
+    """Stops generate at a wall-clock deadline, keeping the tokens generated so far."""
+
+    def __init__(self, deadline: float, budget: "TimeBudget" = None):
+        self.deadline = deadline
+        self.budget = budget
+        self.stopped = False
+
+    def __call__(
+        self, input_ids: torch.LongTensor, scores: torch.FloatTensor, **kwargs
+    ) -> bool:
+        if not self.stopped and time.time() >= self.deadline:
+            self.stopped = True
+            if self.budget is not None:
+                self.budget.num_stopped += 1
+        return self.stopped
+
+
+class TimeBudget:
+    """Turns the time left on a forward call into a generation length.
+
+    forward marks the caller's deadline on the thread, or the task on an event loop, running
+    the miner. Generation helpers then cap max_new_tokens by the time remaining, less margin, at the measured
+    decoding rate, and stop at the deadline in case the rate was optimistic.
+    """
+
+    def __init__(self, margin: float = 0.5, decay: float = 0.9, min_tokens: int = 1):
+        self.margin = margin
+        self.decay = decay
+        self.min_tokens = min_tokens
+        self.local = contextvars.ContextVar(f"deadline_{ id(self) }", default=None)
+        self.lock = threading.Lock()
+        self.tokens_per_second: Optional[float] = None
+        self.num_capped: int = 0
+        self.num_stopped: int = 0
+
+    @contextlib.contextmanager
+    def deadline(self, deadline: float) -> Iterator[None]:
+        """Marks the generations run on this thread or task as due by deadline."""
+        token = self.local.set(deadline - self.margin)
+        try:
+            yield
+        finally:
+            self.local.reset(token)
+
+    def current_deadline(self) -> Optional[float]:
+        deadline = self.local.get()
+        return deadline if deadline is not None and deadline != float("inf") else None
+
+    def remaining(self) -> Optional[float]:
+        """Seconds left before the current deadline, or None if there is none."""
+        deadline = self.current_deadline()
+        return None if deadline is None else max(0.0, deadline - time.time())
+
+    def max_new_tokens(self, max_new_tokens: int) -> int:
+        """Caps max_new_tokens to what the measured rate can generate in the time left."""
+        remaining = self.remaining()
+        if remaining is None or self.tokens_per_second is None:
+            return max_new_tokens
+        budget = max(self.min_tokens, int(remaining * self.tokens_per_second))
+        if max_new_tokens > 0 and budget >= max_new_tokens:
+            return max_new_tokens
+        self.num_capped += 1
+        return budget
+
+    def stopping_criteria(self) -> StoppingCriteriaList:
+        """A wall-clock stop at the current deadline, or an empty list if there is none."""
+        deadline = self.current_deadline()
+        if deadline is None:
+            return StoppingCriteriaList()
+        return StoppingCriteriaList([WallClockStop(deadline, self)])
+
+    def observe(self, num_tokens: int, elapsed: float):
+        """Updates the decoding rate with a finished generation."""
+        if num_tokens <= 0 or elapsed <= 0:
+            return
+        rate = num_tokens / elapsed
+        with self.lock:
+            if self.tokens_per_second is None:
+                self.tokens_per_second = rate
+            else:
+                self.tokens_per_second = (
+                    self.decay * self.tokens_per_second + (1 - self.decay) * rate
+                )
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            "time_budget_tokens_per_second": self.tokens_per_second or 0.0,
+            "time_budget_capped": self.num_capped,
+            "time_budget_stopped": self.num_stopped,
+        }
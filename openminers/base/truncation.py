@@ -0,0 +1,121 @@
+# The MIT License (MIT)
+# Copyright © 2023 Yuma Rao
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+# documentation files (the “Software”), to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+# and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+# the Software.
+
+# THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+# THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Tuple
+
+from .chat_template import ChatTemplate
+
+
+class HistoryTruncator:
+    """Encodes prompts within max_sequence_len tokens, dropping the oldest turns first.
+
+    The prompt's per-message segments come from the miner's ChatTemplate and their
+    token counts are cached, so choosing which turns fit does not re-tokenize a
+    conversation's earlier turns on every new turn. The preamble, a leading system
+    message and the generation prompt are always kept, and the most recent messages
+    fill the rest of the budget. The kept text is then encoded in one piece, because
+    SentencePiece style tokenizers encode concatenated segments differently from
+    their separately encoded ids, so untruncated prompts match tokenizer.encode exactly.
+    """
+
+    def __init__(self, max_sequence_len: int, max_entries: int = 8192):
+        self.max_sequence_len = max_sequence_len
+        self.max_entries = max_entries
+        self.entries: "OrderedDict[str, Tuple[int, ...]]" = OrderedDict()
+        self.lock = threading.Lock()
+        self.num_hits: int = 0
+        self.num_misses: int = 0
+        self.num_truncated: int = 0
+        self.num_dropped_messages: int = 0
+
+    def tokenize(
+        self, tokenizer: "transformers.PreTrainedTokenizer", text: str
+    ) -> Tuple[int, ...]:
+        """The ids of text without special tokens, from the cache when seen before."""
+        with self.lock:
+            ids = self.entries.get(text)
+            if ids is not None:
+                self.entries.move_to_end(text)
+                self.num_hits += 1
+                return ids
+            self.num_misses += 1
+        ids = tuple(tokenizer.encode(text, add_special_tokens=False))
+        with self.lock:
+            self.entries[text] = ids
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+        return ids
+
+    def encode(
+        self,
+        tokenizer: "transformers.PreTrainedTokenizer",
+        messages: List[Dict[str, str]],
+        template: ChatTemplate,
+        add_generation_prompt: bool = True,
+        reserve: int = 0,
+    ) -> List[int]:
+        """Encodes the template's prompt for messages in at most max_sequence_len - reserve tokens.
+
+        Reserve room for the generated tokens so the whole sequence fits.
+        """
+        budget = max(
+            1,
+            self.max_sequence_len
+            - max(reserve, 0)
+            - tokenizer.num_special_tokens_to_add(),
+        )
+        texts = template.segments(messages)
+        suffix_text = template.generation_prompt if add_generation_prompt else ""
+        preamble = self.tokenize(tokenizer, template.preamble)
+        segments = [self.tokenize(tokenizer, text) for text in texts]
+        suffix = self.tokenize(tokenizer, suffix_text)
+        num_pinned = 1 if messages and messages[0]["role"] == "system" else 0
+
+        # Keep the most recent messages which fit next to the pinned segments.
+        remaining = budget - len(preamble) - len(suffix)
+        remaining -= sum(len(segment) for segment in segments[:num_pinned])
+        start = len(segments)
+        while start > num_pinned and len(segments[start - 1]) <= remaining:
+            remaining -= len(segments[start - 1])
+            start -= 1
+
+        def encode_kept(start: int) -> List[int]:
+            text = "".join(
+                [template.preamble, *texts[:num_pinned], *texts[start:], suffix_text]
+            )
+            return tokenizer.encode(text, add_special_tokens=False)
+
+        # The cached counts only estimate the encoding of the joined text, so drop more
+        # turns if it came out longer than the budget.
+        ids = encode_kept(start)
+        while len(ids) > budget and start < len(segments):
+            start += 1
+            ids = encode_kept(start)
+        num_dropped = start - num_pinned
+        if num_dropped > 0:
+            self.num_truncated += 1
+            self.num_dropped_messages += num_dropped
+        return tokenizer.build_inputs_with_special_tokens(ids[-budget:])
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            "truncation_truncated": self.num_truncated,
+            "truncation_dropped_messages": self.num_dropped_messages,
+            "truncation_cache_hit_rate": self.num_hits
+            / max(self.num_hits + self.num_misses, 1),
+        }
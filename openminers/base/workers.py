@@ -0,0 +1,333 @@
+# The MIT License (MIT)
+# Copyright © 2023 Yuma Rao
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+# documentation files (the “Software”), to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+# and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+# the Software.
+
+# THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+# THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+
+import copy
+import time
+import torch
+import itertools
+import threading
+import multiprocessing
+import multiprocessing.connection
+import bittensor as bt
+from concurrent.futures import Future, TimeoutError
+from typing import Any, Dict, List, Optional
+
+from .miner import BaseMiner, pin_to_cpus
+from .prompting_miner import BasePromptingMiner
+
+
+def _worker_main(
+    miner_cls: type,
+    config: "bt.Config",
+    miner_kwargs: Dict[str, Any],
+    index: int,
+    requests: "multiprocessing.Queue",
+    responses: "multiprocessing.connection.Connection",
+    cpus: List[int] = None,
+):
+    if cpus:
+        pin_to_cpus(cpus)
+        # One intra-op thread per pinned CPU, so workers don't oversubscribe them.
+        torch.set_num_threads(len(cpus))
+    miner = miner_cls(config=config, **miner_kwargs)
+    miner.warmup()
+    responses.send(
+        ("ready", index, (miner.max_new_tokens(), dict(miner.generation_config())))
+    )
+    while True:
+        item = requests.get()
+        if item is None:
+            break
+        request_id, messages, deadline, hotkey = item
+        # The caller stopped waiting at its deadline, don't generate for nobody.
+        if deadline is not None and time.time() >= deadline:
+            responses.send(
+                ("error", request_id, "TimeoutError: deadline passed in queue")
+            )
+            continue
+        responses.send(("started", index, request_id))
+        try:
+            # Re-enter the parent's call context, which is thread-local and not sent along.
+            with miner.call_context(messages, deadline, hotkey):
+                response = miner.sync_forward(messages)
+            responses.send(("result", request_id, response))
+        except Exception as e:
+            responses.send(("error", request_id, f"{ type(e).__name__ }: { e }"))
+
+
+def cpu_shares(cpus: List[int], num_workers: int) -> List[List[int]]:
+    """Splits cpus into contiguous, disjoint and near equal shares, one per worker.
+
+    With fewer cpus than workers, the workers take turns on them instead.
+    """
+    if not cpus:
+        return [[] for _ in range(num_workers)]
+    if len(cpus) < num_workers:
+        return [[cpus[index % len(cpus)]] for index in range(num_workers)]
+    size, extra = divmod(len(cpus), num_workers)
+    shares, start = [], 0
+    for index in range(num_workers):
+        end = start + size + (index < extra)
+        shares.append(list(cpus[start:end]))
+        start = end
+    return shares
+
+
+class WorkerPool:
+    """Worker processes which each load a miner and take forward calls from a shared queue.
+
+    Idle workers pull the next request themselves, so load spreads across processes
+    without any routing state in the parent. Each worker answers on its own pipe, which
+    reaches end of file once the worker has exited and everything it sent has been
+    read, so a worker which dies fails the request it was running. Callers also stop
+    waiting at their deadline, and workers skip calls whose deadline passed in the queue.
+    """
+
+    def __init__(
+        self,
+        miner_cls: type,
+        config: "bt.Config",
+        num_workers: int,
+        miner_kwargs: Dict[str, Any] = None,
+        cpus: List[int] = None,
+    ):
+        context = multiprocessing.get_context("spawn")
+        shares = cpu_shares(cpus or [], num_workers)
+        self.requests = context.Queue()
+        self.processes = []
+        self.connections = []
+        for index in range(num_workers):
+            reader, writer = context.Pipe(duplex=False)
+            process = context.Process(
+                target=_worker_main,
+                args=(
+                    miner_cls,
+                    config,
+                    miner_kwargs or {},
+                    index,
+                    self.requests,
+                    writer,
+                    shares[index],
+                ),
+                daemon=True,
+            )
+            process.start()
+            # Only the worker may hold the write end, or its pipe never reaches end of file.
+            writer.close()
+            self.processes.append(process)
+            self.connections.append(reader)
+
+        self.futures: Dict[int, Future] = {}
+        self.assigned: Dict[int, Optional[int]] = {}
+        self.ids = itertools.count()
+        self.lock = threading.Lock()
+        self.ready = threading.Event()
+        self.num_ready: int = 0
+        self.max_new_tokens: int = -1
+        self.generation_config: Dict[str, Any] = {}
+        self.dead = set()
+        self.closed = False
+        self.thread = threading.Thread(target=self._dispatch, daemon=True)
+        self.thread.start()
+
+    def wait_ready(self):
+        """Blocks until every worker has loaded its model."""
+        self.ready.wait()
+        if self.num_ready < len(self.processes):
+            raise RuntimeError("a miner worker process exited before it was ready")
+
+    def submit(
+        self,
+        messages: List[Dict[str, str]],
+        deadline: Optional[float] = None,
+        hotkey: Optional[str] = None,
+    ) -> str:
+        """Runs forward on the next idle worker and blocks until it returns.
+
+        The worker generates under deadline and hotkey's conversation as the parent
+        would, and a TimeoutError is raised if it has not answered by the deadline.
+        """
+        if len(self.dead) == len(self.processes):
+            raise RuntimeError("no miner workers are alive")
+        future = Future()
+        with self.lock:
+            request_id = next(self.ids)
+            self.futures[request_id] = future
+        self.requests.put((request_id, messages, deadline, hotkey))
+        timeout = None
+        if deadline is not None and deadline != float("inf"):
+            timeout = max(0.0, deadline - time.time())
+        try:
+            return future.result(timeout)
+        except TimeoutError:
+            with self.lock:
+                self.futures.pop(request_id, None)
+            raise TimeoutError(f"miner workers did not answer within { timeout:.1f}s")
+
+    def _fail(self, request_id: Optional[int], error: Exception):
+        with self.lock:
+            future = self.futures.pop(request_id, None)
+        if future is not None:
+            future.set_exception(error)
+
+    def _worker_exited(self, index: int):
+        process = self.processes[index]
+        process.join(1)
+        self.dead.add(index)
+        if self.closed:
+            return
+        bt.logging.error(
+            f"Miner worker { index } exited with code { process.exitcode }"
+        )
+        self._fail(
+            self.assigned.pop(index, None),
+            RuntimeError(f"miner worker { index } exited"),
+        )
+        if not self.ready.is_set() or len(self.dead) == len(self.processes):
+            self.ready.set()
+            with self.lock:
+                futures, self.futures = self.futures, {}
+            for future in futures.values():
+                future.set_exception(RuntimeError("no miner workers are alive"))
+
+    def _handle(self, kind: str, key: int, value: Any):
+        if kind == "ready":
+            self.max_new_tokens, self.generation_config = value
+            self.num_ready += 1
+            if self.num_ready == len(self.processes):
+                bt.logging.info(f"{ self.num_ready } miner workers ready")
+                self.ready.set()
+        elif kind == "started":
+            self.assigned[key] = value
+        else:
+            with self.lock:
+                future = self.futures.pop(key, None)
+            for index, request_id in list(self.assigned.items()):
+                if request_id == key:
+                    del self.assigned[index]
+            if future is None:
+                return
+            if kind == "result":
+                future.set_result(value)
+            else:
+                future.set_exception(RuntimeError(value))
+
+    def _dispatch(self):
+        connections = {
+            connection: index for index, connection in enumerate(self.connections)
+        }
+        while connections:
+            for connection in multiprocessing.connection.wait(list(connections), 0.1):
+                try:
+                    self._handle(*connection.recv())
+                except (EOFError, OSError):
+                    self._worker_exited(connections.pop(connection))
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            "workers_alive": sum(p.exitcode is None for p in self.processes),
+            "workers_busy": len(self.assigned),
+            "workers_queued": len(self.futures) - len(self.assigned),
+        }
+
+    def close(self):
+        self.closed = True
+        for _ in self.processes:
+            self.requests.put(None)
+        for process in self.processes:
+            process.join(5)
+            if process.exitcode is None:
+                process.terminate()
+        self.thread.join()
+        with self.lock:
+            futures, self.futures = self.futures, {}
+        for future in futures.values():
+            future.set_exception(RuntimeError("the miner worker pool was closed"))
+
+
+class WorkerPoolMiner(BasePromptingMiner):
+    """Serves miner_cls from --miner.workers processes behind this process's axon.
+
+    The axon process keeps admission (blacklist, priority, scheduling, shedding, caching)
+    and hands forward calls to the workers, which each load their own copy of the model.
+    Each call's deadline and caller go with it, so the workers' time budget and
+    conversation cache apply as they would in-process. Responses come back whole, so
+    --neuron.streaming.on has no effect here. Built by BaseMiner when --miner.workers
+    is set; use wrap() to build it directly.
+    """
+
+    miner_cls: type = None
+
+    def __new__(cls, *args, **kwargs):
+        return object.__new__(cls)
+
+    @classmethod
+    def wrap(cls, miner_cls: type) -> type:
+        return type(
+            f"{ miner_cls.__name__ }WorkerPool", (cls,), {"miner_cls": miner_cls}
+        )
+
+    @classmethod
+    def config(cls) -> "bt.Config":
+        return cls.miner_cls.config()
+
+    @classmethod
+    def add_args(cls, parser):
+        cls.miner_cls.add_args(parser)
+
+    def __init__(
+        self,
+        config: "bt.Config" = None,
+        axon: "bt.axon" = None,
+        wallet: "bt.Wallet" = None,
+        subtensor: "bt.Subtensor" = None,
+        **miner_kwargs,
+    ):
+        # Start loading the workers' models while the axon process sets itself up.
+        worker_config = self.config()
+        worker_config.merge(copy.deepcopy(config or BaseMiner.config()))
+        worker_config.miner.is_worker = True
+        self.pool = WorkerPool(
+            self.miner_cls,
+            worker_config,
+            worker_config.miner.workers,
+            miner_kwargs,
+            cpus=worker_config.miner.get("cpus"),
+        )
+        super(WorkerPoolMiner, self).__init__(
+            config=config, axon=axon, wallet=wallet, subtensor=subtensor
+        )
+        self.pool.wait_ready()
+
+    def max_new_tokens(self) -> int:
+        self.pool.wait_ready()
+        return self.pool.max_new_tokens
+
+    def generation_config(self) -> Dict[str, Any]:
+        self.pool.wait_ready()
+        return self.pool.generation_config
+
+    def warmup(self):
+        # Each worker warms itself up before it reports ready.
+        self.pool.wait_ready()
+
+    def forward(self, messages: List[Dict[str, str]]) -> str:
+        return self.pool.submit(messages, *self.current_call())
+
+    def stop_run_thread(self):
+        super(WorkerPoolMiner, self).stop_run_thread()
+        self.pool.close()
@@ -0,0 +1,177 @@
+# The MIT License (MIT)
+# Copyright © 2023 Yuma Rao
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+# documentation files (the “Software”), to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+# and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+# the Software.
+
+# THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+# THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+
+import sys
+import json
+import time
+import argparse
+from typing import Dict, List
+
+from .base.registry import get_miner, miner_names
+
+# CLI options which every command takes, and the miner flags they stand for.
+MINER_OPTIONS = {
+    "workers": "--miner.workers",
+    "cpus": "--miner.cpus",
+    "warmup_steps": "--miner.warmup.steps",
+    "drain_timeout": "--miner.drain_timeout",
+}
+
+
+def add_miner_options(parser: argparse.ArgumentParser):
+    parser.add_argument("name", help="The miner to load, see `openminers list`.")
+    parser.add_argument(
+        "--workers",
+        type=int,
+        help="Load the model in this many worker processes.",
+    )
+    parser.add_argument(
+        "--cpus",
+        type=int,
+        nargs="+",
+        help="Pin the miner to these CPUs, split between the workers if any.",
+    )
+    parser.add_argument(
+        "--warmup_steps",
+        type=int,
+        help="The number of warm-up generations before requests are admitted.",
+    )
+    parser.add_argument(
+        "--drain_timeout",
+        type=float,
+        help="How long to wait for requests in flight when stopping (in seconds).",
+    )
+
+
+def miner_argv(args: argparse.Namespace, rest: List[str]) -> List[str]:
+    """The miner's own flags followed by the ones the CLI options stand for."""
+    argv = list(rest)
+    for option, flag in MINER_OPTIONS.items():
+        value = getattr(args, option, None)
+        if value is None:
+            continue
+        values = value if isinstance(value, list) else [value]
+        argv += [flag, *(str(value) for value in values)]
+    return argv
+
+
+def run_miner(miner_class: type):
+    """Serves miner_class until interrupted, then drains the requests in flight."""
+    with miner_class():
+        try:
+            while True:
+                time.sleep(1)
+        except KeyboardInterrupt:
+            pass
+
+
+def get_mock_query() -> List[Dict[str, str]]:
+    prompt = """you are a chatbot that can come up with unique questions about many things."""
+    message = "ask me a random question about anything"
+    roles = ["system", "user"]
+    messages = [prompt, message]
+    packed_messages = [
+        json.dumps({"role": role, "content": message})
+        for role, message in zip(roles, messages)
+    ]
+    return packed_messages, roles, messages
+
+
+def bench_config(miner_class: type) -> "bt.Config":
+    """miner_class's config for a local benchmark, which never touches the network."""
+    config = miner_class.config()
+    config.miner.blacklist.allow_non_registered = True
+    config.miner.no_serve = True
+    config.miner.no_register = True
+    config.miner.no_set_weights = True
+    config.miner.mock_subtensor = True
+    config.wallet._mock = True
+    config.axon.external_ip = "127.0.0.1"
+    config.axon.port = 9090
+    return config
+
+
+def bench_miner(miner_class: type, n_steps: int, ready_timeout: float = 600.0):
+    """Sends n_steps mock queries to miner_class through a local axon."""
+    import bittensor as bt
+    from .base.readiness import Readiness
+
+    config = bench_config(miner_class)
+    bt.logging.success(f"Running benchmarks for miner: { miner_class.__name__ }")
+
+    # Instantiate the miner axon
+    wallet = bt.wallet.mock()
+    axon = bt.axon(wallet=wallet, config=config, metagraph=None)
+    dendrite = bt.text_prompting(axon=axon.info(), keypair=wallet.hotkey)
+    bt.logging.success(f"dendrite: { dendrite }")
+
+    # Instantiate miner, and wait for it to warm up before sending queries.
+    miner = miner_class(config=config, axon=axon, wallet=wallet)
+    with miner:
+        if not miner.readiness.wait(Readiness.READY, ready_timeout):
+            raise RuntimeError(
+                f"{ miner_class.__name__ } was not ready after { ready_timeout:.0f}s"
+            )
+        start_time = time.time()
+        for step in range(n_steps):
+            _, roles, messages = get_mock_query()
+            dendrite.forward(roles=roles, messages=messages, timeout=1e6)
+        elapsed = time.time() - start_time
+        bt.logging.success(
+            f"{ n_steps } queries in { elapsed:.1f}s, time to ready { miner.startup.time_to_ready:.1f}s"
+        )
+
+
+def main(argv: List[str] = None):
+    parser = argparse.ArgumentParser(
+        prog="openminers",
+        description="Run and benchmark openminers. Flags not listed here go to the miner, e.g. --wallet.name.",
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+    add_miner_options(commands.add_parser("run", help="Serve a miner."))
+    bench = commands.add_parser("bench", help="Send mock queries to a local miner.")
+    add_miner_options(bench)
+    bench.add_argument("--steps", type=int, default=10, help="Queries to send.")
+    bench.add_argument(
+        "--ready_timeout",
+        type=float,
+        default=600.0,
+        help="Seconds to wait for the miner to load and warm up.",
+    )
+    commands.add_parser("list", help="List the available miners.")
+    args, rest = parser.parse_known_args(argv)
+
+    if args.command == "list":
+        for name in miner_names():
+            print(name)
+        return
+
+    try:
+        miner_class = get_miner(args.name)
+    except KeyError as e:
+        parser.error(e.args[0])
+
+    # Miners parse their config from sys.argv.
+    sys.argv = [f"openminers {args.command} {args.name}", *miner_argv(args, rest)]
+    if args.command == "run":
+        run_miner(miner_class)
+    else:
+        bench_miner(miner_class, args.steps, args.ready_timeout)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+# The MIT License (MIT)
+# Copyright © 2023 Yuma Rao
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+# documentation files (the “Software”), to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+# and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+# the Software.
+
+# THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+# THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+
+import argparse
+import importlib.metadata
+from types import SimpleNamespace
+
+import pytest
+
+from openminers import cli
+from openminers.base import registry
+
+
+def parse(argv):
+    parser = argparse.ArgumentParser()
+    cli.add_miner_options(parser)
+    return parser.parse_known_args(argv)
+
+
+def test_cli_options_become_miner_flags():
+    args, rest = parse(
+        ["falcon", "--falcon.max_length", "64", "--workers", "2", "--cpus", "0", "1"]
+    )
+    assert args.name == "falcon"
+    assert cli.miner_argv(args, rest) == [
+        "--falcon.max_length",
+        "64",
+        "--miner.workers",
+        "2",
+        "--miner.cpus",
+        "0",
+        "1",
+    ]
+
+
+def test_bench_stays_off_the_network():
+    class Miner:
+        @classmethod
+        def config(cls):
+            return SimpleNamespace(
+                miner=SimpleNamespace(blacklist=SimpleNamespace()),
+                wallet=SimpleNamespace(),
+                axon=SimpleNamespace(),
+            )
+
+    config = cli.bench_config(Miner)
+    # The keys run() reads before registering, serving and setting weights.
+    assert config.miner.no_register and config.miner.no_serve
+    assert config.miner.no_set_weights and config.miner.mock_subtensor
+
+
+def test_plugins_are_discovered_from_entry_points(monkeypatch):
+    entry_point = importlib.metadata.EntryPoint(
+        name="plugin",
+        value="openminers.base.readiness:Readiness",
+        group=registry.ENTRY_POINT_GROUP,
+    )
+    monkeypatch.setattr(registry, "plugins", lambda: {"plugin": entry_point})
+    assert "plugin" in registry.miner_names()
+    assert registry.get_miner("plugin").__name__ == "Readiness"
+
+
+def test_unknown_miner_exits_with_usage(capsys):
+    with pytest.raises(SystemExit):
+        cli.main(["run", "not_a_miner"])
+    assert "Unknown miner: not_a_miner" in capsys.readouterr().err
+
+
+def test_list_prints_miners(capsys):
+    cli.main(["list"])
+    assert "falcon" in capsys.readouterr().out.split()
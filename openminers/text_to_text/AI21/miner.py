@@ -15,15 +15,16 @@
 # OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
 # DEALINGS IN THE SOFTWARE.
 
-import time
 import argparse
 import openminers
 import bittensor
-from typing import List, Dict, Optional
-from langchain.llms import AI21
+from typing import List, Dict, Optional, Any
+from openminers.base.chat_template import PLAIN_TEMPLATE
 
 
-class AI21Miner(openminers.BasePromptingMiner):
+class AI21Miner(openminers.AsyncBasePromptingMiner):
+    template = PLAIN_TEMPLATE
+
     @classmethod
     def check_config(cls, config: "bittensor.Config"):
         assert (
@@ -42,6 +43,24 @@ class AI21Miner(openminers.BasePromptingMiner):
         parser.add_argument(
             "--ai21.stop", help="Stop tokens.", default=["user: ", "bot: ", "system: "]
         )
+        parser.add_argument(
+            "--ai21.max_tokens",
+            type=int,
+            help="The maximum number of tokens to generate.",
+            default=256,
+        )
+        parser.add_argument(
+            "--ai21.temperature",
+            type=float,
+            help="Sampling temperature of the model.",
+            default=0.7,
+        )
+        parser.add_argument(
+            "--ai21.api_base",
+            type=str,
+            help="Base URL of the AI21 API.",
+            default="https://api.ai21.com/studio/v1",
+        )
 
     def __init__(self, api_key: Optional[str] = None, *args, **kwargs):
         super(AI21Miner, self).__init__(*args, **kwargs)
@@ -50,34 +69,32 @@ class AI21Miner(openminers.BasePromptingMiner):
             raise ValueError(
                 "the miner requires passing --ai21.api_key as an argument of the config or to the constructor."
             )
-        self.model = AI21(
-            model=self.config.ai21.model_name,
-            ai21_api_key=api_key or self.config.ai21.api_key,
-            stop=self.config.ai21.stop,
-        )
+        self.api_key = api_key or self.config.ai21.api_key
         bittensor.logging.info("Model loaded!")
 
-    @staticmethod
-    def _process_history(history: List[Dict[str, str]]) -> str:
-        processed_history = ""
-        for message in history:
-            if message["role"] == "system":
-                processed_history += "system: " + message["content"] + "\n"
-            if message["role"] == "assistant":
-                processed_history += "assistant: " + message["content"] + "\n"
-            if message["role"] == "user":
-                processed_history += "user: " + message["content"] + "\n"
-        return processed_history
+    def generation_config(self) -> Dict[str, Any]:
+        return {
+            "max_tokens": self.config.ai21.max_tokens,
+            "temperature": self.config.ai21.temperature,
+            "stop": self.config.ai21.stop,
+        }
 
-    def forward(self, messages: List[Dict[str, str]]) -> str:
-        history = self._process_history(messages)
-        resp = self.model(history)
-        return resp
+    async def forward(self, messages: List[Dict[str, str]]) -> str:
+        history = self.template.render(messages)
+        resp = await self.http_client.post_json(
+            f"{ self.config.ai21.api_base }/{ self.config.ai21.model_name }/complete",
+            {
+                "prompt": history,
+                "maxTokens": self.config.ai21.max_tokens,
+                "temperature": self.config.ai21.temperature,
+                "stopSequences": self.config.ai21.stop,
+            },
+            headers={"Authorization": f"Bearer { self.api_key }"},
+        )
+        return resp["completions"][0]["data"]["text"]
 
 
 if __name__ == "__main__":
-    miner = AI21Miner()
-    with miner:
-        while True:
-            print("running...", time.time())
-            time.sleep(1)
+    from openminers.cli import run_miner
+
+    run_miner(AI21Miner)
@@ -15,16 +15,17 @@
 # OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
 # DEALINGS IN THE SOFTWARE.
 
-import time
 import argparse
 import openminers
 import bittensor
 from rich import print
-from typing import List, Dict, Optional
-from langchain.llms import AlephAlpha
+from typing import List, Dict, Optional, Any
+from openminers.base.chat_template import PLAIN_TEMPLATE
 
 
-class AlephAlphaMiner(openminers.BasePromptingMiner):
+class AlephAlphaMiner(openminers.AsyncBasePromptingMiner):
+    template = PLAIN_TEMPLATE
+
     @classmethod
     def add_args(cls, parser: argparse.ArgumentParser):
         parser.add_argument("--aleph.api_key", type=str, help="AlephAlpha API key.")
@@ -64,6 +65,12 @@ class AlephAlphaMiner(openminers.BasePromptingMiner):
             help="Total probability mass of tokens to consider at each step.",
             default=0.0,
         )
+        parser.add_argument(
+            "--aleph.api_base",
+            type=str,
+            help="Base URL of the AlephAlpha API.",
+            default="https://api.aleph-alpha.com",
+        )
 
     def __init__(self, api_key: Optional[str] = None, *args, **kwargs):
         super(AlephAlphaMiner, self).__init__(*args, **kwargs)
@@ -71,40 +78,42 @@ class AlephAlphaMiner(openminers.BasePromptingMiner):
             raise ValueError(
                 "the miner requires passing --aleph.api_key as an argument of the config or to the constructor."
             )
-        self.model = AlephAlpha(
-            aleph_alpha_api_key=api_key or self.config.aleph.api_key,
-            model=self.config.aleph.model,
-            maximum_tokens=self.config.aleph.maximum_tokens,
-            temperature=self.config.aleph.temperature,
-            top_k=self.config.aleph.top_k,
-            top_p=self.config.aleph.top_p,
-            stop_sequences=self.config.aleph.stop_sequences,
-        )
+        self.api_key = api_key or self.config.aleph.api_key
 
-    @staticmethod
-    def _process_history(history: List[Dict[str, str]]) -> str:
-        processed_history = ""
-        for message in history:
-            if message["role"] == "system":
-                processed_history += "system: " + message["content"] + "\n"
-            if message["role"] == "assistant":
-                processed_history += "assistant: " + message["content"] + "\n"
-            if message["role"] == "user":
-                processed_history += "user: " + message["content"] + "\n"
-        return processed_history
+    def generation_config(self) -> Dict[str, Any]:
+        return {
+            "maximum_tokens": self.config.aleph.maximum_tokens,
+            "temperature": self.config.aleph.temperature,
+            "top_k": self.config.aleph.top_k,
+            "top_p": self.config.aleph.top_p,
+            "stop_sequences": self.config.aleph.stop_sequences,
+        }
 
-    def forward(self, messages: List[Dict[str, str]]) -> str:
+    async def forward(self, messages: List[Dict[str, str]]) -> str:
         bittensor.logging.info("messages", str(messages))
-        history = self._process_history(messages)
+        history = self.template.render(messages)
         bittensor.logging.info("history", str(history))
-        resp = self.model(history)
+        resp = await self.http_client.post_json(
+            self.config.aleph.api_base + "/complete",
+            {
+                "model": self.config.aleph.model,
+                "prompt": history,
+                "maximum_tokens": self.config.aleph.maximum_tokens,
+                "temperature": self.config.aleph.temperature,
+                "top_k": self.config.aleph.top_k,
+                "top_p": self.config.aleph.top_p,
+                "stop_sequences": self.config.aleph.stop_sequences,
+            },
+            headers={"Authorization": f"Bearer { self.api_key }"},
+        )
+        resp = resp["completions"][0]["completion"]
+        for stop in self.config.aleph.stop_sequences:
+            resp = resp.split(stop)[0]
         bittensor.logging.info("response", str(resp))
         return resp
 
 
 if __name__ == "__main__":
-    miner = AlephAlphaMiner()
-    with miner:
-        while True:
-            print("running...", time.time())
-            time.sleep(1)
+    from openminers.cli import run_miner
+
+    run_miner(AlephAlphaMiner)
@@ -22,15 +22,27 @@ import openminers
 from typing import List, Dict
 from transformers import AutoTokenizer, AutoModelForCausalLM, pipeline, AutoConfig
 from transformers.deepspeed import HfDeepSpeedConfig
+from openminers.base.speculative import speculative_generate
 import deepspeed
 import bittensor
 import os
+from openminers.base.chat_template import ChatTemplate
+from openminers.base.output import OutputDecoder
 
 local_rank = int(os.getenv('LOCAL_RANK', '0'))
 world_size = int(os.getenv('WORLD_SIZE', '1'))
 
 class BloomChatMiner( openminers.BasePromptingMiner ):
 
+    template = ChatTemplate(
+        {
+            "system": ("<human>: ", "\n"),
+            "assistant": ("<bot>: ", "\n"),
+            "user": ("<human>: ", "\n"),
+        },
+        generation_prompt="<bot>:",
+    )
+
     @classmethod
     def add_args( cls, parser: argparse.ArgumentParser ):
         parser.add_argument('--deployment_framework',  type=str, choices=['accelerate', 'deepspeed'], default="accelerate", help='Inference framework to use for multi-gpu inference')
@@ -42,12 +54,15 @@ class BloomChatMiner( openminers.BasePromptingMiner ):
     @classmethod
     def config( cls ) -> "bittensor.Config":
         parser = argparse.ArgumentParser( description='Bloom Miner Config' )
-        cls.add_args( parser )
+        cls.add_super_args( parser )
         return bittensor.config( parser )
 
     def __init__( self, *args, **kwargs):
         super( BloomChatMiner, self ).__init__( *args, **kwargs )
+        if self.config.neuron.quantization.on:
+            bittensor.logging.warning( 'BloomChatMiner does not support dynamic quantization, loading the model without it.' )
         bittensor.logging.info( 'Loading ' + str( self.config.bloom.model_name ) )
+        self.speculative = None
         if self.config.deployment_framework == "deepspeed":
 
             # distributed setup
@@ -143,45 +158,54 @@ class BloomChatMiner( openminers.BasePromptingMiner ):
                 device_map="auto",
             )
 
-    @staticmethod
-    def _process_history( history: List[ Dict[str, str] ] ) -> str:
-        processed_history = ''
-        for message in history:
-            if message['role'] == 'system':
-                processed_history += '<human>: ' + message['content'] + '\n'
-            if message['role'] == 'assistant':
-                processed_history += '<bot>: ' + message['content'] + '\n'
-            if message['role'] == 'user':
-                processed_history += '<human>: ' + message['content'] + '\n'
-        return processed_history
+            self.speculative = self.speculative_decoder(
+                self.model,
+                eos_token_id=self.tokenizer.eos_token_id,
+                do_sample=True,
+                top_k=10,
+            )
+
+        self.decoder = OutputDecoder(self.tokenizer, self.template.stop_strings(), strip=True)
 
     def forward( self, messages: List[Dict[str, str]]  ) -> str:
-        history = self._process_history(messages)
+        prompt = self.template.render(messages, add_generation_prompt=True)
 
         if self.config.deployment_framework == "deepspeed":
-            inputs = self.tokenizer.encode(history, return_tensors="pt").to(device=self.local_rank)
+            inputs = self.tokenizer.encode(prompt, return_tensors="pt").to(device=self.local_rank)
+            start_time = time.time()
             with torch.no_grad():
-                outputs = self.ds_engine.module.generate(inputs, max_length= 60)
-            resp = self.tokenizer.decode(outputs[0], skip_special_tokens=True).replace( str( history ), "")
-        
-        else:
-            resp = self.pipe( 
-                history, 
+                outputs = self.ds_engine.module.generate(inputs, **self.time_budget_kwargs(self.config.bloom.max_new_tokens))
+            self.observe_generation(outputs.shape[1] - inputs.shape[1], time.time() - start_time)
+            resp = self.decoder.decode(outputs[0], inputs.shape[1])
+
+        elif self.speculative is not None:
+            resp = speculative_generate(
+                self.speculative,
+                self.tokenizer,
+                self.build_prompt(self.tokenizer, messages, self.template),
                 max_new_tokens=self.config.bloom.max_new_tokens,
+                time_budget=self.time_budget,
+                output_decoder=self.decoder,
+            )
+
+        else:
+            resp = self.decoder.pipeline(
+                self.pipe,
+                prompt,
+                time_budget=self.time_budget,
+                **self.time_budget_kwargs(self.config.bloom.max_new_tokens),
                 do_sample=True,
                 top_k=10,
                 num_return_sequences=1,
                 eos_token_id=self.tokenizer.eos_token_id, 
-            )[0]['generated_text'].split(':')[-1].replace( str( history ), "")
+            )
         
         # Logging input and generation if debugging is active
         bittensor.logging.debug( "Message: " + str( messages ) )
         bittensor.logging.debug( "Generation: " + str( resp ) )
         return resp
 
-if __name__ == "__main__":  
-    miner = BloomChatMiner()
-    with miner:
-        while True:
-            print ('running...', time.time())
-            time.sleep(1)
\ No newline at end of file
+if __name__ == "__main__":
+    from openminers.cli import run_miner
+
+    run_miner(BloomChatMiner)
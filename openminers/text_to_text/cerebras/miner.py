@@ -15,15 +15,18 @@
 # OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
 # DEALINGS IN THE SOFTWARE.
 
-import time
 import argparse
 import openminers
 import bittensor
-from typing import List, Dict
+from typing import List, Dict, Any
 from transformers import AutoTokenizer, AutoModelForCausalLM, pipeline
+from openminers.base.chat_template import PLAIN_TEMPLATE
+from openminers.base.output import OutputDecoder
 
 
 class CerebrasMiner(openminers.BasePromptingMiner):
+    template = PLAIN_TEMPLATE
+
     @classmethod
     def add_args(cls, parser: argparse.ArgumentParser):
         parser.add_argument(
@@ -57,6 +60,10 @@ class CerebrasMiner(openminers.BasePromptingMiner):
 
     def __init__(self, *args, **kwargs):
         super(CerebrasMiner, self).__init__(*args, **kwargs)
+        if self.config.neuron.quantization.on:
+            bittensor.logging.warning(
+                "CerebrasMiner does not support dynamic quantization, loading the model without it."
+            )
         bittensor.logging.info(
             "Loading Cerebras GPT {} model...".format(self.config.cerebras.model_size)
         )
@@ -75,30 +82,23 @@ class CerebrasMiner(openminers.BasePromptingMiner):
             max_new_tokens=self.config.cerebras.max_length,
             no_repeat_ngram_size=self.config.cerebras.no_repeat_ngram_size,
         )
+        self.decoder = OutputDecoder(
+            tokenizer, self.template.stop_strings(), strip=True
+        )
 
-    @staticmethod
-    def _process_history(history: List[Dict[str, str]]) -> str:
-        processed_history = ""
-        for message in history:
-            if message["role"] == "system":
-                processed_history += "system: " + message["content"] + "\n"
-            if message["role"] == "assistant":
-                processed_history += "assistant: " + message["content"] + "\n"
-            if message["role"] == "user":
-                processed_history += "user: " + message["content"] + "\n"
-        return processed_history
+    def generation_config(self) -> Dict[str, Any]:
+        return {
+            "max_length": self.config.cerebras.max_length,
+            "do_sample": self.config.cerebras.do_sample,
+            "no_repeat_ngram_size": self.config.cerebras.no_repeat_ngram_size,
+        }
 
     def forward(self, messages: List[Dict[str, str]]) -> str:
-        history = self._process_history(messages)
-        return (
-            self.pipe(history)[0]["generated_text"]
-            .split(":")[-1]
-            .replace(str(history), "")
-        )
+        prompt = self.template.render(messages, add_generation_prompt=True)
+        return self.decoder.pipeline(self.pipe, prompt)
 
 
 if __name__ == "__main__":
-    with CerebrasMiner():
-        while True:
-            print("running...", time.time())
-            time.sleep(1)
+    from openminers.cli import run_miner
+
+    run_miner(CerebrasMiner)
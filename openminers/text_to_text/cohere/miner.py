@@ -15,15 +15,16 @@
 # OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
 # DEALINGS IN THE SOFTWARE.
 
-import time
 import argparse
 import openminers
 import bittensor
-from typing import List, Dict, Optional
-from langchain.llms import Cohere
+from typing import List, Dict, Optional, AsyncIterator, Any
+from openminers.base.chat_template import PLAIN_TEMPLATE
 
 
-class CohereMiner(openminers.BasePromptingMiner):
+class CohereMiner(openminers.AsyncBasePromptingMiner):
+    template = PLAIN_TEMPLATE
+
     @classmethod
     def add_args(cls, parser: argparse.ArgumentParser):
         parser.add_argument(
@@ -81,6 +82,12 @@ class CohereMiner(openminers.BasePromptingMiner):
             default=None,
         )
         parser.add_argument("--cohere.api_key", type=str, help="API key for Cohere.")
+        parser.add_argument(
+            "--cohere.api_base",
+            type=str,
+            help="Base URL of the Cohere API.",
+            default="https://api.cohere.ai/v1",
+        )
 
     def __init__(self, api_key: Optional[str] = None, *args, **kwargs):
         super(CohereMiner, self).__init__(*args, **kwargs)
@@ -88,38 +95,56 @@ class CohereMiner(openminers.BasePromptingMiner):
             raise ValueError(
                 "the miner requires passing --cohere.api_key as an argument of the config or to the constructor."
             )
-        self.model = Cohere(
-            model=self.config.cohere.model_name,
-            cohere_api_key=api_key or self.config.cohere.api_key,
-            max_tokens=self.config.cohere.max_tokens,
-            temperature=self.config.cohere.temperature,
-            k=self.config.cohere.k,
-            p=self.config.cohere.p,
-            frequency_penalty=self.config.cohere.frequency_penalty,
-            presence_penalty=self.config.cohere.presence_penalty,
-            truncate=self.config.cohere.truncate,
-            stop=self.config.cohere.stop,
-        )
+        self.api_key = api_key or self.config.cohere.api_key
+        self.params = {
+            "model": self.config.cohere.model_name,
+            "max_tokens": self.config.cohere.max_tokens,
+            "temperature": self.config.cohere.temperature,
+            "k": self.config.cohere.k,
+            "p": self.config.cohere.p,
+            "frequency_penalty": self.config.cohere.frequency_penalty,
+            "presence_penalty": self.config.cohere.presence_penalty,
+        }
+        if self.config.cohere.truncate is not None:
+            self.params["truncate"] = self.config.cohere.truncate
+        if self.config.cohere.stop is not None:
+            self.params["end_sequences"] = [self.config.cohere.stop]
+
+    def generation_config(self) -> Dict[str, Any]:
+        return {
+            "max_tokens": self.config.cohere.max_tokens,
+            "temperature": self.config.cohere.temperature,
+            "k": self.config.cohere.k,
+            "p": self.config.cohere.p,
+            "frequency_penalty": self.config.cohere.frequency_penalty,
+            "presence_penalty": self.config.cohere.presence_penalty,
+            "truncate": self.config.cohere.truncate,
+            "stop": self.config.cohere.stop,
+        }
 
-    @staticmethod
-    def _process_history(history: List[Dict[str, str]]) -> str:
-        processed_history = ""
-        for message in history:
-            if message["role"] == "system":
-                processed_history += "system: " + message["content"] + "\n"
-            if message["role"] == "assistant":
-                processed_history += "assistant: " + message["content"] + "\n"
-            if message["role"] == "user":
-                processed_history += "user: " + message["content"] + "\n"
-        return processed_history
+    async def forward(self, messages: List[Dict[str, str]]) -> str:
+        history = self.template.render(messages)
+        resp = await self.http_client.post_json(
+            self.config.cohere.api_base + "/generate",
+            {"prompt": history, **self.params},
+            headers={"Authorization": f"Bearer { self.api_key }"},
+        )
+        return resp["generations"][0]["text"]
 
-    def forward(self, messages: List[Dict[str, str]]) -> str:
-        history = self._process_history(messages)
-        return self.model(history)
+    async def forward_stream(
+        self, messages: List[Dict[str, str]]
+    ) -> AsyncIterator[str]:
+        history = self.template.render(messages)
+        async for event in self.http_client.stream_json(
+            self.config.cohere.api_base + "/generate",
+            {"prompt": history, "stream": True, **self.params},
+            headers={"Authorization": f"Bearer { self.api_key }"},
+        ):
+            if event.get("text"):
+                yield event["text"]
 
 
 if __name__ == "__main__":
-    with CohereMiner():
-        while True:
-            print("running...", time.time())
-            time.sleep(1)
+    from openminers.cli import run_miner
+
+    run_miner(CohereMiner)
@@ -23,22 +23,14 @@ import bittensor
 import deepspeed
 import os
 
-from typing import List, Dict
-from transformers import AutoTokenizer, pipeline, StoppingCriteria, StoppingCriteriaList, AutoModelForCausalLM, AutoConfig
+from typing import List, Dict, Any
+from transformers import AutoTokenizer, pipeline, AutoModelForCausalLM, AutoConfig
 from transformers.deepspeed import HfDeepSpeedConfig
-
-
-class StopOnTokens(StoppingCriteria):
-    def __init__(self, stop_token_ids: List[int]):
-        self.stop_token_ids = stop_token_ids
-
-    def __call__(
-        self, input_ids: torch.LongTensor, scores: torch.FloatTensor, **kwargs
-    ) -> bool:
-        for stop_id in self.stop_token_ids:
-            if input_ids[0][-1] == stop_id:
-                return True
-        return False
+from openminers.base.chat_template import ChatTemplate
+from openminers.base.generate import encode_prompt
+from openminers.base.speculative import speculative_generate
+from openminers.base.output import OutputDecoder
+from openminers.base.stopping import StopSequences
 
 
 class FalconMiner(openminers.BasePromptingMiner):
@@ -127,18 +119,45 @@ class FalconMiner(openminers.BasePromptingMiner):
     @classmethod
     def config(cls) -> "bittensor.Config":
         parser = argparse.ArgumentParser(description="Falcon Miner Config")
-        cls.add_args(parser)
+        cls.add_super_args(parser)
         return bittensor.config(parser)
 
     def __init__(self, *args, **kwargs):
         super(FalconMiner, self).__init__(*args, **kwargs)
+        if self.config.neuron.quantization.on:
+            bittensor.logging.warning(
+                "FalconMiner does not support dynamic quantization, loading the model without it."
+            )
+        self.template = ChatTemplate(
+            {
+                "system": ('', ' '),
+                "assistant": ('Assistant:', '</s>'),
+                "user": ('User: ', ' '),
+            },
+            strip=True,
+            system_prompt=self.config.falcon.system_prompt
+            if self.config.falcon.do_prompt_injection
+            else None,
+            generation_prompt='ASSISTANT:',
+        )
 
         bittensor.logging.info("Loading " + str(self.config.falcon.model_name))
         self.tokenizer = AutoTokenizer.from_pretrained(self.config.falcon.model_name)
         self.stop_token_ids = self.tokenizer.convert_tokens_to_ids(
             ["</s>", "<|endoftext|>"]
         )
-        self.stop = StopOnTokens(self.stop_token_ids)
+        # Stop at the end of the turn, or where the model starts writing the user's.
+        self.stop_sequences = StopSequences.from_strings(
+            self.tokenizer,
+            ["User:", " User:", "\nUser:"],
+            token_ids=self.stop_token_ids,
+        )
+        self.decoder = OutputDecoder(self.tokenizer, ["User:"], strip=True)
+        self.speculative = None
+        if super(FalconMiner, self).use_generation_engine():
+            bittensor.logging.warning(
+                "FalconMiner does not support continuous batching, prefix or conversation caching, generating without them."
+            )
 
         if self.config.deployment_framework == "deepspeed":
             
@@ -244,42 +263,72 @@ class FalconMiner(openminers.BasePromptingMiner):
             self.model = pipeline( "text-generation",  **kwargs )
             bittensor.logging.info( 'Model loaded!' )
 
-    def _process_history(self, history: List[str]) -> str:
-        processed_history = ""
-        if self.config.falcon.do_prompt_injection:
-            processed_history += self.config.falcon.system_prompt
-        for message in history:
-            if message["role"] == "system":
-                if not self.config.falcon.do_prompt_injection or message != history[0]:
-                    processed_history += "" + message["content"].strip() + " "
-            if message["role"] == "assistant":
-                processed_history += "Assistant:" + message["content"].strip() + "</s>"
-            if message["role"] == "user":
-                processed_history += "User: " + message["content"].strip() + " "
-        return processed_history
+            self.speculative = self.speculative_decoder(
+                self.model.model,
+                eos_token_id=self.tokenizer.eos_token_id,
+                do_sample=self.config.falcon.do_sample,
+                temperature=self.config.falcon.temperature,
+                top_k=self.config.falcon.top_k,
+            )
+
+    def use_generation_engine(self) -> bool:
+        # Falcon's remote code caches past key/values as (batch * heads, seq, head_dim),
+        # which the engine and the prefix and conversation caches can't pad or splice.
+        return False
+
+    def generation_config(self) -> Dict[str, Any]:
+        return {
+            "max_length": self.config.falcon.max_length,
+            "temperature": self.config.falcon.temperature,
+            "top_k": self.config.falcon.top_k,
+            "do_sample": self.config.falcon.do_sample,
+            "num_return_sequences": self.config.falcon.num_return_sequences,
+            "repetition_penalty": self.config.falcon.repetition_penalty,
+        }
+
+    def _max_new_tokens(self, prompt_len: int) -> int:
+        # --falcon.max_length counts the prompt, as the pipeline's max_length does.
+        return max(1, self.config.falcon.max_length - prompt_len)
 
     def forward(self, messages: List[Dict[str, str]]) -> str:
-        history = self._process_history(messages)
-        prompt = history + "ASSISTANT:"
-        
+        # Truncated to --neuron.max_sequence_len on every path, and tokenized only once.
+        prompt = self.build_prompt(self.tokenizer, messages, self.template)
+        prompt_ids = encode_prompt(self.tokenizer, prompt)
+
         if self.config.deployment_framework == "deepspeed":
-            inputs = self.tokenizer.encode(history, return_tensors="pt").to(device=self.local_rank)
+            inputs = torch.tensor([prompt_ids], device=self.local_rank)
+            start_time = time.time()
             with torch.no_grad():
-                outputs = self.ds_engine.module.generate(inputs, max_length= 60)
-            generation = self.tokenizer.decode(outputs[0], skip_special_tokens=True).replace( str( history ), "")
-        
+                outputs = self.ds_engine.module.generate(inputs, **self.time_budget_kwargs(self._max_new_tokens(inputs.shape[1])))
+            self.observe_generation(outputs.shape[1] - inputs.shape[1], time.time() - start_time)
+            generation = self.decoder.decode(outputs[0], inputs.shape[1])
+
+        elif self.speculative is not None:
+            generation = speculative_generate(
+                self.speculative,
+                self.tokenizer,
+                prompt_ids,
+                max_new_tokens=self._max_new_tokens(len(prompt_ids)),
+                time_budget=self.time_budget,
+                output_decoder=self.decoder,
+            )
+
         else:
-            generation = self.model(
-                prompt,
-                max_length=self.config.falcon.max_length,
+            generation = self.decoder.pipeline(
+                self.model,
+                prompt if isinstance(prompt, str) else self.tokenizer.decode(prompt),
+                time_budget=self.time_budget,
                 do_sample=self.config.falcon.do_sample,
                 top_k=self.config.falcon.top_k,
                 num_return_sequences=self.config.falcon.num_return_sequences,
                 eos_token_id=self.tokenizer.eos_token_id,
                 pad_token_id=self.tokenizer.pad_token_id,
                 repetition_penalty=self.config.falcon.repetition_penalty,
-                stopping_criteria=StoppingCriteriaList( [self.stop] ),
-            )[0]['generated_text'].split(':')[-1].replace( str( history ), "")
+                **self.stop_sequences.generate_kwargs(
+                    self.tokenizer.eos_token_id,
+                    **self.time_budget_kwargs(self._max_new_tokens(len(prompt_ids))),
+                ),
+            )
 
         # Logging input and generation if debugging is active
         bittensor.logging.debug("Message: " + str(messages))
@@ -288,8 +337,6 @@ class FalconMiner(openminers.BasePromptingMiner):
 
 
 if __name__ == "__main__":
-    miner = FalconMiner()
-    with miner:
-        while True:
-            print("running...", time.time())
-            time.sleep(1)
+    from openminers.cli import run_miner
+
+    run_miner(FalconMiner)
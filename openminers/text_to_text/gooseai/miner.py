@@ -15,16 +15,17 @@
 # OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
 # DEALINGS IN THE SOFTWARE.
 
-import time
 import argparse
 import openminers
 import bittensor
 
-from typing import List, Dict, Any, Optional
-from langchain.llms import GooseAI
+from typing import List, Dict, Any, Optional, AsyncIterator
+from openminers.base.chat_template import PLAIN_TEMPLATE
 
 
-class GooseMiner(openminers.BasePromptingMiner):
+class GooseMiner(openminers.AsyncBasePromptingMiner):
+    template = PLAIN_TEMPLATE
+
     @classmethod
     def add_args(cls, parser: argparse.ArgumentParser):
         parser.add_argument(
@@ -93,6 +94,12 @@ class GooseMiner(openminers.BasePromptingMiner):
             default=dict(),
             help="Adjust the probability of specific tokens being generated",
         )
+        parser.add_argument(
+            "--gooseai.api_base",
+            type=str,
+            default="https://api.goose.ai/v1",
+            help="Base URL of the GooseAI API.",
+        )
 
     def __init__(self, api_key: Optional[str] = None, *args, **kwargs):
         super(GooseMiner, self).__init__(*args, **kwargs)
@@ -100,42 +107,59 @@ class GooseMiner(openminers.BasePromptingMiner):
             raise ValueError(
                 "the miner requires passing --gooseai.api_key as an argument of the config or to the constructor."
             )
-        model_kwargs = {
-            "model": self.config.gooseai.model_name,
-            "n_ctx": self.config.gooseai.max_tokens,
-            "n_parts": self.config.gooseai.n,
-            "temp": self.config.gooseai.temperature,
+        self.api_key = api_key or self.config.gooseai.api_key
+        self.params = {
+            "max_tokens": self.config.gooseai.max_tokens,
+            "temperature": self.config.gooseai.temperature,
             "top_p": self.config.gooseai.top_p,
-            "repeat_penalty": self.config.gooseai.frequency_penalty,
+            "min_tokens": self.config.gooseai.min_tokens,
+            "frequency_penalty": self.config.gooseai.frequency_penalty,
+            "presence_penalty": self.config.gooseai.presence_penalty,
+            "n": self.config.gooseai.n,
+            "logit_bias": self.config.gooseai.logit_bias,
+            **self.config.gooseai.model_kwargs,
         }
-        self.model = GooseAI(
-            gooseai_api_key=api_key or self.config.gooseai.api_key,
-            model_kwargs=model_kwargs,
-        )
 
-    @staticmethod
-    def _process_history(history: List[dict]) -> str:
-        processed_history = ""
-        for message in history:
-            if message["role"] == "system":
-                processed_history += "system: " + message["content"] + "\n"
-            if message["role"] == "assistant":
-                processed_history += "assistant: " + message["content"] + "\n"
-            if message["role"] == "user":
-                processed_history += "user: " + message["content"] + "\n"
-        return processed_history
+    def generation_config(self) -> Dict[str, Any]:
+        return {
+            "max_tokens": self.config.gooseai.max_tokens,
+            "min_tokens": self.config.gooseai.min_tokens,
+            "temperature": self.config.gooseai.temperature,
+            "top_p": self.config.gooseai.top_p,
+            "frequency_penalty": self.config.gooseai.frequency_penalty,
+            "presence_penalty": self.config.gooseai.presence_penalty,
+            "n": self.config.gooseai.n,
+            "logit_bias": self.config.gooseai.logit_bias,
+        }
 
-    def forward(self, messages: List[Dict[str, str]]) -> str:
+    async def forward(self, messages: List[Dict[str, str]]) -> str:
         bittensor.logging.info("messages", str(messages))
-        history = self._process_history(messages)
+        history = self.template.render(messages)
         bittensor.logging.info("history", str(history))
-        resp = self.model(history)
+        resp = await self.http_client.post_json(
+            f"{ self.config.gooseai.api_base }/engines/{ self.config.gooseai.model_name }/completions",
+            {"prompt": history, **self.params},
+            headers={"Authorization": f"Bearer { self.api_key }"},
+        )
+        resp = resp["choices"][0]["text"]
         bittensor.logging.info("response", str(resp))
         return resp
 
+    async def forward_stream(
+        self, messages: List[Dict[str, str]]
+    ) -> AsyncIterator[str]:
+        history = self.template.render(messages)
+        async for event in self.http_client.stream_json(
+            f"{ self.config.gooseai.api_base }/engines/{ self.config.gooseai.model_name }/completions",
+            {"prompt": history, "stream": True, **self.params},
+            headers={"Authorization": f"Bearer { self.api_key }"},
+        ):
+            text = event["choices"][0].get("text")
+            if text:
+                yield text
+
 
 if __name__ == "__main__":
-    with GooseMiner():
-        while True:
-            print("running...", time.time())
-            time.sleep(1)
+    from openminers.cli import run_miner
+
+    run_miner(GooseMiner)
@@ -15,15 +15,17 @@
 # OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
 # DEALINGS IN THE SOFTWARE.
 
-import time
 import argparse
 import openminers
 import bittensor as bt
-from typing import List, Dict
+from typing import List, Dict, Any
 from langchain.llms import GPT4All
+from openminers.base.chat_template import PLAIN_TEMPLATE
 
 
 class GPT4ALLMiner(openminers.BasePromptingMiner):
+    template = PLAIN_TEMPLATE
+
     @classmethod
     def add_args(cls, parser: argparse.ArgumentParser):
         parser.add_argument(
@@ -160,21 +162,20 @@ class GPT4ALLMiner(openminers.BasePromptingMiner):
             streaming=self.config.gpt4all.streaming,
         )
 
-    @staticmethod
-    def _process_history(history: List[dict]) -> str:
-        processed_history = ""
-        for message in history:
-            if message["role"] == "system":
-                processed_history += "system: " + message["content"] + "\n"
-            if message["role"] == "assistant":
-                processed_history += "assistant: " + message["content"] + "\n"
-            if message["role"] == "user":
-                processed_history += "user: " + message["content"] + "\n"
-        return processed_history
+    def generation_config(self) -> Dict[str, Any]:
+        return {
+            "n_predict": self.config.gpt4all.n_predict,
+            "temperature": self.config.gpt4all.temp,
+            "top_p": self.config.gpt4all.top_p,
+            "top_k": self.config.gpt4all.top_k,
+            "repeat_last_n": self.config.gpt4all.repeat_last_n,
+            "repeat_penalty": self.config.gpt4all.repeat_penalty,
+            "seed": self.config.gpt4all.seed,
+        }
 
     def forward(self, messages: List[Dict[str, str]]) -> str:
         bt.logging.info("messages", str(messages))
-        history = self._process_history(messages)
+        history = self.template.render(messages)
         bt.logging.info("history", str(history))
         resp = self.model(history)
         bt.logging.info("response", str(resp))
@@ -182,8 +183,6 @@ class GPT4ALLMiner(openminers.BasePromptingMiner):
 
 
 if __name__ == "__main__":
-    miner = GPT4ALLMiner()
-    with miner:
-        while True:
-            print("running...", time.time())
-            time.sleep(1)
+    from openminers.cli import run_miner
+
+    run_miner(GPT4ALLMiner)
@@ -15,14 +15,17 @@
 # OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
 # DEALINGS IN THE SOFTWARE.
 
-import time
 import torch
 import argparse
 import openminers
 import bittensor
 
-from typing import List, Dict
+from typing import List, Dict, Any, Iterator
 from transformers import AutoTokenizer, AutoModelForCausalLM
+from openminers.base.generate import batch_generate, stream_generate
+from openminers.base.loading import load_model_and_tokenizer
+from openminers.base.continuous_batching import ContinuousBatchingEngine
+from openminers.base.chat_template import ChatTemplate
 
 
 class HermesMiner(openminers.BasePromptingMiner):
@@ -77,68 +80,112 @@ class HermesMiner(openminers.BasePromptingMiner):
     @classmethod
     def config(cls) -> "bittensor.Config":
         parser = argparse.ArgumentParser(description="Hermes Miner Configs")
-        cls.add_args(parser)
+        cls.add_super_args(parser)
         return bittensor.config(parser)
 
     def __init__(self, *args, **kwargs):
         super(HermesMiner, self).__init__(*args, **kwargs)
-        bittensor.logging.info("Loading " + str(self.config.hermes.model_name))
-        self.tokenizer = AutoTokenizer.from_pretrained(
-            self.config.hermes.model_name, use_fast=False
-        )
-        self.model = AutoModelForCausalLM.from_pretrained(
-            self.config.hermes.model_name,
-            torch_dtype=torch.float16,
-            low_cpu_mem_usage=True,
-            device_map=self.config.hermes.device_map,
+        self.template = ChatTemplate(
+            {
+                "system": ("", " "),
+                "assistant": ("### Response:", "</s>"),
+                "user": ("### Input: ", " "),
+            },
+            strip=True,
+            system_prompt=self.config.hermes.system_prompt
+            if self.config.hermes.do_prompt_injection
+            else None,
+            generation_prompt="### Response:",
         )
+        bittensor.logging.info("Loading " + str(self.config.hermes.model_name))
+        quantization = self.quantization()
+        if quantization is not None:
+            self.model, self.tokenizer = load_model_and_tokenizer(
+                self.config.hermes.model_name,
+                device=self.config.hermes.device,
+                tokenizer_kwargs={"use_fast": False},
+                startup=self.startup,
+                quantization=quantization,
+            )
+        else:
+            self.tokenizer = AutoTokenizer.from_pretrained(
+                self.config.hermes.model_name, use_fast=False
+            )
+            self.model = AutoModelForCausalLM.from_pretrained(
+                self.config.hermes.model_name,
+                torch_dtype=torch.float16,
+                low_cpu_mem_usage=True,
+                device_map=self.config.hermes.device_map,
+            )
         bittensor.logging.info("Model loaded!")
 
         if self.config.hermes.device != "cpu":
             self.model = self.model.to(self.config.hermes.device)
 
-    def _process_history(self, history: List[str]) -> str:
-        processed_history = ""
-        if self.config.hermes.do_prompt_injection:
-            processed_history += self.config.hermes.system_prompt
-        for message in history:
-            if message["role"] == "system":
-                if not self.config.hermes.do_prompt_injection or message != history[0]:
-                    processed_history += "" + message["content"].strip() + " "
-            if message["role"] == "Assistant":
-                processed_history += (
-                    "### Response:" + message["content"].strip() + "</s>"
-                )
-            if message["role"] == "user":
-                processed_history += "### Input: " + message["content"].strip() + " "
-        print("Processed hist:", processed_history)
-        return processed_history
+        self.engine = None
+        if self.use_generation_engine():
+            self.engine = ContinuousBatchingEngine(
+                self.model,
+                eos_token_id=self.tokenizer.eos_token_id,
+                max_batch_size=self.config.neuron.max_batch_size,
+                device=self.config.hermes.device,
+                do_sample=self.config.hermes.do_sample,
+                temperature=self.config.hermes.temperature,
+                prefix_cache=self.prefix_cache,
+                conversation_cache=self.conversation_cache,
+            )
 
-    def forward(self, messages: List[Dict[str, str]]) -> str:
-        history = self._process_history(messages)
-        prompt = history + "### Response:"
-        input_ids = self.tokenizer.encode(prompt, return_tensors="pt").to(
-            self.config.hermes.device
-        )
-        output = self.model.generate(
-            input_ids,
-            max_length=input_ids.shape[1] + self.config.hermes.max_new_tokens,
+    def generation_config(self) -> Dict[str, Any]:
+        return {
+            "max_new_tokens": self.config.hermes.max_new_tokens,
+            "temperature": self.config.hermes.temperature,
+            "do_sample": self.config.hermes.do_sample,
+        }
+
+    def max_new_tokens(self) -> int:
+        return self.config.hermes.max_new_tokens
+
+    def forward_batch(self, messages_batch: List[List[Dict[str, str]]]) -> List[str]:
+        prompts = [
+            self.build_prompt(self.tokenizer, messages, self.template)
+            for messages in messages_batch
+        ]
+        generations = batch_generate(
+            self.model,
+            self.tokenizer,
+            prompts,
+            device=self.config.hermes.device,
+            max_new_tokens=self.config.hermes.max_new_tokens,
+            engine=self.engine,
+            time_budget=self.time_budget,
             temperature=self.config.hermes.temperature,
             do_sample=self.config.hermes.do_sample,
-            pad_token_id=self.tokenizer.eos_token_id,
-        )
-        generation = self.tokenizer.decode(
-            output[0][input_ids.shape[1] :], skip_special_tokens=True
         )
 
         # Logging input and generation if debugging is active
-        bittensor.logging.debug("Message: " + str(messages))
-        bittensor.logging.debug("Generation: " + str(generation))
-        return generation
+        for messages, generation in zip(messages_batch, generations):
+            bittensor.logging.debug("Message: " + str(messages))
+            bittensor.logging.debug("Generation: " + str(generation))
+        return generations
+
+    def forward_stream(self, messages: List[Dict[str, str]]) -> Iterator[str]:
+        return stream_generate(
+            self.model,
+            self.tokenizer,
+            self.build_prompt(self.tokenizer, messages, self.template),
+            device=self.config.hermes.device,
+            max_new_tokens=self.config.hermes.max_new_tokens,
+            engine=self.engine,
+            time_budget=self.time_budget,
+            temperature=self.config.hermes.temperature,
+            do_sample=self.config.hermes.do_sample,
+        )
+
+    def forward(self, messages: List[Dict[str, str]]) -> str:
+        return self.forward_batch([messages])[0]
 
 
 if __name__ == "__main__":
-    with HermesMiner():
-        while True:
-            print("running...", time.time())
-            time.sleep(1)
+    from openminers.cli import run_miner
+
+    run_miner(HermesMiner)
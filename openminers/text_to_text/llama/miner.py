@@ -19,12 +19,17 @@ import time
 import torch
 import argparse
 import openminers
-from typing import List, Dict
+from typing import List, Dict, Any
 from transformers import AutoTokenizer, AutoModelForCausalLM, AutoModel, pipeline, AutoConfig
 from transformers.deepspeed import HfDeepSpeedConfig
+from openminers.base.generate import batch_generate
+from openminers.base.continuous_batching import ContinuousBatchingEngine
+from openminers.base.speculative import speculative_generate
 import bittensor
 import deepspeed
 import os
+from openminers.base.chat_template import PLAIN_TEMPLATE
+from openminers.base.output import OutputDecoder
 # from openbase.config import config
 
 deployment_framework = "ds_inference"
@@ -32,6 +37,8 @@ deployment_framework = "accelerate"
 
 class LlamaMiner( openminers.BasePromptingMiner ):
 
+    template = PLAIN_TEMPLATE
+
     @classmethod
     def add_args( cls, parser: argparse.ArgumentParser ):
         parser.add_argument('--deployment_framework',  type=str, choices=['accelerate', 'deepspeed'], default="accelerate", help='Inference framework to use for multi-gpu inference')
@@ -48,14 +55,18 @@ class LlamaMiner( openminers.BasePromptingMiner ):
     @classmethod
     def config( cls ) -> "bittensor.Config":
         parser = argparse.ArgumentParser( description='Falcon Miner Config' )
-        cls.add_args( parser )
+        cls.add_super_args( parser )
         return bittensor.config( parser )
 
     def __init__( self, *args, **kwargs):
         super( LlamaMiner, self ).__init__( *args, **kwargs )
+        if self.config.neuron.quantization.on:
+            bittensor.logging.warning( 'LlamaMiner does not support dynamic quantization, loading the model without it.' )
         bittensor.logging.info( 'Loading ' + str( self.config.llama.model_name ) )
         # loading the tokenizer
         self.tokenizer = AutoTokenizer.from_pretrained(self.config.llama.model_name)
+        self.engine = None
+        self.speculative = None
 
         if self.config.deployment_framework == "deepspeed":        
 
@@ -155,44 +166,88 @@ class LlamaMiner( openminers.BasePromptingMiner ):
                 device_map="auto",
             )
 
-    @staticmethod
-    def _process_history( history: List[ Dict[str, str] ] ) -> str:
-        processed_history = ''
-        for message in history:
-            if message['role'] == 'system':
-                processed_history += 'system: ' + message['content'] + '\n'
-            if message['role'] == 'assistant':
-                processed_history += 'assistant: ' + message['content'] + '\n'
-            if message['role'] == 'user':
-                processed_history += 'user: ' + message['content'] + '\n'
-        return processed_history
+            if self.use_generation_engine():
+                self.engine = ContinuousBatchingEngine(
+                    self.model,
+                    eos_token_id=self.tokenizer.eos_token_id,
+                    max_batch_size=self.config.neuron.max_batch_size,
+                    device=self.model.device,
+                    do_sample=self.config.llama.do_sample,
+                    temperature=self.config.llama.temperature,
+                    prefix_cache=self.prefix_cache,
+                    conversation_cache=self.conversation_cache,
+                )
+
+            self.speculative = self.speculative_decoder(
+                self.model,
+                eos_token_id=self.tokenizer.eos_token_id,
+                do_sample=self.config.llama.do_sample,
+                temperature=self.config.llama.temperature,
+                top_k=self.config.llama.top_k,
+            )
+
+        self.decoder = OutputDecoder(self.tokenizer, self.template.stop_strings(), strip=True)
+
+    def generation_config(self) -> Dict[str, Any]:
+        return {
+            "max_tokens": self.config.llama.max_tokens,
+            "temperature": self.config.llama.temperature,
+            "top_p": self.config.llama.top_p,
+            "top_k": self.config.llama.top_k,
+            "do_sample": self.config.llama.do_sample,
+            "stopping_criteria": self.config.llama.stopping_criteria,
+        }
+
+    def max_new_tokens(self) -> int:
+        return self.config.llama.max_tokens
 
     def forward( self, messages: List[Dict[str, str]]  ) -> str: 
-        history = self._process_history(messages)
+        prompt = self.template.render(messages, add_generation_prompt=True)
         if self.config.deployment_framework == "deepspeed":
-            t_generate_start = time.time()
-            inputs = self.tokenizer.encode(history, return_tensors="pt").to(device=self.local_rank)
+            inputs = self.tokenizer.encode(prompt, return_tensors="pt").to(device=self.local_rank)
+            start_time = time.time()
             with torch.no_grad():
-                outputs = self.ds_engine.module.generate(inputs, max_length= 60)
-            resp = self.tokenizer.decode(outputs[0], skip_special_tokens=True).replace( str( history ), "")
+                outputs = self.ds_engine.module.generate(inputs, **self.time_budget_kwargs(self.config.llama.max_tokens))
+            self.observe_generation(outputs.shape[1] - inputs.shape[1], time.time() - start_time)
+            resp = self.decoder.decode(outputs[0], inputs.shape[1])
+        elif self.engine is not None:
+            resp = batch_generate(
+                self.model,
+                self.tokenizer,
+                [self.build_prompt(self.tokenizer, messages, self.template)],
+                device=self.model.device,
+                max_new_tokens=self.config.llama.max_tokens,
+                engine=self.engine,
+                time_budget=self.time_budget,
+                decoder=self.decoder,
+            )[0]
+        elif self.speculative is not None:
+            resp = speculative_generate(
+                self.speculative,
+                self.tokenizer,
+                self.build_prompt(self.tokenizer, messages, self.template),
+                max_new_tokens=self.config.llama.max_tokens,
+                time_budget=self.time_budget,
+                output_decoder=self.decoder,
+            )
         else:
-            resp = self.pipe( 
-                history, 
-                max_length=200,
-                do_sample=True,
-                top_k=10,
+            resp = self.decoder.pipeline(
+                self.pipe,
+                prompt,
+                time_budget=self.time_budget,
+                **self.time_budget_kwargs(self.config.llama.max_tokens),
+                do_sample=self.config.llama.do_sample,
+                top_k=self.config.llama.top_k,
                 num_return_sequences=1,
                 eos_token_id=self.tokenizer.eos_token_id, 
-            )[0]['generated_text'].split(':')[-1].replace( str( history ), "")
+            )
 
         # Logging input and generation if debugging is active
         bittensor.logging.debug( "Message: " + str( messages ) )
         bittensor.logging.debug( "Generation: " + str( resp ) )
         return resp
 
-if __name__ == "__main__":  
-    miner = LlamaMiner()
-    with miner:
-        while True:
-            print ('running...', time.time() )
-            time.sleep( 1 )
\ No newline at end of file
+if __name__ == "__main__":
+    from openminers.cli import run_miner
+
+    run_miner(LlamaMiner)
@@ -15,14 +15,17 @@
 # OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
 # DEALINGS IN THE SOFTWARE.
 
-import time
 import torch
 import argparse
 import openminers
 import bittensor
 
-from typing import List, Dict
-from transformers import AutoTokenizer, AutoModelForCausalLM
+from typing import List, Dict, Any, Iterator
+from openminers.base.generate import batch_generate, stream_generate, truncate_stream
+from openminers.base.continuous_batching import ContinuousBatchingEngine
+from openminers.base.loading import load_model_and_tokenizer
+from openminers.base.chat_template import ChatTemplate
+from openminers.base.output import OutputDecoder
 
 
 class NeoxtMiner(openminers.BasePromptingMiner):
@@ -70,64 +73,101 @@ class NeoxtMiner(openminers.BasePromptingMiner):
 
     def __init__(self, *args, **kwargs):
         super(NeoxtMiner, self).__init__(*args, **kwargs)
+        self.template = ChatTemplate(
+            {
+                "system": ("<human>: ", "\n"),
+                "assistant": ("<bot>: ", "\n"),
+                "user": ("<human>: ", "\n"),
+            },
+            strip=True,
+            system_prompt=self.config.neoxt.system_prompt
+            if self.config.neoxt.do_prompt_injection
+            else None,
+            generation_prompt="<bot>:",
+        )
 
         # Load the NeoXT model.
-        self.tokenizer = AutoTokenizer.from_pretrained(self.config.neoxt.model_name)
-        self.model = AutoModelForCausalLM.from_pretrained(
+        self.model, self.tokenizer = load_model_and_tokenizer(
             self.config.neoxt.model_name,
+            device=self.config.neoxt.device,
+            startup=self.startup,
+            quantization=self.quantization(),
             torch_dtype=torch.float16,
-            low_cpu_mem_usage=True,
         )
-        if self.config.neoxt.device != "cpu":
-            self.model = self.model.to(self.config.neoxt.device)
-
-    def _process_history(self, history: List[str]) -> str:
-        processed_history = ""
-
-        if self.config.neoxt.do_prompt_injection:
-            processed_history += self.config.neoxt.system_prompt
-
-        for message in history:
-            if message["role"] == "system":
-                if not self.config.neoxt.do_prompt_injection or message == history[0]:
-                    processed_history += "<human>: " + message["content"].strip() + "\n"
-
-            if message["role"] == "assistant":
-                processed_history += "<bot>: " + message["content"].strip() + "\n"
-            if message["role"] == "user":
-                processed_history += "<human>: " + message["content"].strip() + "\n"
-        return processed_history
-
-    def forward(self, messages: List[Dict[str, str]]) -> str:
-        history = self._process_history(messages)
-        prompt = history + "<bot>:"
-        input_ids = self.tokenizer.encode(prompt, return_tensors="pt").to(
-            self.config.neoxt.device
-        )
-        output = self.model.generate(
-            input_ids,
-            max_length=input_ids.shape[1] + self.config.neoxt.max_new_tokens,
+        self.decoder = OutputDecoder(self.tokenizer, ["<human>"], strip=True)
+
+        self.engine = None
+        if self.use_generation_engine():
+            self.engine = ContinuousBatchingEngine(
+                self.model,
+                eos_token_id=self.tokenizer.eos_token_id,
+                max_batch_size=self.config.neuron.max_batch_size,
+                device=self.config.neoxt.device,
+                do_sample=self.config.neoxt.do_sample,
+                temperature=self.config.neoxt.temperature,
+                prefix_cache=self.prefix_cache,
+                conversation_cache=self.conversation_cache,
+            )
+
+    def generation_config(self) -> Dict[str, Any]:
+        return {
+            "max_new_tokens": self.config.neoxt.max_new_tokens,
+            "temperature": self.config.neoxt.temperature,
+            "do_sample": self.config.neoxt.do_sample,
+        }
+
+    def max_new_tokens(self) -> int:
+        return self.config.neoxt.max_new_tokens
+
+    def forward_batch(self, messages_batch: List[List[Dict[str, str]]]) -> List[str]:
+        prompts = [
+            self.build_prompt(self.tokenizer, messages, self.template)
+            for messages in messages_batch
+        ]
+        generations = batch_generate(
+            self.model,
+            self.tokenizer,
+            prompts,
+            device=self.config.neoxt.device,
+            max_new_tokens=self.config.neoxt.max_new_tokens,
+            engine=self.engine,
+            time_budget=self.time_budget,
             temperature=self.config.neoxt.temperature,
             do_sample=self.config.neoxt.do_sample,
-            pad_token_id=self.tokenizer.eos_token_id,
-        )
-        generated_text = self.tokenizer.decode(
-            output[0][input_ids.shape[1] :], skip_special_tokens=True
+            decoder=self.decoder,
         )
-        generation = generated_text.split("<human>")[0].strip()
 
         # Logging input and generation if debugging is active
-        bittensor.logging.debug(
-            "Message: " + str(messages).replace("<", "-").replace(">", "-")
-        )
-        bittensor.logging.debug(
-            "Generation: " + str(generation).replace("<", "-").replace(">", "-")
+        for messages, generation in zip(messages_batch, generations):
+            bittensor.logging.debug(
+                "Message: " + str(messages).replace("<", "-").replace(">", "-")
+            )
+            bittensor.logging.debug(
+                "Generation: " + str(generation).replace("<", "-").replace(">", "-")
+            )
+        return generations
+
+    def forward_stream(self, messages: List[Dict[str, str]]) -> Iterator[str]:
+        return truncate_stream(
+            stream_generate(
+                self.model,
+                self.tokenizer,
+                self.build_prompt(self.tokenizer, messages, self.template),
+                device=self.config.neoxt.device,
+                max_new_tokens=self.config.neoxt.max_new_tokens,
+                engine=self.engine,
+                time_budget=self.time_budget,
+                temperature=self.config.neoxt.temperature,
+                do_sample=self.config.neoxt.do_sample,
+            ),
+            ["<human>"],
         )
-        return generation
+
+    def forward(self, messages: List[Dict[str, str]]) -> str:
+        return self.forward_batch([messages])[0]
 
 
 if __name__ == "__main__":
-    with NeoxtMiner():
-        while True:
-            print("running...", time.time())
-            time.sleep(1)
+    from openminers.cli import run_miner
+
+    run_miner(NeoxtMiner)
@@ -15,18 +15,22 @@
 # OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
 # DEALINGS IN THE SOFTWARE.
 
-import time
-import openai
 import argparse
 import bittensor
 import openminers
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Any, AsyncIterator
 
 
-class OpenAIMiner(openminers.BasePromptingMiner):
+class OpenAIMiner(openminers.AsyncBasePromptingMiner):
     @classmethod
     def add_args(cls, parser: argparse.ArgumentParser):
         parser.add_argument("--openai.api_key", type=str, help="openai api key")
+        parser.add_argument(
+            "--openai.api_base",
+            type=str,
+            default="https://api.openai.com/v1",
+            help="Base URL of the OpenAI API.",
+        )
         parser.add_argument(
             "--openai.suffix",
             type=str,
@@ -79,7 +83,7 @@ class OpenAIMiner(openminers.BasePromptingMiner):
     @classmethod
     def config(cls) -> "bittensor.Config":
         parser = argparse.ArgumentParser(description="OpenAI Miner Configs")
-        cls.add_args(parser)
+        cls.add_super_args(parser)
         return bittensor.config(parser)
 
     def __init__(self, api_key: Optional[str] = None, *args, **kwargs):
@@ -88,24 +92,58 @@ class OpenAIMiner(openminers.BasePromptingMiner):
             raise ValueError(
                 "the miner requires passing --openai.api_key as an argument of the config or to the constructor."
             )
-        openai.api_key = api_key or self.config.openai.api_key
-
-    def forward(self, messages: List[Dict[str, str]]) -> str:
-        resp = openai.ChatCompletion.create(
-            model=self.config.openai.model_name,
-            messages=messages,
-            temperature=self.config.openai.temperature,
-            max_tokens=self.config.openai.max_tokens,
-            top_p=self.config.openai.top_p,
-            frequency_penalty=self.config.openai.frequency_penalty,
-            presence_penalty=self.config.openai.presence_penalty,
-            n=self.config.openai.n,
+        self.api_key = api_key or self.config.openai.api_key
+
+    def generation_config(self) -> Dict[str, Any]:
+        return {
+            "max_tokens": self.config.openai.max_tokens,
+            "temperature": self.config.openai.temperature,
+            "top_p": self.config.openai.top_p,
+            "n": self.config.openai.n,
+            "presence_penalty": self.config.openai.presence_penalty,
+            "frequency_penalty": self.config.openai.frequency_penalty,
+            "suffix": self.config.openai.suffix,
+        }
+
+    def max_new_tokens(self) -> int:
+        return self.config.openai.max_tokens
+
+    def _request(self, messages: List[Dict[str, str]]) -> Dict[str, Any]:
+        return {
+            "model": self.config.openai.model_name,
+            "messages": messages,
+            "temperature": self.config.openai.temperature,
+            "max_tokens": self.config.openai.max_tokens,
+            "top_p": self.config.openai.top_p,
+            "frequency_penalty": self.config.openai.frequency_penalty,
+            "presence_penalty": self.config.openai.presence_penalty,
+            "n": self.config.openai.n,
+        }
+
+    async def forward(self, messages: List[Dict[str, str]]) -> str:
+        resp = (
+            await self.http_client.post_json(
+                self.config.openai.api_base + "/chat/completions",
+                self._request(messages),
+                headers={"Authorization": f"Bearer { self.api_key }"},
+            )
         )["choices"][0]["message"]["content"]
         return resp
 
+    async def forward_stream(
+        self, messages: List[Dict[str, str]]
+    ) -> AsyncIterator[str]:
+        async for event in self.http_client.stream_json(
+            self.config.openai.api_base + "/chat/completions",
+            {**self._request(messages), "stream": True},
+            headers={"Authorization": f"Bearer { self.api_key }"},
+        ):
+            text = event["choices"][0]["delta"].get("content")
+            if text:
+                yield text
+
 
 if __name__ == "__main__":
-    with OpenAIMiner():
-        while True:
-            print("running...", time.time())
-            time.sleep(1)
+    from openminers.cli import run_miner
+
+    run_miner(OpenAIMiner)
@@ -15,21 +15,29 @@
 # OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
 # DEALINGS IN THE SOFTWARE.
 
-import time
 import torch
 import argparse
 import openminers
+import bittensor
 from typing import List, Dict
 from transformers import AutoTokenizer, AutoModelForCausalLM, pipeline
+from openminers.base.chat_template import PLAIN_TEMPLATE
+from openminers.base.output import OutputDecoder
 
 
 class RobertMyersMiner(openminers.BasePromptingMiner):
+    template = PLAIN_TEMPLATE
+
     @classmethod
     def add_args(cls, parser: argparse.ArgumentParser):
         pass
 
     def __init__(self, *args, **kwargs):
         super(RobertMyersMiner, self).__init__(*args, **kwargs)
+        if self.config.neuron.quantization.on:
+            bittensor.logging.warning(
+                "RobertMyersMiner does not support dynamic quantization, loading the model without it."
+            )
         tokenizer = AutoTokenizer.from_pretrained("robertmyers/bpt-sft")
         self.model = AutoModelForCausalLM.from_pretrained(
             "robertmyers/bpt-sft", torch_dtype=torch.float16
@@ -42,32 +50,16 @@ class RobertMyersMiner(openminers.BasePromptingMiner):
             device=0,
             max_new_tokens=256,
         )
-
-    @staticmethod
-    def _process_history(history: List[Dict[str, str]]) -> str:
-        processed_history = ""
-        for message in history:
-            if message["role"] == "system":
-                processed_history += "system: " + message["content"] + "\n"
-            if message["role"] == "assistant":
-                processed_history += "assistant: " + message["content"] + "\n"
-            if message["role"] == "user":
-                processed_history += "user: " + message["content"] + "\n"
-        return processed_history
+        self.decoder = OutputDecoder(
+            tokenizer, self.template.stop_strings(), strip=True
+        )
 
     def forward(self, messages: List[Dict[str, str]]) -> str:
-        history = self._process_history(messages)
-        resp = (
-            self.pipe(history)[0]["generated_text"]
-            .split(":")[-1]
-            .replace(str(history), "")
-        )
-        return resp
+        prompt = self.template.render(messages, add_generation_prompt=True)
+        return self.decoder.pipeline(self.pipe, prompt)
 
 
 if __name__ == "__main__":
-    miner = RobertMyersMiner()
-    with miner:
-        while True:
-            print("running...", time.time())
-            time.sleep(1)
+    from openminers.cli import run_miner
+
+    run_miner(RobertMyersMiner)
@@ -15,33 +15,27 @@
 # OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
 # DEALINGS IN THE SOFTWARE.
 
-import time
 import torch
 import argparse
 import openminers
 import bittensor
-from typing import List, Dict, Optional
-from transformers import (
-    AutoTokenizer,
-    AutoModelForCausalLM,
-    pipeline,
-    StoppingCriteria,
-    StoppingCriteriaList,
-)
-
-
-class StopOnTokens(StoppingCriteria):
-    def __call__(
-        self, input_ids: torch.LongTensor, scores: torch.FloatTensor, **kwargs
-    ) -> bool:
-        stop_ids = [50278, 50279, 50277, 1, 0]
-        for stop_id in stop_ids:
-            if input_ids[0][-1] == stop_id:
-                return True
-        return False
+from typing import List, Dict, Optional, Any
+from transformers import AutoTokenizer, AutoModelForCausalLM, pipeline
+from openminers.base.chat_template import ChatTemplate
+from openminers.base.output import OutputDecoder
+from openminers.base.stopping import StopSequences
 
 
 class StabilityAIMiner(openminers.BasePromptingMiner):
+    template = ChatTemplate(
+        {
+            "system": ("<|SYSTEM|>: ", "\n"),
+            "assistant": ("<|ASSISTANT|>: ", "\n"),
+            "user": ("<|USER|>: ", "\n"),
+        },
+        generation_prompt="<|ASSISTANT|>:",
+    )
+
     @classmethod
     def add_args(cls, parser: argparse.ArgumentParser):
         parser.add_argument(
@@ -111,6 +105,10 @@ class StabilityAIMiner(openminers.BasePromptingMiner):
 
     def __init__(self, api_key: Optional[str] = None, *args, **kwargs):
         super(StabilityAIMiner, self).__init__(*args, **kwargs)
+        if self.config.neuron.quantization.on:
+            bittensor.logging.warning(
+                "StabilityAIMiner does not support dynamic quantization, loading the model without it."
+            )
         bittensor.logging.info(
             "Loading togethercomputer/StabilityAI {}B model...".format(
                 self.config.stabilityai.model_size
@@ -149,35 +147,38 @@ class StabilityAIMiner(openminers.BasePromptingMiner):
             temperature=self.config.stabilityai.temperature,
             top_p=self.config.stabilityai.top_p,
             top_k=self.config.stabilityai.top_k,
-            stopping_criteria=StoppingCriteriaList([StopOnTokens()]),
+        )
+
+        # Stop at the role tokens <|USER|>, <|ASSISTANT|> and <|SYSTEM|>, padding and eos.
+        self.stop_sequences = StopSequences([[50278], [50279], [50277], [1], [0]])
+        self.decoder = OutputDecoder(
+            self.tokenizer, self.template.stop_strings(), strip=True
         )
         bittensor.logging.info(
             "StabilityAI {}B model loaded".format(self.config.stabilityai.model_size)
         )
 
-    @staticmethod
-    def _process_history(history: List[Dict[str, str]]) -> str:
-        processed_history = ""
-        for message in history:
-            if message["role"] == "system":
-                processed_history += "<|SYSTEM|>: " + message["content"] + "\n"
-            if message["role"] == "assistant":
-                processed_history += "<|ASSISTANT|>: " + message["content"] + "\n"
-            if message["role"] == "user":
-                processed_history += "<|USER|>: " + message["content"] + "\n"
-        return processed_history
+    def generation_config(self) -> Dict[str, Any]:
+        return {
+            "max_tokens": self.config.stabilityai.max_tokens,
+            "temperature": self.config.stabilityai.temperature,
+            "top_p": self.config.stabilityai.top_p,
+            "top_k": self.config.stabilityai.top_k,
+            "do_sample": self.config.stabilityai.do_sample,
+            "num_beams": self.config.stabilityai.num_beams,
+            "num_return_sequences": self.config.stabilityai.num_return_sequences,
+            "stopping_criteria": self.config.stabilityai.stopping_criteria,
+        }
 
     def forward(self, messages: List[Dict[str, str]]) -> str:
-        history = self._process_history(messages)
-        return (
-            self.pipe(history)[0]["generated_text"]
-            .split(":")[-1]
-            .replace(str(history), "")
+        return self.decoder.pipeline(
+            self.pipe,
+            self.template.render(messages, add_generation_prompt=True),
+            **self.stop_sequences.generate_kwargs(self.tokenizer.eos_token_id),
         )
 
 
 if __name__ == "__main__":
-    with StabilityAIMiner():
-        while True:
-            print("running...", time.time())
-            time.sleep(1)
+    from openminers.cli import run_miner
+
+    run_miner(StabilityAIMiner)
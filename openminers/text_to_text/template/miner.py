@@ -15,7 +15,6 @@
 # OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
 # DEALINGS IN THE SOFTWARE.
 
-import time
 import argparse
 import bittensor
 import openminers
@@ -30,7 +29,7 @@ class TemplateMiner(openminers.BasePromptingMiner):
     @classmethod
     def config(cls) -> "bittensor.Config":
         parser = argparse.ArgumentParser(description="Template Configs")
-        cls.add_args(parser)
+        cls.add_super_args(parser)
         return bittensor.config(parser)
 
     def forward(self, messages: List[Dict[str, str]]) -> str:
@@ -41,8 +40,6 @@ class TemplateMiner(openminers.BasePromptingMiner):
 
 
 if __name__ == "__main__":
-    miner = TemplateMiner()
-    with miner:
-        while True:
-            print("running...", time.time())
-            time.sleep(1)
+    from openminers.cli import run_miner
+
+    run_miner(TemplateMiner)
@@ -15,14 +15,16 @@
 # OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
 # DEALINGS IN THE SOFTWARE.
 
-import time
 import torch
 import argparse
 import openminers
 import bittensor
 
-from typing import List, Dict
-from transformers import AutoTokenizer, AutoModelForCausalLM
+from typing import List, Dict, Any, Iterator
+from openminers.base.generate import batch_generate, stream_generate
+from openminers.base.continuous_batching import ContinuousBatchingEngine
+from openminers.base.loading import load_model_and_tokenizer
+from openminers.base.chat_template import ChatTemplate
 
 
 class VicunaMiner(openminers.BasePromptingMiner):
@@ -70,60 +72,91 @@ class VicunaMiner(openminers.BasePromptingMiner):
 
     def __init__(self, *args, **kwargs):
         super(VicunaMiner, self).__init__(*args, **kwargs)
-        bittensor.logging.info("Loading " + str(self.config.vicuna.model_name))
-        self.tokenizer = AutoTokenizer.from_pretrained(
-            self.config.vicuna.model_name, use_fast=False
+        self.template = ChatTemplate(
+            {
+                "system": ("", " "),
+                "assistant": ("ASSISTANT:", "</s>"),
+                "user": ("USER: ", " "),
+            },
+            strip=True,
+            system_prompt=self.config.vicuna.system_prompt
+            if self.config.vicuna.do_prompt_injection
+            else None,
+            generation_prompt="ASSISTANT:",
         )
-        self.model = AutoModelForCausalLM.from_pretrained(
+        self.model, self.tokenizer = load_model_and_tokenizer(
             self.config.vicuna.model_name,
+            device=self.config.vicuna.device,
+            tokenizer_kwargs=dict(use_fast=False),
+            startup=self.startup,
+            quantization=self.quantization(),
             torch_dtype=torch.float16,
-            low_cpu_mem_usage=True,
         )
-        bittensor.logging.info("Model loaded!")
-
-        if self.config.vicuna.device != "cpu":
-            self.model = self.model.to(self.config.vicuna.device)
-
-    def _process_history(self, history: List[str]) -> str:
-        processed_history = ""
-        if self.config.vicuna.do_prompt_injection:
-            processed_history += self.config.vicuna.system_prompt
-        for message in history:
-            if message["role"] == "system":
-                if not self.config.vicuna.do_prompt_injection or message != history[0]:
-                    processed_history += "" + message["content"].strip() + " "
-            if message["role"] == "Assistant":
-                processed_history += "ASSISTANT:" + message["content"].strip() + "</s>"
-            if message["role"] == "user":
-                processed_history += "USER: " + message["content"].strip() + " "
-        return processed_history
 
-    def forward(self, messages: List[Dict[str, str]]) -> str:
-        history = self._process_history(messages)
-        prompt = history + "ASSISTANT:"
-        input_ids = self.tokenizer.encode(prompt, return_tensors="pt").to(
-            self.config.vicuna.device
-        )
-        output = self.model.generate(
-            input_ids,
-            max_length=input_ids.shape[1] + self.config.vicuna.max_new_tokens,
+        self.engine = None
+        if self.use_generation_engine():
+            self.engine = ContinuousBatchingEngine(
+                self.model,
+                eos_token_id=self.tokenizer.eos_token_id,
+                max_batch_size=self.config.neuron.max_batch_size,
+                device=self.config.vicuna.device,
+                do_sample=self.config.vicuna.do_sample,
+                temperature=self.config.vicuna.temperature,
+                prefix_cache=self.prefix_cache,
+                conversation_cache=self.conversation_cache,
+            )
+
+    def generation_config(self) -> Dict[str, Any]:
+        return {
+            "max_new_tokens": self.config.vicuna.max_new_tokens,
+            "temperature": self.config.vicuna.temperature,
+            "do_sample": self.config.vicuna.do_sample,
+        }
+
+    def max_new_tokens(self) -> int:
+        return self.config.vicuna.max_new_tokens
+
+    def forward_batch(self, messages_batch: List[List[Dict[str, str]]]) -> List[str]:
+        prompts = [
+            self.build_prompt(self.tokenizer, messages, self.template)
+            for messages in messages_batch
+        ]
+        generations = batch_generate(
+            self.model,
+            self.tokenizer,
+            prompts,
+            device=self.config.vicuna.device,
+            max_new_tokens=self.config.vicuna.max_new_tokens,
+            engine=self.engine,
+            time_budget=self.time_budget,
             temperature=self.config.vicuna.temperature,
             do_sample=self.config.vicuna.do_sample,
-            pad_token_id=self.tokenizer.eos_token_id,
         )
 
-        generation = self.tokenizer.decode(
-            output[0][input_ids.shape[1] :], skip_special_tokens=True
+        # Logging input and generation if debugging is active
+        for messages, generation in zip(messages_batch, generations):
+            bittensor.logging.debug("Message: " + str(messages))
+            bittensor.logging.debug("Generation: " + str(generation))
+        return generations
+
+    def forward_stream(self, messages: List[Dict[str, str]]) -> Iterator[str]:
+        return stream_generate(
+            self.model,
+            self.tokenizer,
+            self.build_prompt(self.tokenizer, messages, self.template),
+            device=self.config.vicuna.device,
+            max_new_tokens=self.config.vicuna.max_new_tokens,
+            engine=self.engine,
+            time_budget=self.time_budget,
+            temperature=self.config.vicuna.temperature,
+            do_sample=self.config.vicuna.do_sample,
         )
 
-        # Logging input and generation if debugging is active
-        bittensor.logging.debug("Message: " + str(messages))
-        bittensor.logging.debug("Generation: " + str(generation))
-        return generation
+    def forward(self, messages: List[Dict[str, str]]) -> str:
+        return self.forward_batch([messages])[0]
 
 
 if __name__ == "__main__":
-    with VicunaMiner():
-        while True:
-            print("running...", time.time())
-            time.sleep(1)
+    from openminers.cli import run_miner
+
+    run_miner(VicunaMiner)
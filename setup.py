@@ -15,7 +15,7 @@
 # OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
 # DEALINGS IN THE SOFTWARE.
 
-from setuptools import setup, find_packages
+from setuptools import setup, find_namespace_packages
 from pkg_resources import parse_requirements
 
 with open("requirements.txt", "r") as f:
@@ -27,8 +27,12 @@ setup(
     description="Openminers is a collection of open source miners for bittensor",
     url="https://github.com/opentensor/bittensor",
     author="bittensor.com",
-    packages=["openminers"],
+    # The miner directories have no __init__.py, so they are namespace packages.
+    packages=find_namespace_packages(
+        include=["openminers", "openminers.*"], exclude=["*.__pycache__"]
+    ),
     include_package_data=True,
+    package_data={"": ["requirements.txt", "README.md"]},
     author_email="",
     license="MIT",
     python_requires=">=3.8",
@@ -50,4 +54,5 @@ setup(
         "Topic :: Software Development :: Libraries :: Python Modules",
     ],
     install_requires=requirements,
+    entry_points={"console_scripts": ["openminers = openminers.cli:main"]},
 )